@@ -0,0 +1,145 @@
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+import requests
+
+# Airtable allows 5 requests per second per base
+AIRTABLE_REQUESTS_PER_SECOND = 5.0
+# Airtable asks clients to wait 30 seconds after a 429
+AIRTABLE_THROTTLE_PENALTY = 30.0
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+_TOKEN_EPSILON = 1e-9
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket that spaces requests to ``rate`` per second.
+
+    ``capacity`` bounds the burst size. A rate of None disables limiting but
+    still honours :meth:`pause`, so every worker backs off together.
+    """
+
+    def __init__(self, rate=AIRTABLE_REQUESTS_PER_SECOND, capacity=None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else (rate or 1.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def pause(self, seconds: float):
+        """Stop handing out tokens for ``seconds`` (e.g. after a 429)."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._tokens = 0.0
+
+    def acquire(self) -> float:
+        """Block until a token is available and return the seconds spent waiting."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                delay = self._paused_until - now
+                if delay <= 0:
+                    if self.rate is None:
+                        return waited
+                    elapsed = now - max(self._updated, self._paused_until)
+                    self._tokens = min(self.capacity, self._tokens + max(0.0, elapsed) * self.rate)
+                    self._updated = now
+                    # Refills in float steps can land a hair under 1.0; waiting out
+                    # that sliver would spin on delays too small to move the clock
+                    if self._tokens >= 1.0 - _TOKEN_EPSILON:
+                        self._tokens = max(0.0, self._tokens - 1.0)
+                        return waited
+                    delay = (1.0 - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+def parse_retry_after(value):
+    """Parse a Retry-After header (seconds or HTTP date) into seconds, or None."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class AirtableClient:
+    """
+    Rate-limited HTTP client with retry and backoff for the Airtable API.
+
+    Every request takes a token from a shared :class:`TokenBucket`. 429 and 5xx
+    responses (and connection errors) are retried with jittered exponential
+    backoff, using Retry-After when the server sends it. A 429 pauses the whole
+    bucket so concurrent workers back off together. ``stats()`` reports request,
+    retry and throttle counts plus the time spent waiting.
+    """
+
+    def __init__(self, session: requests.Session = None, rate=AIRTABLE_REQUESTS_PER_SECOND,
+                 max_retries: int = 5, backoff_base: float = 1.0, backoff_max: float = 60.0,
+                 throttle_penalty: float = AIRTABLE_THROTTLE_PENALTY):
+        self.session = session or requests.Session()
+        self.bucket = TokenBucket(rate)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.throttle_penalty = throttle_penalty
+        self._lock = threading.Lock()
+        self._counters = {"requests": 0, "retries": 0, "throttled": 0,
+                          "server_errors": 0, "wait_seconds": 0.0}
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self._counters[name] += amount
+
+    def stats(self) -> dict:
+        """Snapshot of the request budget counters."""
+        with self._lock:
+            stats = dict(self._counters)
+        stats["wait_seconds"] = round(stats["wait_seconds"], 3)
+        return stats
+
+    def _backoff(self, attempt: int) -> float:
+        delay = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+        return delay * random.uniform(0.5, 1.0)
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """Send a request, retrying throttled or failed attempts; the last response is returned."""
+        attempt = 0
+        while True:
+            self._count("wait_seconds", self.bucket.acquire())
+            self._count("requests")
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == self.max_retries:
+                    raise
+                delay = self._backoff(attempt)
+            else:
+                if response.status_code not in RETRY_STATUSES or attempt == self.max_retries:
+                    return response
+                retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                if response.status_code == 429:
+                    self._count("throttled")
+                    delay = retry_after if retry_after is not None else self.throttle_penalty
+                    self.bucket.pause(delay)
+                else:
+                    self._count("server_errors")
+                    delay = retry_after if retry_after is not None else self._backoff(attempt)
+                response.close()
+            self._count("retries")
+            self._count("wait_seconds", delay)
+            time.sleep(delay)
+            attempt += 1
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        """Rate-limited, retried GET."""
+        return self.request("GET", url, **kwargs)
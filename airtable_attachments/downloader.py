@@ -0,0 +1,150 @@
+import hashlib
+import os
+import sys
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.telemetry import count, span
+
+DEFAULT_MAX_WORKERS = 8
+DEFAULT_CHUNK_SIZE = 64 * 1024
+DEFAULT_TIMEOUT = 60
+
+
+def clean_filename(filename: str) -> str:
+    """Strip characters that are not safe in a local filename."""
+    return "".join(c for c in filename if c.isalnum() or c in ('.', '_', '-'))
+
+
+def make_session(pool_size: int = DEFAULT_MAX_WORKERS) -> requests.Session:
+    """Create a keep-alive session whose connection pool fits the worker count."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+class AttachmentDownloader:
+    """
+    Download attachments concurrently over a shared keep-alive session.
+
+    A bounded thread pool caps the number of parallel transfers, and every
+    response is streamed to disk in chunks so large PDFs never sit in memory.
+    Pass ``session`` to reuse an existing session (or a local stand-in), and
+    ``client`` (an :class:`airtable_client.AirtableClient` over that session)
+    to add rate limiting and retry/backoff to each transfer. Different URLs
+    whose names clean to the same filename get numbered names ("a.pdf",
+    "a_2.pdf") instead of overwriting each other.
+    """
+
+    def __init__(self, output_dir: str, max_workers: int = DEFAULT_MAX_WORKERS,
+                 session: requests.Session = None, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                 timeout: float = DEFAULT_TIMEOUT, client=None):
+        self.output_dir = output_dir
+        self.max_workers = max(1, int(max_workers))
+        self.chunk_size = chunk_size
+        self.timeout = timeout
+        if session is None and client is not None:
+            session = client.session
+        self.session = session or make_session(self.max_workers)
+        self._owns_session = session is None
+        self.client = client
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                            thread_name_prefix="attachment-dl")
+        self._lock = threading.Lock()
+        self._claimed = {}  # cleaned filename -> URL it was given to
+        self.bytes_downloaded = 0
+        os.makedirs(self.output_dir, exist_ok=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _claim(self, url: str, filename: str) -> str:
+        """``filename``, or a numbered variant if another URL already has it in this run."""
+        stem, ext = os.path.splitext(filename)
+        with self._lock:
+            candidate, n = filename, 1
+            while self._claimed.setdefault(candidate, url) != url:
+                n += 1
+                candidate = f"{stem}_{n}{ext}"
+            return candidate
+
+    def fetch(self, url: str, filename: str, etag: str = None):
+        """
+        Download one attachment and describe what was written.
+
+        Returns a dict with the cleaned ``filename``, byte ``size``, ``sha256``
+        of the content and the server ``etag`` (if any), or None on failure.
+        With ``etag`` the request is conditional; if the server answers 304
+        nothing is written and the dict is ``{"not_modified": True, "etag": etag}``.
+        """
+        filename = self._claim(url, clean_filename(filename))
+        filepath = os.path.join(self.output_dir, filename)
+        tmp_path = None
+        try:
+            written = 0
+            digest = hashlib.sha256()
+            get = self.client.get if self.client is not None else self.session.get
+            headers = {"If-None-Match": etag} if etag else None
+            with span("download.fetch", file=filename) as s, \
+                    get(url, stream=True, timeout=self.timeout, headers=headers) as response:
+                if etag and response.status_code == 304:
+                    count("download.not_modified")
+                    return {"not_modified": True, "etag": etag}
+                response.raise_for_status()
+                etag = response.headers.get("ETag")
+                # A private temp file per transfer, so two fetches of one file never interleave their writes
+                fd, tmp_path = tempfile.mkstemp(prefix=filename + ".", suffix=".part", dir=self.output_dir)
+                with os.fdopen(fd, "wb") as f:
+                    for chunk in response.iter_content(chunk_size=self.chunk_size):
+                        if chunk:
+                            f.write(chunk)
+                            digest.update(chunk)
+                            written += len(chunk)
+                s.set(bytes=written)
+            os.replace(tmp_path, filepath)
+            with self._lock:
+                self.bytes_downloaded += written
+            count("download.bytes", written)
+            print(f"Downloaded: {filepath}")
+            return {"filename": filename, "size": written,
+                    "sha256": digest.hexdigest(), "etag": etag}
+        except Exception as e:
+            print(f"Error downloading {filename}: {e}")
+            count("download.failures")
+            if tmp_path and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return None
+
+    def download(self, url: str, filename: str):
+        """Download one attachment and return its cleaned filename, or None on failure."""
+        result = self.fetch(url, filename)
+        return result["filename"] if result else None
+
+    def submit(self, url: str, filename: str):
+        """Queue a download on the worker pool and return its future."""
+        return self._executor.submit(self.download, url, filename)
+
+    def submit_fetch(self, url: str, filename: str, etag: str = None):
+        """Like :meth:`submit`, but the future resolves to :meth:`fetch`'s details."""
+        return self._executor.submit(self.fetch, url, filename, etag)
+
+    def download_all(self, jobs):
+        """Download ``(url, filename)`` pairs concurrently; results keep input order."""
+        futures = [self.submit(url, filename) for url, filename in jobs]
+        return [future.result() for future in futures]
+
+    def close(self):
+        """Wait for queued downloads and release the pool (and our own session)."""
+        self._executor.shutdown(wait=True)
+        if self._owns_session:
+            self.session.close()
@@ -82,12 +82,17 @@
 #     main()
 
 
-import requests
 import os
+import sys
 import pandas as pd
 from dotenv import load_dotenv
-import urllib.request
 import json
+from airtable_client import AirtableClient, AIRTABLE_REQUESTS_PER_SECOND
+from downloader import AttachmentDownloader, DEFAULT_MAX_WORKERS, make_session
+from sync_manifest import SyncManifest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.telemetry import count, span
 
 # Load environment variables
 load_dotenv()
@@ -95,79 +100,145 @@ pat = os.getenv("AIRTABLE_PAT")  # Personal Access Token
 base_id = "appKKaECsy1sYtE5V"
 table_id = "tblU22DmmdsrMBXh1"
 view_id = "viwpa8gwXriMoB1i8"
+api_root = os.getenv("AIRTABLE_API_URL", "https://api.airtable.com/v0")
+# Cap on parallel attachment downloads
+max_downloads = int(os.getenv("AIRTABLE_MAX_DOWNLOADS", DEFAULT_MAX_WORKERS))
+# Requests per second allowed against the Airtable API (per base)
+api_rate_limit = float(os.getenv("AIRTABLE_RATE_LIMIT", AIRTABLE_REQUESTS_PER_SECOND))
+# Incremental sync: skip attachments whose manifest fingerprint is unchanged
+incremental = os.getenv("AIRTABLE_INCREMENTAL", "0") == "1"
+# Re-hash unchanged attachments on disk against the manifest (0 = only check they exist)
+verify_downloads = os.getenv("AIRTABLE_VERIFY_DOWNLOADS", "1") == "1"
+# Optional "Last modified time" field; falls back to the record's createdTime
+modified_field = os.getenv("AIRTABLE_MODIFIED_FIELD", "Last Modified")
 
-# Create folders for attachments and output
-attachments_dir = "attachments"
+# Create folders for attachments and output next to this script, so the
+# pipeline orchestrator can import it from any working directory
+script_dir = os.path.dirname(os.path.abspath(__file__))
+attachments_dir = os.path.join(script_dir, "attachments")
 os.makedirs(attachments_dir, exist_ok=True)
-output_dir = "output"
+output_dir = os.path.join(script_dir, "output")
 os.makedirs(output_dir, exist_ok=True)
+manifest_path = os.path.join(output_dir, "sync_manifest.json")
 
 # Airtable API endpoint
-url = f"https://api.airtable.com/v0/{base_id}/{table_id}"
+url = f"{api_root}/{base_id}/{table_id}"
 headers = {"Authorization": f"Bearer {pat}"}
 params = {"view": view_id}
 
+# Paging goes through the per-base budget; attachment URLs are served from
+# Airtable's CDN, so downloads only get retry/backoff and no rate cap
+api_client = AirtableClient(rate=api_rate_limit)
+download_client = AirtableClient(make_session(max_downloads), rate=None)
+
 def download_attachment(url, filename, output_dir):
     """Download an attachment and save it to the output directory."""
-    try:
-        # Clean filename to avoid invalid characters
-        filename = "".join(c for c in filename if c.isalnum() or c in ('.', '_', '-'))
-        filepath = os.path.join(output_dir, filename)
-        urllib.request.urlretrieve(url, filepath)
-        print(f"Downloaded: {filepath}")
-        return filename  # Return the cleaned filename
-    except Exception as e:
-        print(f"Error downloading {filename}: {e}")
-        return None
+    with AttachmentDownloader(output_dir, max_workers=1) as downloader:
+        return downloader.download(url, filename)  # Return the cleaned filename
 
-def fetch_records():
-    """Fetch all records from the Airtable view."""
-    records = []
+def iter_record_pages():
+    """Yield each page of records from the Airtable view as soon as it arrives."""
+    page_params = dict(params)  # Pagination state stays local to this generator
     offset = None
 
     while True:
-        if offset:  # Fixed: Removed 'Occupationally' and redundant 'if'
-            params["offset"] = offset
-        
-        response = requests.get(url, headers=headers, params=params)
-        response.raise_for_status()  # Raise an error for bad responses
-        data = response.json()
-        
-        records.extend(data["records"])
+        if offset:
+            page_params["offset"] = offset
+
+        with span("airtable.page_fetch"):
+            response = api_client.get(url, headers=headers, params=page_params)
+            response.raise_for_status()  # Raise an error for bad responses
+            data = response.json()
+        count("airtable.records", len(data["records"]))
+
+        yield data["records"]
         offset = data.get("offset")
-        
+
         if not offset:
             break
-    
-    return records
 
-def process_records(records):
-    """Process records and extract all fields, including attachments."""
+def iter_records():
+    """Yield records one at a time while later pages are still being fetched."""
+    for page in iter_record_pages():
+        yield from page
+
+def fetch_records():
+    """Fetch all records from the Airtable view."""
+    return list(iter_records())
+
+def _resolve_download(future, manifest, record_id, attachment, modified):
+    """Wait for a queued fetch and record its fingerprint in the manifest."""
+    result = future.result()
+    if result is None:
+        return None
+    manifest.update(record_id, attachment, modified, result)
+    # A 304 kept the local copy under its stored name
+    return manifest.entry(record_id, attachment["id"])["filename"]
+
+def process_records(records, downloader=None, manifest=None):
+    """
+    Process records and extract all fields, including attachments.
+
+    ``records`` may be any iterable, e.g. :func:`iter_records`: downloads for a
+    page are queued as soon as it arrives, so fetching overlaps with them.
+
+    With a ``manifest`` only new or changed attachments are downloaded; the
+    manifest's ``changes`` report what was added, changed, unchanged or removed.
+    """
+    owns_downloader = downloader is None
+    if owns_downloader:
+        downloader = AttachmentDownloader(attachments_dir, max_workers=max_downloads,
+                                          client=download_client)
+
     data = []
-    
-    for record in records:
-        fields = record["fields"]
-        record_data = {
-            "File ID": fields.get("File ID", ""),
-            "Expected Output": fields.get("Expected Output", ""),
-            "Dataset": fields.get("Dataset", ""),
-            "File": ""  # Will store attachment filename(s)
-        }
-        
-        # Handle attachments in the 'File' field
-        attachments = fields.get("File", [])
-        if attachments:
-            attachment_filenames = []
-            for attachment in attachments:
+    pending = []
+    try:
+        for record in records:
+            fields = record["fields"]
+            record_data = {
+                "File ID": fields.get("File ID", ""),
+                "Expected Output": fields.get("Expected Output", ""),
+                "Dataset": fields.get("Dataset", ""),
+                "File": ""  # Will store attachment filename(s)
+            }
+            modified = fields.get(modified_field, record.get("createdTime"))
+
+            # Queue attachments in the 'File' field; they download in parallel
+            jobs = []
+            for attachment in fields.get("File", []):
                 attachment_url = attachment.get("url")
                 filename = attachment.get("filename", f"attachment_{attachment['id']}")
-                saved_filename = download_attachment(attachment_url, filename, attachments_dir)
-                if saved_filename:
-                    attachment_filenames.append(saved_filename)
-            record_data["File"] = "; ".join(attachment_filenames)  # Join multiple filenames with semicolon
-        
-        data.append(record_data)
-    
+                if manifest is None:
+                    jobs.append((downloader.submit(attachment_url, filename), None))
+                    continue
+                status = manifest.classify(record["id"], attachment, modified, downloader.output_dir)
+                manifest.note(status, record["id"], attachment["id"])
+                if status == "unchanged":
+                    jobs.append((None, manifest.entry(record["id"], attachment["id"])["filename"]))
+                else:
+                    etag = manifest.revalidation_etag(record["id"], attachment["id"], downloader.output_dir)
+                    future = downloader.submit_fetch(attachment_url, filename, etag)
+                    jobs.append((future, (record["id"], attachment, modified)))
+            pending.append((record_data, jobs))
+            data.append(record_data)
+
+        for record_data, jobs in pending:
+            attachment_filenames = []
+            for future, info in jobs:
+                if future is None:
+                    attachment_filenames.append(info)  # unchanged, already on disk
+                elif info is None:
+                    attachment_filenames.append(future.result())
+                else:
+                    attachment_filenames.append(_resolve_download(future, manifest, *info))
+            # Join multiple filenames with semicolon
+            record_data["File"] = "; ".join(name for name in attachment_filenames if name)
+    finally:
+        if owns_downloader:
+            downloader.close()
+
+    if manifest is not None:
+        manifest.prune()
     return data
 
 def save_to_csv(data, output_path):
@@ -184,12 +255,18 @@ def save_to_json(data, output_path):
 
 def main():
     try:
-        print("Fetching records from Airtable...")
-        records = fetch_records()
-        print(f"Fetched {len(records)} records.")
-        
-        print("Processing records and downloading attachments...")
-        data = process_records(records)
+        print("Fetching records from Airtable and downloading attachments...")
+        manifest = SyncManifest(manifest_path, verify=verify_downloads) if incremental else None
+        data = process_records(iter_records(), manifest=manifest)
+        print(f"Fetched {len(data)} records.")
+        print(f"Airtable API requests: {api_client.stats()}")
+        print(f"Attachment requests: {download_client.stats()}")
+        if manifest is not None:
+            manifest.save()
+            print(f"Incremental sync: {manifest.summary()}")
+            for status in ("added", "changed", "removed"):
+                for key in manifest.changes[status]:
+                    print(f" {status}: {key}")
         
         # Save to CSV
         csv_path = os.path.join(output_dir, "airtable_data.csv")
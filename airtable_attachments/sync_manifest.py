@@ -0,0 +1,126 @@
+import hashlib
+import json
+import os
+
+MANIFEST_VERSION = 1
+HASH_CHUNK = 1 << 20
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class SyncManifest:
+    """
+    Local record of what a previous sync downloaded.
+
+    Entries are keyed by Airtable record id and attachment id and store the
+    size, content hash, ETag and the record's modified time seen at download.
+    An attachment is skipped on the next run when that fingerprint still
+    matches and the file on disk still has the stored content hash (with
+    ``verify=False`` only its existence is checked). Airtable's attachment
+    objects carry no ETag, so a changed attachment whose local copy is intact
+    is fetched with the stored ETag as If-None-Match (:meth:`revalidation_etag`),
+    and a 304 keeps the local copy.
+    """
+
+    def __init__(self, path: str, verify: bool = True):
+        self.path = path
+        self.verify = verify
+        self.records = {}
+        self.changes = {"added": [], "changed": [], "unchanged": [], "removed": []}
+        self._seen = set()
+        self.load()
+
+    def load(self):
+        """Read the manifest from disk; a missing or stale-format file starts empty."""
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"Ignoring unreadable manifest {self.path}: {e}")
+            return
+        if data.get("version") == MANIFEST_VERSION:
+            self.records = data.get("records", {})
+
+    def save(self):
+        """Write the manifest atomically so an interrupted run never corrupts it."""
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"version": MANIFEST_VERSION, "records": self.records}, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def entry(self, record_id: str, attachment_id: str):
+        """Return the stored entry for an attachment, or None."""
+        return self.records.get(record_id, {}).get(attachment_id)
+
+    def classify(self, record_id: str, attachment: dict, modified, attachments_dir: str) -> str:
+        """
+        Compare an attachment from the API against the manifest.
+
+        Returns "added", "changed" or "unchanged" and marks the attachment as
+        seen so :meth:`prune` knows it is still part of the view.
+        """
+        self._seen.add((record_id, attachment["id"]))
+        entry = self.entry(record_id, attachment["id"])
+        if entry is None:
+            return "added"
+        size = attachment.get("size", entry.get("size"))
+        if entry.get("size") != size or entry.get("modified") != modified:
+            return "changed"
+        # A missing, truncated or overwritten local copy is fetched again
+        if not self._intact(entry, attachments_dir):
+            return "changed"
+        return "unchanged"
+
+    def _intact(self, entry: dict, attachments_dir: str) -> bool:
+        path = os.path.join(attachments_dir, entry["filename"])
+        if not os.path.exists(path):
+            return False
+        return not (self.verify and entry.get("sha256") and file_sha256(path) != entry["sha256"])
+
+    def revalidation_etag(self, record_id: str, attachment_id: str, attachments_dir: str):
+        """The stored ETag to send as If-None-Match for a changed attachment, or None if the local copy cannot be kept."""
+        entry = self.entry(record_id, attachment_id)
+        if entry is None or not entry.get("etag") or not self._intact(entry, attachments_dir):
+            return None
+        return entry["etag"]
+
+    def note(self, status: str, record_id: str, attachment_id: str):
+        """Add an attachment to the change report under ``status``."""
+        self.changes[status].append(f"{record_id}/{attachment_id}")
+
+    def update(self, record_id: str, attachment: dict, modified, result: dict):
+        """Store the fingerprint of a freshly downloaded (or revalidated, 304) attachment."""
+        if result.get("not_modified"):
+            result = self.entry(record_id, attachment["id"])
+        self.records.setdefault(record_id, {})[attachment["id"]] = {
+            "filename": result["filename"],
+            # Airtable's reported size is what classify() compares next run
+            "size": attachment.get("size", result["size"]),
+            "sha256": result["sha256"],
+            "etag": result.get("etag"),
+            "modified": modified,
+        }
+
+    def prune(self):
+        """Drop entries not seen in this run and report them as removed."""
+        for record_id in list(self.records):
+            attachments = self.records[record_id]
+            for attachment_id in list(attachments):
+                if (record_id, attachment_id) not in self._seen:
+                    del attachments[attachment_id]
+                    self.note("removed", record_id, attachment_id)
+            if not attachments:
+                del self.records[record_id]
+        return self.changes["removed"]
+
+    def summary(self) -> dict:
+        """Counts of added, changed, unchanged and removed attachments."""
+        return {status: len(keys) for status, keys in self.changes.items()}
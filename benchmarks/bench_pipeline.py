@@ -0,0 +1,286 @@
+"""
+Benchmark every pipeline stage on a synthetic corpus against a mock LLM.
+
+Generates invoice/order PDFs (see synthetic_pdfs.py), serves canned
+chat-completions locally (see mock_llm.py) and times each document through
+parse -> clean -> classify -> rules -> compact -> llm -> post_process -> evaluate with the repo's
+own functions. Caches are disabled so every run does the real work. The
+report holds per-stage throughput and p50/p95 latency plus the run's
+parameters and git commit, so runs can be compared:
+
+    python benchmarks/bench_pipeline.py --docs 50 --items 30 --pages 2 --latency 0.3
+    python benchmarks/bench_pipeline.py --compare benchmarks/results/baseline.json
+
+``--end-to-end`` also times the full orchestrator (pipeline/run_pipeline.py)
+over the same corpus.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+for stage_dir in ("", "pdf_json", "prompt", "output", "pipeline", "benchmarks"):
+    sys.path.insert(0, str(ROOT / stage_dir))
+
+from synthetic_pdfs import generate_corpus
+from mock_llm import MockChatServer
+
+STAGES = ("parse", "clean", "classify", "rules", "compact", "llm", "post_process", "evaluate")
+DEFAULT_RESULTS_DIR = ROOT / "benchmarks" / "results"
+FALLBACK_PROMPT = "Extract the document's fields and output them as a JSON object."
+
+
+def percentile(values, q: float) -> float:
+    """Nearest-rank percentile (``q`` in 0..100) of a non-empty list."""
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * q // 100))
+    return ordered[int(rank) - 1]
+
+
+def summarize(seconds: list) -> dict:
+    total = sum(seconds)
+    return {
+        "count": len(seconds),
+        "total_s": round(total, 4),
+        "docs_per_s": round(len(seconds) / total, 2) if total else None,
+        "mean_ms": round(total / len(seconds) * 1000, 3),
+        "p50_ms": round(percentile(seconds, 50) * 1000, 3),
+        "p95_ms": round(percentile(seconds, 95) * 1000, 3),
+        "max_ms": round(max(seconds) * 1000, 3),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def canned_reply(record: dict) -> dict:
+    """What a perfect model would answer: the ground truth in the raw (pre post-processing) shape."""
+    reply = json.loads(record["Expected Output"])
+    if "products" in reply:
+        reply["product"] = reply.pop("products")
+    return reply
+
+
+def prepare_workspace(workdir: Path, args) -> list:
+    """Corpus under workdir/airtable_attachments and prompts under workdir/generated_prompts."""
+    records = generate_corpus(str(workdir / "airtable_attachments"), args.docs, args.items, args.pages,
+                              args.filler_lines, not args.unruled, args.seed)
+    prompt_dir = workdir / "generated_prompts"
+    prompt_dir.mkdir(parents=True, exist_ok=True)
+    for name in ("invoice_prompt.txt", "order_prompt.txt"):
+        source = ROOT / "generated_prompts" / name
+        if source.exists():
+            shutil.copy(source, prompt_dir / name)
+        else:
+            (prompt_dir / name).write_text(FALLBACK_PROMPT, encoding="utf-8")
+    return records
+
+
+def configure_environment(workdir: Path, server_url: str):
+    """Point every module at the workspace and mock server; must run before they are imported."""
+    os.environ.update({
+        "BEAM_BASE_DIR": str(workdir),
+        "OPENAI_BASE_URL": server_url,
+        "OPENAI_API_KEY": "mock-key",
+        "OPENAI_RPM": "1000000",
+        "OPENAI_TPM": "1000000000",
+        "PDF_CACHE_DISABLE": "1",
+        "LLM_CACHE_DISABLE": "1",
+        "PROMPT_REGISTRY_PATH": str(workdir / "generated_prompts" / "prompt_registry.json"),
+    })
+
+
+def run_stages(records: list, attachments_dir: Path, warmup: int = 1):
+    """Time each stage per document; returns ({stage: [seconds]}, [accuracy], tokens saved)."""
+    import pdfplumber
+    from pdf_to_json import clean_text, _release_page
+    from prompt import KEYWORD_MAPPINGS, classify_document
+    from common.compaction import PAGE_BREAK, compact_text
+    import output1
+    from columnar_eval import ColumnarEvaluator
+
+    timings = {stage: [] for stage in STAGES}
+    accuracies = []
+    tokens_saved = 0
+    for n, record in enumerate(records):
+        path = attachments_dir / record["File"]
+        spent = {}
+
+        start = time.perf_counter()
+        raw_pages = []
+        with pdfplumber.open(path) as pdf:
+            for page in pdf.pages:
+                try:
+                    raw_pages.append(page.extract_text() or "")
+                finally:
+                    _release_page(page)
+        spent["parse"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        pages = [{"page_number": i, "content": clean_text(text) if text else ""}
+                 for i, text in enumerate(raw_pages, start=1)]
+        spent["clean"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        doc_type = classify_document({"pages": pages})["doc_type"]
+        spent["classify"] = time.perf_counter() - start
+
+        # Timed on its own; the llm stage always runs so model latency stays comparable across runs
+        start = time.perf_counter()
+        output1.RULES.extract("\n".join(raw_pages), doc_type)
+        spent["rules"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        # clean_text folds each page onto one line; the extractors send the raw lines
+        compacted = compact_text(f"\n{PAGE_BREAK}\n".join(raw_pages), KEYWORD_MAPPINGS)
+        spent["compact"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        prompt = output1.INVOICE_PROMPT if doc_type == "Invoice" else output1.ORDER_PROMPT
+        reply = output1.call_gpt4o(prompt, compacted["text"])
+        spent["llm"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        try:
+            extracted = output1.make_record(path, doc_type, output1.post_process(reply or {}))
+        except Exception as e:
+            # Scored like a failed reply instead of aborting the benchmark
+            print(f"Post-processing failed for {path.name}: {e}", file=sys.stderr)
+            extracted = output1.make_record(path, doc_type, {})
+        spent["post_process"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        result = ColumnarEvaluator([record]).evaluate([extracted])
+        spent["evaluate"] = time.perf_counter() - start
+
+        if n < warmup:
+            continue
+        for stage in STAGES:
+            timings[stage].append(spent[stage])
+        accuracies.append(result.get("accuracy", 0.0))
+        tokens_saved += compacted["tokens_before"] - compacted["tokens_after"]
+    return timings, accuracies, tokens_saved
+
+
+def run_end_to_end(records: list, attachments_dir: Path) -> dict:
+    from run_pipeline import Pipeline, iter_documents
+
+    pipeline = Pipeline(attachments_dir)
+    start = time.perf_counter()
+    results = asyncio.run(pipeline.run(iter_documents(records)))
+    elapsed = time.perf_counter() - start
+    return {
+        "documents": len(results),
+        "failed": sum(1 for doc in results if doc["error"]),
+        "elapsed_s": round(elapsed, 4),
+        "docs_per_s": round(len(results) / elapsed, 2) if elapsed else None,
+        "stage_busy_s": {stage: round(s, 4) for stage, s in pipeline.stage_seconds.items()},
+        "workers": pipeline.workers,
+    }
+
+
+def compare(report: dict, baseline: dict, max_regression: float) -> bool:
+    """Print per-stage p50/p95 against a baseline report; False if any p95 regressed too far."""
+    ok = True
+    print(f"{'stage':<14}{'p50 ms':>12}{'base':>10}{'p95 ms':>12}{'base':>10}{'change':>10}")
+    for stage, current in report["stages"].items():
+        base = baseline.get("stages", {}).get(stage)
+        if not base or not current:
+            continue
+        change = current["p95_ms"] / base["p95_ms"] - 1 if base["p95_ms"] else 0.0
+        flag = ""
+        if change > max_regression:
+            ok = False
+            flag = "  REGRESSION"
+        print(f"{stage:<14}{current['p50_ms']:>12.2f}{base['p50_ms']:>10.2f}"
+              f"{current['p95_ms']:>12.2f}{base['p95_ms']:>10.2f}{change:>+10.1%}{flag}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the extraction pipeline per stage with a mock LLM.")
+    parser.add_argument("--docs", type=int, default=40, help="Documents in the synthetic corpus")
+    parser.add_argument("--items", type=int, default=20, help="Line items per document")
+    parser.add_argument("--pages", type=int, default=1, help="Pages per document")
+    parser.add_argument("--filler-lines", type=int, default=10, help="Lines of boilerplate per page")
+    parser.add_argument("--unruled", action="store_true", help="Item tables without ruling lines")
+    parser.add_argument("--latency", type=float, default=0.2, help="Mock LLM latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Mock LLM latency jitter (+/- seconds)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--warmup", type=int, default=1, help="Leading documents left out of the timings")
+    parser.add_argument("--end-to-end", action="store_true", help="Also time pipeline/run_pipeline.py")
+    parser.add_argument("--workdir", help="Keep the generated corpus here (default: a temp dir)")
+    parser.add_argument("--out", help="Report path (default: benchmarks/results/pipeline-<time>.json)")
+    parser.add_argument("--compare", help="Baseline report to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.2,
+                        help="Allowed p95 slowdown vs. the baseline before exiting with status 1")
+    args = parser.parse_args()
+
+    workdir = Path(args.workdir) if args.workdir else Path(tempfile.mkdtemp(prefix="beam-bench-"))
+    records = prepare_workspace(workdir, args)
+    attachments_dir = workdir / "airtable_attachments" / "attachments"
+    replies = {record["File ID"]: canned_reply(record) for record in records}
+
+    with MockChatServer(replies, default_reply={"prompt": FALLBACK_PROMPT}, latency=args.latency,
+                        jitter=args.jitter, seed=args.seed) as server:
+        configure_environment(workdir, server.url)
+        timings, accuracies, tokens_saved = run_stages(records, attachments_dir, args.warmup)
+        end_to_end = run_end_to_end(records, attachments_dir) if args.end_to_end else None
+        llm_requests = server.requests
+
+    report = {
+        "benchmark": "pipeline",
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "params": {k: v for k, v in vars(args).items() if k not in ("out", "compare", "workdir")},
+        "corpus": {
+            "documents": len(records),
+            "bytes": sum((attachments_dir / r["File"]).stat().st_size for r in records),
+        },
+        "stages": {stage: summarize(seconds) if seconds else None for stage, seconds in timings.items()},
+        "accuracy": round(sum(accuracies) / len(accuracies), 4) if accuracies else None,
+        "llm_requests": llm_requests,
+        "tokens_saved": tokens_saved,
+        "end_to_end": end_to_end,
+    }
+
+    out = Path(args.out) if args.out else DEFAULT_RESULTS_DIR / f"pipeline-{time.strftime('%Y%m%d-%H%M%S')}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    if not args.workdir:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    for stage, summary in report["stages"].items():
+        if summary:
+            print(f"{stage:<14} {summary['docs_per_s']:>10} docs/s  p50 {summary['p50_ms']:>9.2f} ms"
+                  f"  p95 {summary['p95_ms']:>9.2f} ms")
+    if end_to_end:
+        print(f"{'end-to-end':<14} {end_to_end['docs_per_s']:>10} docs/s  ({end_to_end['elapsed_s']} s)")
+    print(f"Mean accuracy {report['accuracy']} | report written to {out}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        if not compare(report, baseline, args.max_regression):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
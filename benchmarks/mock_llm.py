@@ -0,0 +1,103 @@
+"""
+Local stand-in for the OpenAI chat-completions endpoint.
+
+Replies are canned: the server looks for a "Beleg-ID: <id>" marker in the
+request's messages and answers with the JSON registered for that id (or the
+default reply), after a configurable latency with optional seeded jitter.
+Responses carry usage and x-ratelimit-* headers like the real API, so the
+shared scheduler and response cache behave as they do in production.
+
+Point a client at it with ``OPENAI_BASE_URL=<server.url>``.
+"""
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+_MARKER = re.compile(r"Beleg-ID:\s*(\S+)")
+
+
+class MockChatServer:
+    def __init__(self, replies: dict = None, default_reply: dict = None, latency: float = 0.2,
+                 jitter: float = 0.0, seed: int = 0, host: str = "127.0.0.1", port: int = 0):
+        self.replies = dict(replies or {})
+        self.default_reply = default_reply if default_reply is not None else {}
+        self.latency = latency
+        self.jitter = jitter
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.requests = 0
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def _delay(self) -> float:
+        with self._lock:
+            self.requests += 1
+            jitter = self._rng.uniform(-self.jitter, self.jitter) if self.jitter else 0.0
+        return max(0.0, self.latency + jitter)
+
+    def reply_for(self, body: dict) -> str:
+        text = "\n".join(str(m.get("content") or "") for m in body.get("messages", []))
+        match = _MARKER.search(text)
+        reply = self.replies.get(match.group(1)) if match else None
+        return json.dumps(reply if reply is not None else self.default_reply, ensure_ascii=False)
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                if not self.path.rstrip("/").endswith("/chat/completions"):
+                    self.send_error(404)
+                    return
+                length = int(self.headers.get("Content-Length") or 0)
+                body = json.loads(self.rfile.read(length) or b"{}")
+                time.sleep(server._delay())
+                content = server.reply_for(body)
+                prompt_chars = sum(len(str(m.get("content") or "")) for m in body.get("messages", []))
+                usage = {"prompt_tokens": prompt_chars // 4, "completion_tokens": len(content) // 4}
+                usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+                payload = json.dumps({
+                    "id": "chatcmpl-mock",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": body.get("model", "gpt-4o"),
+                    "choices": [{"index": 0, "finish_reason": "stop", "logprobs": None,
+                                 "message": {"role": "assistant", "content": content}}],
+                    "usage": usage,
+                }).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.send_header("x-ratelimit-remaining-requests", "100000")
+                self.send_header("x-ratelimit-remaining-tokens", "100000000")
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="mock-llm", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
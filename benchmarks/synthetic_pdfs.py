@@ -0,0 +1,214 @@
+"""
+Deterministic synthetic invoice and order PDFs with matching ground truth.
+
+Documents are German-language like the real corpus (Rechnung/Bestellung,
+Artikel-Nr, Menge, Preis, ...), carry a "Beleg-ID" marker the mock LLM uses
+to pick its canned reply, and are written with a minimal built-in PDF writer
+so no extra dependency is needed. Line items are laid out as a table, with
+ruling lines when ``ruled`` is set.
+
+    python benchmarks/synthetic_pdfs.py bench_corpus --docs 100 --items 40 --pages 3
+"""
+import argparse
+import json
+import os
+import random
+
+PAGE_WIDTH, PAGE_HEIGHT = 595, 842  # A4 in points
+MARGIN = 50
+FONT_SIZE = 9
+LEADING = 12
+
+COMPANIES = ["Prima Labs GmbH", "Nordwerk AG", "Kessler & Söhne KG", "Alpen Logistik GmbH",
+             "Rheinmetall Service GmbH", "Bäckerei Müller", "Hansa Bürobedarf GmbH"]
+PEOPLE = ["Jonas Weber", "Anna Schmidt", "Lukas Fischer", "Marie Wagner", "Felix Becker"]
+STREETS = ["Hauptstraße 12", "Industriestraße 4a", "Am Hafen 7", "Lindenallee 33"]
+CITIES = [("Berlin", "10115"), ("Hamburg", "20095"), ("München", "80331"), ("Köln", "50667")]
+PRODUCTS = ["Schrauben M6", "Kabelbinder 200mm", "Druckerpapier A4", "Schutzhandschuhe",
+            "Klebeband transparent", "Hydrauliköl 5L", "Kugellager 6204", "Toner schwarz"]
+FILLER = ("Es gelten unsere allgemeinen Geschäftsbedingungen. Zahlbar innerhalb von 30 Tagen "
+          "ohne Abzug. Bei Rückfragen wenden Sie sich bitte an Ihren Ansprechpartner.")
+
+
+def _escape(text: str) -> bytes:
+    raw = text.encode("cp1252", errors="replace")
+    return raw.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)")
+
+
+def _page_stream(page) -> bytes:
+    """Content stream for one page: ``lines`` of text, an optional table (and grid), then ``footer`` lines."""
+    out = [b"BT", b"/F1 %d Tf" % FONT_SIZE, b"%d TL" % LEADING,
+           b"%d %d Td" % (MARGIN, PAGE_HEIGHT - MARGIN)]
+    for line in page["lines"]:
+        out.append(b"(" + _escape(line) + b") Tj T*")
+    out.append(b"ET")
+
+    table = page.get("table")
+    footer_top = PAGE_HEIGHT - MARGIN - (len(page["lines"]) + 1) * LEADING
+    if table:
+        columns, top = table["columns"], table["top"]
+        for r, row in enumerate(table["rows"]):
+            y = top - (r + 1) * LEADING + 3
+            for x, cell in zip(columns, row):
+                out.append(b"BT /F1 %d Tf %d %d Td (" % (FONT_SIZE, x + 3, y) + _escape(str(cell)) + b") Tj ET")
+        if table.get("ruled"):
+            bottom = top - len(table["rows"]) * LEADING
+            right = PAGE_WIDTH - MARGIN
+            out.append(b"0.5 w")
+            for r in range(len(table["rows"]) + 1):
+                y = top - r * LEADING
+                out.append(b"%d %d m %d %d l S" % (columns[0], y, right, y))
+            for x in list(columns) + [right]:
+                out.append(b"%d %d m %d %d l S" % (x, top, x, bottom))
+        footer_top = top - (len(table["rows"]) + 1) * LEADING
+
+    if page.get("footer"):
+        out += [b"BT", b"/F1 %d Tf" % FONT_SIZE, b"%d TL" % LEADING, b"%d %d Td" % (MARGIN, footer_top)]
+        for line in page["footer"]:
+            out.append(b"(" + _escape(line) + b") Tj T*")
+        out.append(b"ET")
+    return b"\n".join(out)
+
+
+def write_pdf(path: str, pages: list) -> None:
+    """Write ``pages`` (dicts with ``lines`` and optional ``table`` and ``footer``) as a PDF file."""
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # page tree, filled in once the page objects are numbered
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>",
+    ]
+    page_ids = []
+    for page in pages:
+        stream = _page_stream(page)
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        content_id = len(objects)
+        objects.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] "
+                       b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>"
+                       % (PAGE_WIDTH, PAGE_HEIGHT, content_id))
+        page_ids.append(len(objects))
+    kids = b" ".join(b"%d 0 R" % i for i in page_ids)
+    objects[1] = b"<< /Type /Pages /Kids [" + kids + b"] /Count %d >>" % len(page_ids)
+
+    data = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(data))
+        data += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(data)
+    data += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        data += b"%010d 00000 n \n" % offset
+    data += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+def _paginate(header: list, table_header: list, rows: list, pages: int, filler_lines: int,
+              columns, ruled: bool, footer: list) -> list:
+    """
+    Spread the header, item rows and filler text over ``pages`` pages, or
+    more if the rows would not fit; ``footer`` goes below the last table.
+    """
+    capacity = max(1, (PAGE_HEIGHT - 2 * MARGIN) // LEADING - len(header) - filler_lines - len(footer) - 3)
+    pages = max(1, pages, -(-len(rows) // capacity))
+    per_page = -(-len(rows) // pages) if rows else 0
+    result = []
+    for p in range(pages):
+        lines = list(header) if p == 0 else [f"Seite {p + 1} von {pages}"]
+        chunk = rows[p * per_page:(p + 1) * per_page]
+        lines += [FILLER[:90]] * filler_lines
+        top = PAGE_HEIGHT - MARGIN - (len(lines) + 1) * LEADING
+        page = {"lines": lines}
+        if chunk:
+            page["table"] = {"columns": columns, "top": top, "rows": [table_header] + chunk, "ruled": ruled}
+        result.append(page)
+    result[-1]["footer"] = footer
+    return result
+
+
+def make_invoice(doc_id: str, rng: random.Random, items: int, pages: int, filler_lines: int, ruled: bool):
+    """Pages and ground truth (INVOICE_FORMAT shape) of one invoice."""
+    company = rng.choice(COMPANIES)
+    lines_items = [{"name": rng.choice(PRODUCTS), "price": round(rng.uniform(1, 500), 2)} for _ in range(items)]
+    net = round(sum(item["price"] for item in lines_items), 2)
+    gross = round(net * 1.19, 2)
+    header = [f"Beleg-ID: {doc_id}", company, f"{rng.choice(STREETS)}, {' '.join(rng.choice(CITIES)[::-1])}",
+              f"Rechnung Nr. R-{rng.randint(10000, 99999)}", f"Belegdatum: {rng.randint(1, 28):02d}.{rng.randint(1, 12):02d}.2024",
+              f"Kundennummer: {rng.randint(1000, 9999)}", ""]
+    rows = [[i + 1, item["name"], f"{item['price']:.2f}".replace(".", ",") + " EUR"]
+            for i, item in enumerate(lines_items)]
+    footer = [f"Nettowert: {net:.2f} EUR", f"Gesamtsumme (Bruttopreis): {gross:.2f} EUR"]
+    page_list = _paginate(header, ["Pos", "Bezeichnung", "Preis"], rows, pages, filler_lines,
+                          (MARGIN, MARGIN + 40, MARGIN + 360), ruled, footer)
+    truth = {"total_gross": gross, "total_net": net, "business_name": company, "items": lines_items}
+    return page_list, truth
+
+
+def make_order(doc_id: str, rng: random.Random, items: int, pages: int, filler_lines: int, ruled: bool):
+    """Pages and ground truth (ORDER_FORMAT shape, ``products`` as after post-processing) of one order."""
+    company, person = rng.choice(COMPANIES), rng.choice(PEOPLE)
+    email = person.lower().replace(" ", ".") + "@example.de"
+    street, (city, plz) = rng.choice(STREETS), rng.choice(CITIES)
+    order_number = str(rng.randint(20240000, 20249999))
+    order_date = f"{rng.randint(1, 28):02d}.{rng.randint(1, 12):02d}.2024"
+    products = [{"product_position": i + 1, "product_article_code": f"ART-{rng.randint(100000, 999999)}",
+                 "product_quantity": rng.randint(1, 200)} for i in range(items)]
+    header = [f"Beleg-ID: {doc_id}", "Bestellung", f"Firma: {company}", f"Ansprechpartner: {person}",
+              f"Email: {email}", f"Bestellnummer: {order_number}", f"Datum: {order_date}",
+              f"Lieferadresse: {street}, PLZ {plz} Ort {city}", ""]
+    rows = [[p["product_position"], p["product_article_code"], p["product_quantity"], "Stück"] for p in products]
+    page_list = _paginate(header, ["Pos", "Artikel-Nr", "Menge", "Einheit"], rows, pages, filler_lines,
+                          (MARGIN, MARGIN + 40, MARGIN + 200, MARGIN + 300), ruled, [])
+    truth = {
+        "buyer": {"buyer_company_name": company, "buyer_person_name": person, "buyer_email_address": email},
+        "order": {"order_number": order_number, "order_date": order_date,
+                  "delivery": {"delivery_address_street": street, "delivery_address_city": city,
+                               "delivery_address_postal_code": plz}},
+        "products": products,
+    }
+    return page_list, truth
+
+
+def generate_corpus(out_dir: str, docs: int = 20, items: int = 20, pages: int = 1,
+                    filler_lines: int = 10, ruled: bool = True, seed: int = 0) -> list:
+    """
+    Write ``docs`` PDFs (alternating invoice/order) under ``out_dir/attachments``.
+
+    Returns airtable_data.json-shaped records (File ID, Dataset, File,
+    Expected Output), which are also saved to ``out_dir/records.json``.
+    """
+    rng = random.Random(seed)
+    attachments = os.path.join(out_dir, "attachments")
+    os.makedirs(attachments, exist_ok=True)
+    records = []
+    for n in range(docs):
+        dataset = "Invoice" if n % 2 == 0 else "Order"
+        file_id = f"{dataset}_bench{n:05d}"
+        make = make_invoice if dataset == "Invoice" else make_order
+        page_list, truth = make(file_id, rng, items, pages, filler_lines, ruled)
+        write_pdf(os.path.join(attachments, f"{file_id}.pdf"), page_list)
+        records.append({"File ID": file_id, "Dataset": dataset, "File": f"{file_id}.pdf",
+                        "Expected Output": json.dumps(truth, ensure_ascii=False, indent=2)})
+    with open(os.path.join(out_dir, "records.json"), "w", encoding="utf-8") as f:
+        json.dump(records, f, ensure_ascii=False, indent=2)
+    return records
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic invoice/order PDF corpus.")
+    parser.add_argument("out_dir", help="Output directory (attachments/ and records.json)")
+    parser.add_argument("--docs", type=int, default=20, help="Number of documents")
+    parser.add_argument("--items", type=int, default=20, help="Line items per document")
+    parser.add_argument("--pages", type=int, default=1, help="Pages per document")
+    parser.add_argument("--filler-lines", type=int, default=10, help="Lines of boilerplate per page")
+    parser.add_argument("--unruled", action="store_true", help="Draw item tables without ruling lines")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    records = generate_corpus(args.out_dir, args.docs, args.items, args.pages, args.filler_lines,
+                              not args.unruled, args.seed)
+    print(f"Wrote {len(records)} documents to {args.out_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+"""
+Token-budgeted compaction of extracted document text before the LLM call.
+
+The extracted text carries a lot the model does not need: headers and
+footers repeated on every page, payment terms and registry/bank footers, and
+blank or padded lines. compact_text() drops those, then ranks the remaining
+lines and, if the text is still over the token budget, drops the least
+useful lines until it fits:
+
+    keyword lines (any KEYWORD_MAPPINGS key), the lines
+    after them and the document header    kept longest
+    table rows                            (line items)
+    other lines with digits or an "@"     (dates, amounts, postal codes, emails)
+    everything else                       dropped first
+
+Pages are separated by PAGE_BREAK lines; a line already seen on an earlier
+page is a repeated header or footer, but lines repeating within one page and
+item-table rows (common.item_table) are always kept. Keywords match whole
+words, case-insensitively. Lines keep their original order. Tokens are counted with the scheduler's local tokenizer: tiktoken
+(in requirements.txt), or a chars/4 estimate where it is not installed.
+
+    COMPACT_MAX_TOKENS=6000     budget for the document text (0 = no budget)
+    COMPACT_BOILERPLATE=path    extra boilerplate regexes, one per line
+    COMPACT_DISABLE=1           pass text through unchanged
+"""
+import logging
+import os
+import re
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from common.item_table import item_rows
+from common.llm_scheduler import count_tokens
+from common.telemetry import count
+
+COMPACT_MAX_TOKENS = int(os.getenv("COMPACT_MAX_TOKENS", "6000"))
+COMPACT_DISABLE = os.getenv("COMPACT_DISABLE", "0") == "1"
+# Lines after a keyword hit that are kept with it (values often sit on the next line)
+CONTEXT_LINES = 2
+# Leading lines kept with the keyword lines: letterhead with the sender's name
+HEADER_LINES = 5
+# Line between two pages of extracted text (a form feed)
+PAGE_BREAK = "\f"
+
+# Case-insensitive; a line matching one of these is dropped unless it holds a keyword
+DEFAULT_BOILERPLATE = (
+    r"\bseite\s+\d+\s*(von|/)\s*\d+",
+    r"\bpage\s+\d+\s*(of|/)\s*\d+",
+    r"allgemeinen\s+geschäftsbedingungen",
+    r"\bagb\b",
+    r"\biban\b",
+    r"\bbic\b",
+    r"bankverbindung",
+    r"\bust-?id",
+    r"steuer-?nr",
+    r"amtsgericht",
+    r"handelsregister|\bhrb\s*\d",
+    r"geschäftsführ",
+    r"sitz der gesellschaft",
+    r"datenschutz",
+)
+
+_SPACES = re.compile(r"[ \t\u00a0]+")
+_VALUE = re.compile(r"[\d@]")
+
+
+def load_boilerplate(path: str = None) -> tuple:
+    """DEFAULT_BOILERPLATE plus the patterns in ``path`` (or $COMPACT_BOILERPLATE), if any."""
+    patterns = list(DEFAULT_BOILERPLATE)
+    path = path or os.getenv("COMPACT_BOILERPLATE")
+    if path:
+        with open(path, "r", encoding="utf-8") as f:
+            patterns += [line.strip() for line in f if line.strip() and not line.startswith("#")]
+    return tuple(patterns)
+
+
+def _compile(patterns):
+    if not patterns:
+        return None
+    return re.compile("|".join(f"(?:{p})" for p in patterns), re.IGNORECASE)
+
+
+_boilerplate = None
+
+
+def _default_boilerplate():
+    global _boilerplate
+    if _boilerplate is None:
+        _boilerplate = _compile(load_boilerplate())
+    return _boilerplate
+
+
+def _is_table_row(line: str) -> bool:
+    return " | " in line and bool(_VALUE.search(line))
+
+
+def compact_text(text: str, keywords=(), max_tokens: int = None, boilerplate=None) -> dict:
+    """
+    Compact ``text`` for an extraction prompt.
+
+    ``keywords`` are the schema's target labels (e.g. KEYWORD_MAPPINGS), and
+    ``boilerplate`` a list of regexes replacing the configured ones. Returns
+    ``{"text", "tokens_before", "tokens_after", "dropped_lines", "over_budget"}``;
+    ``over_budget`` is True if even the top-ranked lines did not fit.
+    """
+    tokens_before = count_tokens(text)
+    if COMPACT_DISABLE:
+        return {"text": text, "tokens_before": tokens_before, "tokens_after": tokens_before,
+                "dropped_lines": 0, "over_budget": False}
+    if max_tokens is None:
+        max_tokens = COMPACT_MAX_TOKENS
+    noise = _default_boilerplate() if boilerplate is None else _compile(boilerplate)
+    # Whole words only: short keys ("ort", "plz") must not hit inside unrelated words
+    wanted = _compile([rf"\b{re.escape(k.lower())}\b" for k in keywords])
+
+    # split("\n") rather than splitlines(), which would also split at (and lose) the page breaks
+    raw_lines = text.split("\n")
+    items = set(item_rows(raw_lines))
+    lines = []  # (line, rank)
+    first_page = {}  # line -> page it first appeared on
+    page = 0
+    keep_until = HEADER_LINES
+    for index, line in enumerate(raw_lines):
+        if line == PAGE_BREAK:
+            page += 1
+            continue
+        line = _SPACES.sub(" ", line).strip()
+        if not line:
+            continue
+        hit = wanted is not None and wanted.search(line) is not None
+        if not hit and noise is not None and noise.search(line):
+            continue
+        table_row = index in items or _is_table_row(line)
+        # Lines from an earlier page again are page headers/footers; item rows may repeat
+        if first_page.setdefault(line, page) != page and not table_row:
+            continue
+        if hit:
+            keep_until = len(lines) + 1 + CONTEXT_LINES
+        if hit or len(lines) < keep_until:
+            rank = 3
+        elif table_row:
+            rank = 2
+        elif _VALUE.search(line):
+            rank = 1
+        else:
+            rank = 0
+        lines.append((line, rank))
+
+    over_budget = False
+    if max_tokens:
+        costs = [count_tokens(line) + 1 for line, _ in lines]
+        total = sum(costs)
+        keep = [True] * len(lines)
+        # Drop the lowest-ranked lines first, later ones before earlier ones
+        for rank in (0, 1, 2, 3):
+            for i in range(len(lines) - 1, -1, -1):
+                if total <= max_tokens:
+                    break
+                if keep[i] and lines[i][1] == rank:
+                    keep[i] = False
+                    total -= costs[i]
+        over_budget = total > max_tokens
+        lines = [entry for entry, kept in zip(lines, keep) if kept]
+
+    compacted = "\n".join(line for line, _ in lines)
+    tokens_after = count_tokens(compacted)
+    count("compaction.tokens_saved", tokens_before - tokens_after)
+    if over_budget:
+        logging.warning(f"Document text exceeds the {max_tokens}-token budget even after compaction")
+    return {
+        "text": compacted,
+        "tokens_before": tokens_before,
+        "tokens_after": tokens_after,
+        "dropped_lines": len([l for l in raw_lines if l.strip()]) - len(lines),
+        "over_budget": over_budget,
+    }
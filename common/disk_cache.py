@@ -0,0 +1,110 @@
+"""
+Small JSON-file cache shared by the PDF text and LLM response caches.
+
+Each entry is one JSON file under ``root``. Writes are atomic, reads bump
+the file's mtime, and once the directory grows past ``max_bytes`` the least
+recently used entries are deleted. Entries older than ``ttl`` seconds (if
+set) are treated as misses and removed.
+"""
+import json
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+
+
+class DiskCache:
+    def __init__(self, root, max_bytes: int, ttl: float = None):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._size = None
+        self._lock = threading.Lock()
+
+    def load(self, relpath):
+        """Return the stored payload dict, or None if missing, unreadable or expired."""
+        path = self.root / relpath
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                payload = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if self.ttl is not None and time.time() - payload.get("created", 0) > self.ttl:
+            try:
+                path.unlink()
+            except OSError:
+                pass
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return payload
+
+    def store(self, relpath, payload: dict):
+        """Write a payload atomically, then evict old entries if over the size limit."""
+        path = self.root / relpath
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        payload = dict(payload, created=time.time())
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(payload, f, ensure_ascii=False)
+        with self._lock:
+            # Overwriting a key replaces its bytes rather than adding to them
+            try:
+                old_size = path.stat().st_size
+            except OSError:
+                old_size = 0
+            os.replace(tmp_path, path)
+            if self._size is None:
+                self._size = self.size()
+            else:
+                self._size += path.stat().st_size - old_size
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _entries(self):
+        if not self.root.exists():
+            return []
+        return [p for p in self.root.rglob("*.json") if p.is_file()]
+
+    def size(self) -> int:
+        """Total bytes of all entries on disk."""
+        total = 0
+        for path in self._entries():
+            try:
+                total += path.stat().st_size
+            except OSError:
+                pass
+        return total
+
+    def _evict(self):
+        """Delete least recently used entries until the cache is under 90% of its limit."""
+        entries = []
+        for path in self._entries():
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        entries.sort()
+        total = sum(size for _, size, _ in entries)
+        target = self.max_bytes * 0.9
+        for _, size, path in entries:
+            if total <= target:
+                break
+            try:
+                path.unlink()
+                total -= size
+            except OSError:
+                pass
+        self._size = total
+
+    def clear(self, relpath=None):
+        """Delete everything, or only the entries under ``relpath``."""
+        target = self.root / relpath if relpath else self.root
+        if target.exists():
+            shutil.rmtree(target)
+        with self._lock:
+            self._size = None
@@ -0,0 +1,36 @@
+"""
+Where a document's item table is: the position-numbered rows the rule
+extractor reads and compaction must never drop.
+
+A numbered line is an item row if the layout extractor printed it as table
+cells ("3 | ART-1 | 5 | Stück"), if it sits right under a column heading,
+or if its position continues a neighbouring row's; a lone numbered line
+elsewhere ("30 Tage netto") is not.
+"""
+import re
+
+# Item rows as the layout extractor ("3 | ART-1 | 5 | Stück") or plain text ("3 ART-1 5 Stück") prints them
+ITEM_ROW = re.compile(r"^\d{1,4}(?: \| | |\. )\S")
+# Column headings of an item table ("Pos | Artikel-Nr | Menge", "Pos. Bezeichnung Preis")
+TABLE_HEADING = re.compile(r"\b(?:pos(?:ition)?|artikel|bezeichnung|beschreibung|menge|anzahl|preis|betrag)\b",
+                           re.IGNORECASE)
+# Numbered lines at most this many lines apart, with positions at most this far apart, form one table
+ROW_GAP = 3
+MAX_POSITION_STEP = 10
+
+
+def item_rows(lines) -> list:
+    """Indices of the lines in the item table (see the module docstring)."""
+    lines = [line.strip() for line in lines]
+    candidates = [(i, int(re.match(r"\d+", line).group())) for i, line in enumerate(lines) if ITEM_ROW.match(line)]
+    rows = []
+    for k, (i, position) in enumerate(candidates):
+        steps = []
+        if k > 0 and i - candidates[k - 1][0] <= ROW_GAP:
+            steps.append(position - candidates[k - 1][1])
+        if k + 1 < len(candidates) and candidates[k + 1][0] - i <= ROW_GAP:
+            steps.append(candidates[k + 1][1] - position)
+        headed = i > 0 and len({h.lower() for h in TABLE_HEADING.findall(lines[i - 1])}) >= 2
+        if " | " in lines[i] or headed or any(0 < step <= MAX_POSITION_STEP for step in steps):
+            rows.append(i)
+    return rows
@@ -0,0 +1,120 @@
+"""
+Persistent cache of chat-completion responses.
+
+The key is a SHA-256 over the model, the full message list (system prompt,
+extraction prompt and document text) and every sampling parameter, so a hit
+means the request is identical to one already paid for. Entries store the raw
+completion and its token usage and expire after LLM_CACHE_TTL_DAYS.
+
+    LLM_CACHE_BYPASS=1   skip lookups but still store fresh responses
+    LLM_CACHE_DISABLE=1  neither read nor write the cache
+    python common/llm_cache.py --clear
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import threading
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from common.disk_cache import DiskCache
+
+DEFAULT_CACHE_DIR = Path(__file__).resolve().parent.parent / ".cache" / "llm_responses"
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+DEFAULT_TTL_DAYS = 30
+# Request options that do not change the completion
+_TRANSPORT_KWARGS = {"timeout", "extra_headers", "extra_query", "extra_body"}
+
+
+def request_key(kwargs: dict) -> str:
+    """Stable hash of a chat-completions request's model, messages and sampling parameters."""
+    semantic = {k: v for k, v in kwargs.items() if k not in _TRANSPORT_KWARGS}
+    canonical = json.dumps(semantic, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class LLMResponseCache:
+    def __init__(self, root=None, max_bytes: int = None, ttl_days: float = None,
+                 enabled: bool = None, bypass: bool = None):
+        root = Path(root or os.getenv("LLM_CACHE_DIR") or DEFAULT_CACHE_DIR)
+        if max_bytes is None:
+            max_mb = os.getenv("LLM_CACHE_MAX_MB")
+            max_bytes = int(float(max_mb) * 1024 * 1024) if max_mb else DEFAULT_MAX_BYTES
+        if ttl_days is None:
+            ttl_days = float(os.getenv("LLM_CACHE_TTL_DAYS", DEFAULT_TTL_DAYS))
+        if enabled is None:
+            enabled = os.getenv("LLM_CACHE_DISABLE", "0") != "1"
+        if bypass is None:
+            bypass = os.getenv("LLM_CACHE_BYPASS", "0") == "1"
+        self.store = DiskCache(root, max_bytes, ttl=ttl_days * 86400 if ttl_days > 0 else None)
+        self.enabled = enabled
+        self.bypass = bypass
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "saved_prompt_tokens": 0,
+                          "saved_completion_tokens": 0}
+
+    @staticmethod
+    def _relpath(key: str) -> Path:
+        return Path(key[:2]) / f"{key}.json"
+
+    def lookup(self, kwargs: dict):
+        """Return the cached completion as a dict, or None (also when disabled or bypassed)."""
+        if not self.enabled or self.bypass:
+            return None
+        payload = self.store.load(self._relpath(request_key(kwargs)))
+        with self._lock:
+            if payload is None:
+                self._counters["misses"] += 1
+                return None
+            self._counters["hits"] += 1
+            usage = payload.get("usage") or {}
+            self._counters["saved_prompt_tokens"] += usage.get("prompt_tokens") or 0
+            self._counters["saved_completion_tokens"] += usage.get("completion_tokens") or 0
+        return payload["completion"]
+
+    def save(self, kwargs: dict, completion: dict):
+        """Store a raw completion dict (``response.model_dump()``) for this request."""
+        if not self.enabled:
+            return
+        payload = {
+            "model": kwargs.get("model"),
+            "completion": completion,
+            "usage": completion.get("usage"),
+        }
+        self.store.store(self._relpath(request_key(kwargs)), payload)
+
+    def clear(self):
+        self.store.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._counters)
+
+
+_default_cache = None
+
+
+def default_llm_cache() -> LLMResponseCache:
+    """Process-wide response cache configured from the LLM_CACHE_* environment variables."""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = LLMResponseCache()
+    return _default_cache
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or clear the LLM response cache.")
+    parser.add_argument("--clear", action="store_true", help="Delete all cached responses")
+    args = parser.parse_args()
+
+    cache = default_llm_cache()
+    if args.clear:
+        cache.clear()
+        print(f"Cleared cache entries under {cache.store.root}")
+    print(json.dumps({"root": str(cache.store.root), "bytes": cache.store.size()}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,326 @@
+"""
+Shared request scheduler for every OpenAI chat-completions call site.
+
+Keeps one requests-per-minute and one tokens-per-minute budget per process,
+charges each call its estimated prompt + completion tokens before sending it,
+retries rate-limit, timeout, connection and 5xx errors with jittered
+exponential backoff (preferring the server's retry-after), and tightens the
+budget from the x-ratelimit-* response headers.
+"""
+import asyncio
+import json
+import os
+import random
+import re
+import threading
+import time
+
+from common.telemetry import count, span
+
+try:
+    import tiktoken
+except ImportError:  # optional: fall back to a characters-per-token estimate
+    tiktoken = None
+
+DEFAULT_RPM = 500
+DEFAULT_TPM = 30000
+DEFAULT_COMPLETION_TOKENS = 1000
+CHARS_PER_TOKEN = 4
+# Per-message framing tokens added by the chat format
+MESSAGE_OVERHEAD_TOKENS = 4
+# Code fence a reply may wrap its JSON in
+_FENCE = re.compile(r"^```(?:json)?\s*([\s\S]*?)\s*```$", re.IGNORECASE)
+
+_encoding = None
+
+
+def count_tokens(text: str) -> int:
+    """Token count of ``text`` with tiktoken when installed, else a chars/4 estimate."""
+    global _encoding
+    if tiktoken is not None:
+        if _encoding is None:
+            try:
+                _encoding = tiktoken.encoding_for_model("gpt-4o")
+            except Exception:
+                _encoding = tiktoken.get_encoding("cl100k_base")
+        return len(_encoding.encode(text))
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def estimate_request_tokens(messages, max_tokens=None) -> int:
+    """Tokens a chat request counts against the TPM limit: prompt plus max completion."""
+    prompt = sum(count_tokens(str(m.get("content") or "")) + MESSAGE_OVERHEAD_TOKENS
+                 for m in messages or [])
+    return prompt + (max_tokens or DEFAULT_COMPLETION_TOKENS)
+
+
+def parse_reset(value) -> float:
+    """Parse an x-ratelimit-reset-* value such as "1s", "6m0s" or "20ms" into seconds."""
+    if not value:
+        return 0.0
+    units = {"h": 3600.0, "m": 60.0, "s": 1.0, "ms": 0.001}
+    parts = re.findall(r"(\d+(?:\.\d+)?)(ms|h|m|s)", str(value))
+    if not parts:
+        try:
+            return float(value)
+        except ValueError:
+            return 0.0
+    return sum(float(amount) * units[unit] for amount, unit in parts)
+
+
+class _MinuteBucket:
+    """Token bucket refilled at ``limit`` units per minute; reservations may go into debt."""
+
+    def __init__(self, limit: float):
+        self.limit = float(limit)
+        self.level = self.limit
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.level = min(self.limit, self.level + (now - self.updated) * self.limit / 60.0)
+        self.updated = now
+
+    def reserve(self, amount: float, now: float) -> float:
+        """Take ``amount`` units and return how long the caller must wait to cover any debt."""
+        self._refill(now)
+        self.level -= min(amount, self.limit)
+        return 0.0 if self.level >= 0 else -self.level * 60.0 / self.limit
+
+    def adjust(self, delta: float, now: float):
+        self._refill(now)
+        self.level = min(self.limit, self.level + delta)
+
+    def cap(self, remaining: float, now: float):
+        self._refill(now)
+        self.level = min(self.level, remaining)
+
+
+class LLMScheduler:
+    """
+    Budgeted, retrying wrapper around ``client.chat.completions.create``.
+
+    Use :meth:`chat` with an ``OpenAI`` client or :meth:`achat` with an
+    ``AsyncOpenAI`` client; both accept the usual ``create`` keyword arguments
+    and return the parsed completion. Clients should be built with
+    ``max_retries=0`` so retries are not stacked on top of the scheduler's.
+    """
+
+    def __init__(self, rpm: float = None, tpm: float = None, max_retries: int = None,
+                 base_delay: float = 1.0, max_delay: float = 60.0):
+        rpm = rpm or float(os.getenv("OPENAI_RPM", DEFAULT_RPM))
+        tpm = tpm or float(os.getenv("OPENAI_TPM", DEFAULT_TPM))
+        self.requests = _MinuteBucket(rpm)
+        self.tokens = _MinuteBucket(tpm)
+        self.max_retries = max_retries if max_retries is not None else int(os.getenv("OPENAI_MAX_RETRIES", "6"))
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+        self._counters = {"requests": 0, "retries": 0, "rate_limited": 0,
+                          "estimated_tokens": 0, "used_tokens": 0, "wait_seconds": 0.0}
+
+    # -- budget -------------------------------------------------------------
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self._counters[name] += amount
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._counters)
+        stats["wait_seconds"] = round(stats["wait_seconds"], 3)
+        return stats
+
+    def reserve(self, estimated_tokens: int) -> float:
+        """Charge one request and its tokens; return the seconds to wait before sending."""
+        with self._lock:
+            now = time.monotonic()
+            wait = max(self.requests.reserve(1, now), self.tokens.reserve(estimated_tokens, now))
+            wait = max(wait, self._paused_until - now)
+            self._counters["requests"] += 1
+            self._counters["estimated_tokens"] += estimated_tokens
+            self._counters["wait_seconds"] += wait
+        return wait
+
+    def pause(self, seconds: float):
+        """Hold back every caller for ``seconds`` (after a 429)."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def observe(self, headers, estimated_tokens: int, usage=None):
+        """Sync the budget with the server's rate-limit headers and the actual token usage."""
+        with self._lock:
+            now = time.monotonic()
+            if usage is not None and getattr(usage, "total_tokens", None) is not None:
+                self.tokens.adjust(estimated_tokens - usage.total_tokens, now)
+                self._counters["used_tokens"] += usage.total_tokens
+            if not headers:
+                return
+            for bucket, kind in ((self.requests, "requests"), (self.tokens, "tokens")):
+                remaining = headers.get(f"x-ratelimit-remaining-{kind}")
+                if remaining is None:
+                    continue
+                try:
+                    bucket.cap(float(remaining), now)
+                except ValueError:
+                    continue
+                if float(remaining) <= 0:
+                    reset = parse_reset(headers.get(f"x-ratelimit-reset-{kind}"))
+                    self._paused_until = max(self._paused_until, now + reset)
+
+    # -- retries ------------------------------------------------------------
+
+    def backoff(self, attempt: int) -> float:
+        """Full-jitter exponential backoff for ``attempt`` (0-based)."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    def retry_delay(self, error, attempt: int):
+        """Seconds to wait before retrying ``error``, or None if it should be raised."""
+        import openai
+
+        retryable = (openai.RateLimitError, openai.APITimeoutError,
+                     openai.APIConnectionError, openai.InternalServerError)
+        if attempt >= self.max_retries or not isinstance(error, retryable):
+            return None
+        delay = None
+        response = getattr(error, "response", None)
+        if response is not None:
+            headers = response.headers
+            if headers.get("retry-after-ms"):
+                delay = parse_reset(headers["retry-after-ms"] + "ms")
+            elif headers.get("retry-after"):
+                delay = parse_reset(headers["retry-after"])
+        if not delay or delay <= 0:
+            delay = self.backoff(attempt)
+        if isinstance(error, openai.RateLimitError):
+            self._count("rate_limited")
+            self.pause(delay)
+        self._count("retries")
+        self._count("wait_seconds", delay)
+        return delay
+
+    # -- calls --------------------------------------------------------------
+
+    @staticmethod
+    def _from_cache(cache, kwargs):
+        if cache is None:
+            return None
+        completion = cache.lookup(kwargs)
+        if completion is None:
+            return None
+        from openai.types.chat import ChatCompletion
+
+        return ChatCompletion.model_validate(completion)
+
+    @staticmethod
+    def _to_cache(cache, kwargs, response):
+        if cache is None:
+            return
+        if not cacheable(response):
+            count("llm.cache_rejected")
+            return
+        cache.save(kwargs, response.model_dump(mode="json"))
+
+    @staticmethod
+    def _record_usage(model, response):
+        usage = getattr(response, "usage", None)
+        if usage is None:
+            return
+        count("llm.prompt_tokens", usage.prompt_tokens or 0, model=model)
+        count("llm.completion_tokens", usage.completion_tokens or 0, model=model)
+
+    def chat(self, client, cache=None, **kwargs):
+        """
+        Scheduled ``client.chat.completions.create(**kwargs)``.
+
+        With ``cache`` (an :class:`llm_cache.LLMResponseCache`) an identical
+        earlier request is answered from disk without touching the budget.
+        """
+        cached = self._from_cache(cache, kwargs)
+        if cached is not None:
+            count("llm.cache_hits")
+            return cached
+        model = kwargs.get("model")
+        estimated = estimate_request_tokens(kwargs.get("messages"), kwargs.get("max_tokens"))
+        attempt = 0
+        while True:
+            time.sleep(self.reserve(estimated))
+            try:
+                with span("llm.request", model=model):
+                    raw = client.chat.completions.with_raw_response.create(**kwargs)
+            except Exception as e:
+                delay = self.retry_delay(e, attempt)
+                if delay is None:
+                    count("llm.failures", model=model)
+                    raise
+                count("llm.retries", model=model)
+                time.sleep(delay)
+                attempt += 1
+                continue
+            response = raw.parse()
+            self.observe(raw.headers, estimated, getattr(response, "usage", None))
+            self._record_usage(model, response)
+            self._to_cache(cache, kwargs, response)
+            return response
+
+    async def achat(self, client, cache=None, **kwargs):
+        """Scheduled ``await client.chat.completions.create(**kwargs)`` for AsyncOpenAI."""
+        cached = self._from_cache(cache, kwargs)
+        if cached is not None:
+            count("llm.cache_hits")
+            return cached
+        model = kwargs.get("model")
+        estimated = estimate_request_tokens(kwargs.get("messages"), kwargs.get("max_tokens"))
+        attempt = 0
+        while True:
+            await asyncio.sleep(self.reserve(estimated))
+            try:
+                with span("llm.request", model=model):
+                    raw = await client.chat.completions.with_raw_response.create(**kwargs)
+            except Exception as e:
+                delay = self.retry_delay(e, attempt)
+                if delay is None:
+                    count("llm.failures", model=model)
+                    raise
+                count("llm.retries", model=model)
+                await asyncio.sleep(delay)
+                attempt += 1
+                continue
+            response = raw.parse()
+            self.observe(raw.headers, estimated, getattr(response, "usage", None))
+            self._record_usage(model, response)
+            self._to_cache(cache, kwargs, response)
+            return response
+
+
+def cacheable(response) -> bool:
+    """
+    True if every choice finished normally (``finish_reason == "stop"``) with a
+    JSON reply (optionally in a code fence); truncated, filtered, empty or
+    malformed replies are not cached, so the next identical request retries.
+    """
+    choices = getattr(response, "choices", None)
+    if not choices:
+        return False
+    for choice in choices:
+        content = (choice.message.content or "").strip() if choice.message else ""
+        if choice.finish_reason != "stop" or not content:
+            return False
+        try:
+            json.loads(_FENCE.sub(r"\1", content))
+        except json.JSONDecodeError:
+            return False
+    return True
+
+
+_default_scheduler = None
+_default_lock = threading.Lock()
+
+
+def default_scheduler() -> LLMScheduler:
+    """Process-wide scheduler shared by all call sites (OPENAI_RPM / OPENAI_TPM)."""
+    global _default_scheduler
+    with _default_lock:
+        if _default_scheduler is None:
+            _default_scheduler = LLMScheduler()
+    return _default_scheduler
@@ -0,0 +1,133 @@
+"""
+Content-addressed on-disk cache for text extracted from PDFs.
+
+Entries are keyed by the SHA-256 of the PDF bytes plus the extractor name
+and version, so renaming or re-downloading a file still hits the cache while
+changing an extractor (bump its version) misses it. Entries are evicted
+least-recently-used first once the cache grows past its size limit.
+
+    python common/pdf_cache.py --clear [--extractor NAME]
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from common.disk_cache import DiskCache
+
+DEFAULT_CACHE_DIR = Path(__file__).resolve().parent.parent / ".cache" / "pdf_text"
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+
+def file_digest(path, chunk_size: int = 1024 * 1024) -> str:
+    """SHA-256 of a file's bytes, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _safe_name(name: str) -> str:
+    return re.sub(r"[^A-Za-z0-9_.-]", "_", name)
+
+
+class PdfTextCache:
+    """
+    Store extractor output (any JSON-serialisable value) per PDF content hash.
+
+    Layout: ``<root>/<extractor>/<version>/<sha256>.json``. Reads bump the
+    entry's mtime, which is what LRU eviction orders by.
+    """
+
+    def __init__(self, root=None, max_bytes: int = None, enabled: bool = None):
+        root = Path(root or os.getenv("PDF_CACHE_DIR") or DEFAULT_CACHE_DIR)
+        if max_bytes is None:
+            max_mb = os.getenv("PDF_CACHE_MAX_MB")
+            max_bytes = int(float(max_mb) * 1024 * 1024) if max_mb else DEFAULT_MAX_BYTES
+        if enabled is None:
+            enabled = os.getenv("PDF_CACHE_DISABLE", "0") != "1"
+        self.store = DiskCache(root, max_bytes)
+        self.root = self.store.root
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+
+    def _relpath(self, digest: str, extractor: str, version: str) -> Path:
+        return Path(_safe_name(extractor)) / _safe_name(str(version)) / f"{digest}.json"
+
+    def get(self, digest: str, extractor: str, version: str):
+        """Return the cached value, or None on a miss."""
+        payload = self.store.load(self._relpath(digest, extractor, version))
+        return None if payload is None else payload.get("value")
+
+    def put(self, digest: str, extractor: str, version: str, value):
+        """Store a value atomically, evicting old entries if over the size limit."""
+        payload = {"sha256": digest, "extractor": extractor, "version": str(version), "value": value}
+        self.store.store(self._relpath(digest, extractor, version), payload)
+
+    def get_or_compute(self, pdf_path, extractor: str, version: str, compute, cacheable=bool):
+        """
+        Return ``compute(pdf_path)`` for this PDF, reusing a cached result.
+
+        Results for which ``cacheable(value)`` is false (by default: empty
+        ones) are not stored, so a failed extraction is retried next time.
+        """
+        if not self.enabled:
+            return compute(pdf_path)
+        digest = file_digest(pdf_path)
+        value = self.get(digest, extractor, version)
+        if value is not None:
+            self.hits += 1
+            return value
+        self.misses += 1
+        value = compute(pdf_path)
+        if cacheable(value):
+            self.put(digest, extractor, version, value)
+        return value
+
+    def invalidate(self, extractor: str = None, version: str = None):
+        """Drop every entry, or only those of one extractor (and version)."""
+        relpath = None
+        if extractor:
+            relpath = Path(_safe_name(extractor))
+            if version is not None:
+                relpath = relpath / _safe_name(str(version))
+        self.store.clear(relpath)
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "bytes": self.store.size()}
+
+
+_default_cache = None
+
+
+def default_cache() -> PdfTextCache:
+    """Process-wide cache configured from PDF_CACHE_DIR / PDF_CACHE_MAX_MB / PDF_CACHE_DISABLE."""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = PdfTextCache()
+    return _default_cache
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or clear the PDF extraction cache.")
+    parser.add_argument("--clear", action="store_true", help="Delete cached entries")
+    parser.add_argument("--extractor", help="Only clear entries of this extractor")
+    parser.add_argument("--version", help="Only clear this extractor version")
+    args = parser.parse_args()
+
+    cache = default_cache()
+    if args.clear:
+        cache.invalidate(args.extractor, args.version)
+        print(f"Cleared cache entries under {cache.root}")
+    print(json.dumps({"root": str(cache.root), **cache.stats()}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""
+Single-pass text and table extraction for a pdfplumber page.
+
+Calling ``page.extract_text()`` and ``page.extract_tables()`` on the same page
+lays out the characters twice, rescans every character once per table row,
+and puts each table row into the output twice: once as flowing text and
+once as ``|``-joined cells. Here the tables are found once and each
+character is assigned in a single pass, either to the table cell it falls
+in or to the text between tables. Rows are emitted as structured cells, and
+only the text outside the table regions is laid out as text, in reading
+order. Characters inside a table's outline but in no cell stay in the text.
+With the default line-based table strategies, pages without ruling lines (no
+line, rect or curve objects) cannot contain tables, so table detection is
+skipped for them; text or explicit strategies always run it.
+"""
+import sys
+from bisect import bisect_right
+from pathlib import Path
+
+from pdfplumber.utils import extract_text
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from common.telemetry import count
+
+
+# Characters closer than this (in points) share a word / a line, as in pdfplumber's extract_words()
+WORD_X_TOLERANCE = 3
+WORD_Y_TOLERANCE = 3
+# pdfplumber strategies that only find cell edges in the page's vector graphics
+LINE_STRATEGIES = ("lines", "lines_strict")
+
+
+def needs_ruling_lines(table_settings: dict = None) -> bool:
+    """True if either table strategy is line-based (pdfplumber's default), so a page without lines has no tables."""
+    settings = table_settings or {}
+    return any(settings.get(key, "lines") in LINE_STRATEGIES
+               for key in ("vertical_strategy", "horizontal_strategy"))
+
+
+def has_ruling_lines(page) -> bool:
+    """True if the page has any vector graphics pdfplumber's table finder could use as cell edges."""
+    objects = page.objects
+    return bool(objects.get("line") or objects.get("rect") or objects.get("curve"))
+
+
+class _TableGrid:
+    """Buckets characters into the cells of one table, like ``Table.extract`` but without rescanning."""
+
+    def __init__(self, table):
+        self.bbox = table.bbox
+        self.rows = table.rows
+        self.row_tops = [row.bbox[1] for row in self.rows]
+        self.columns = []  # per row: (x0 of each cell, index into row.cells), sorted by x0
+        for row in self.rows:
+            cells = sorted((cell[0], i) for i, cell in enumerate(row.cells) if cell is not None)
+            self.columns.append(([x0 for x0, _ in cells], [i for _, i in cells]))
+        self.chars = [[[] for _ in row.cells] for row in self.rows]
+
+    def add(self, char, h_mid: float, v_mid: float) -> bool:
+        """Claim ``char`` if its midpoint lies in one of the cells; False leaves it to the page text."""
+        x0, top, x1, bottom = self.bbox
+        if not (x0 <= h_mid < x1 and top <= v_mid < bottom):
+            return False
+        r = bisect_right(self.row_tops, v_mid) - 1
+        if r < 0 or v_mid >= self.rows[r].bbox[3]:
+            return False
+        x0s, indices = self.columns[r]
+        c = bisect_right(x0s, h_mid) - 1
+        if c >= 0:
+            cell = self.rows[r].cells[indices[c]]
+            if h_mid < cell[2] and cell[1] <= v_mid < cell[3]:
+                self.chars[r][indices[c]].append(char)
+                return True
+        return False
+
+    def extract(self) -> list:
+        return [[None if cell is None else (extract_text(chars) if chars else "")
+                 for cell, chars in zip(row.cells, row_chars)]
+                for row, row_chars in zip(self.rows, self.chars)]
+
+
+def word_boxes(page) -> list:
+    """
+    ``[text, x0, top, x1, bottom]`` for each word of ``page``, as fractions of the page size.
+
+    Built from ``page.chars``, which :func:`extract_blocks` has already loaded,
+    with one sort and one scan instead of a second layout pass (``extract_words()``).
+    """
+    width, height = float(page.width), float(page.height)
+    lines, line_top = [], None
+    for char in sorted(page.chars, key=lambda c: (c["top"], c["x0"])):
+        if not lines or char["top"] - line_top > WORD_Y_TOLERANCE:
+            lines.append([])
+            line_top = char["top"]
+        lines[-1].append(char)
+
+    words = []
+    for line in lines:
+        current = []
+        for char in sorted(line, key=lambda c: c["x0"]):
+            gap = bool(current) and char["x0"] - current[-1]["x1"] > WORD_X_TOLERANCE
+            if current and (char["text"].isspace() or gap):
+                words.append(current)
+                current = []
+            if not char["text"].isspace():
+                current.append(char)
+        if current:
+            words.append(current)
+    return [["".join(c["text"] for c in word), round(word[0]["x0"] / width, 4),
+             round(min(c["top"] for c in word) / height, 4), round(word[-1]["x1"] / width, 4),
+             round(max(c["bottom"] for c in word) / height, 4)]
+            for word in words]
+
+
+def extract_blocks(page, table_settings: dict = None) -> list:
+    """
+    Text and tables of ``page`` in reading order.
+
+    Returns a list of ``{"type": "text", "text": str}`` and
+    ``{"type": "table", "rows": [[cell, ...], ...]}`` blocks. Text is split at
+    each table's top edge so totals printed under a table follow its rows.
+    """
+    tables = []
+    if has_ruling_lines(page) or not needs_ruling_lines(table_settings):
+        tables = sorted(page.find_tables(table_settings or {}), key=lambda t: t.bbox[1])
+    else:
+        count("pdf_layout.table_scan_skipped")
+    if not tables:
+        text = page.extract_text() or ""
+        return [{"type": "text", "text": text}] if text.strip() else []
+
+    grids = [_TableGrid(table) for table in tables]
+    tops = [grid.bbox[1] for grid in grids]
+    # bands[i] holds the text above table i (and below table i - 1); the last one the rest
+    bands = [[] for _ in range(len(grids) + 1)]
+    for char in page.chars:
+        h_mid = (char["x0"] + char["x1"]) / 2
+        v_mid = (char["top"] + char["bottom"]) / 2
+        if not any(grid.add(char, h_mid, v_mid) for grid in grids):
+            bands[bisect_right(tops, v_mid)].append(char)
+
+    blocks = []
+    for i, chars in enumerate(bands):
+        text = extract_text(chars) if chars else ""
+        if text.strip():
+            blocks.append({"type": "text", "text": text})
+        if i < len(grids):
+            blocks.append({"type": "table", "rows": grids[i].extract()})
+    return blocks
+
+
+def blocks_to_text(blocks) -> str:
+    """Flatten blocks to prompt text: text as is, table rows as ``" | "``-joined non-empty cells."""
+    lines = []
+    for block in blocks:
+        if block["type"] == "text":
+            lines.append(block["text"])
+            continue
+        for row in block["rows"]:
+            cells = [str(cell).strip() for cell in row if cell and str(cell).strip()]
+            if cells:
+                lines.append(" | ".join(cells))
+    return "\n".join(lines)
@@ -0,0 +1,106 @@
+"""
+Append-only JSONL journal of finished work items, used to resume interrupted runs.
+
+Each line is one JSON object with a ``key`` (a hash of the item's inputs).
+Lines are flushed as they are written and fsync'ed in batches, every
+``fsync_every`` entries or ``fsync_interval`` seconds, so a crash loses at
+most the last unsynced batch. A torn last line from a crash is ignored on
+load, and when a key appears more than once the latest entry wins.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+
+
+def input_key(*parts) -> str:
+    """SHA-256 over the given strings, e.g. a PDF digest, its dataset and the prompt."""
+    h = hashlib.sha256()
+    for part in parts:
+        h.update(str(part).encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+class RunJournal:
+    def __init__(self, path, fsync_every: int = 16, fsync_interval: float = 2.0):
+        self.path = Path(path)
+        self.fsync_every = max(1, fsync_every)
+        self.fsync_interval = fsync_interval
+        self.entries = {}
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        self._lock = threading.Lock()
+        self._load()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.path, "a", encoding="utf-8")
+
+    def _load(self):
+        if not self.path.exists():
+            return
+        torn = 0
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    torn += 1
+                    continue
+                if isinstance(entry, dict) and entry.get("key"):
+                    self.entries.pop(entry["key"], None)
+                    self.entries[entry["key"]] = entry
+        if torn:
+            logging.warning(f"Ignored {torn} unreadable line(s) in {self.path}")
+        # A torn line without a trailing newline would corrupt the next append
+        with open(self.path, "rb+") as f:
+            if f.seek(0, os.SEEK_END) > 0:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    f.write(b"\n")
+
+    def __contains__(self, key) -> bool:
+        return key in self.entries
+
+    def get(self, key):
+        return self.entries.get(key)
+
+    def append(self, entry: dict):
+        """Record a finished item; ``entry`` must carry its ``key``."""
+        line = json.dumps(entry, ensure_ascii=False)
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+            self.entries.pop(entry["key"], None)
+            self.entries[entry["key"]] = entry
+            self._unsynced += 1
+            if (self._unsynced >= self.fsync_every
+                    or time.monotonic() - self._last_sync >= self.fsync_interval):
+                self._sync()
+
+    def _sync(self):
+        os.fsync(self._file.fileno())
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def sync(self):
+        with self._lock:
+            if self._unsynced and not self._file.closed:
+                self._sync()
+
+    def close(self):
+        with self._lock:
+            if self._file.closed:
+                return
+            self._file.flush()
+            if self._unsynced:
+                self._sync()
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,249 @@
+"""
+Timing spans and counters for the pipeline stages.
+
+Disabled unless one of these is set, in which case every hook returns after a
+single attribute check (spans hand back a shared no-op object):
+
+    TELEMETRY_JSONL=path        append one JSON line per span / counter event
+    TELEMETRY_PROMETHEUS=path   write aggregated metrics in Prometheus text
+                                format on flush() and at exit
+    TELEMETRY=1                 aggregate in memory only (see snapshot())
+
+Usage::
+
+    with span("llm.request", model="gpt-4o") as s:
+        ...
+        s.set(prompt_tokens=120)
+    count("download.bytes", written)
+    with bind(doc="invoice_12.pdf"):   # tags every event below with the document
+        ...
+
+String fields passed to span() and string or numeric ones passed to count()
+become Prometheus labels, except the per-item fields in EVENT_ONLY_FIELDS
+(and anything from bind()), which only go to the JSONL events so metric
+cardinality stays bounded. Numeric span fields are event-only.
+"""
+import atexit
+import contextvars
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Seconds; upper bounds of the Prometheus histogram buckets for spans
+SPAN_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+EVENT_ONLY_FIELDS = frozenset({"doc", "file", "page", "url"})
+METRIC_PREFIX = "beam"
+
+_bound = contextvars.ContextVar("telemetry_bound", default={})
+
+
+def _labels_of(fields: dict) -> tuple:
+    return tuple(sorted((k, str(v)) for k, v in fields.items() if k not in EVENT_ONLY_FIELDS))
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **fields):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ("telemetry", "name", "fields", "start")
+
+    def __init__(self, telemetry, name, fields):
+        self.telemetry = telemetry
+        self.name = name
+        self.fields = fields
+
+    def set(self, **fields):
+        """Attach extra fields (e.g. token counts) to the event written when the span ends."""
+        self.fields.update(fields)
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration = time.perf_counter() - self.start
+        if exc_type is not None:
+            self.fields["error"] = exc_type.__name__
+        self.telemetry._record_span(self.name, duration, self.fields)
+        return False
+
+
+class Telemetry:
+    def __init__(self, jsonl_path: str = None, prometheus_path: str = None, enabled: bool = None):
+        self.jsonl_path = jsonl_path
+        self.prometheus_path = prometheus_path
+        if enabled is None:
+            enabled = bool(jsonl_path or prometheus_path)
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._spans = {}     # (name, labels) -> [count, sum, bucket counts...]
+        self._counters = {}  # (name, labels) -> value
+        self._file = None
+        self._pid = os.getpid()
+
+    # -- hooks --------------------------------------------------------------
+
+    def span(self, name: str, **fields):
+        """Context manager timing the enclosed block as ``name``."""
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name, fields)
+
+    def count(self, name: str, value: float = 1, **fields):
+        """Add ``value`` to counter ``name``."""
+        if not self.enabled:
+            return
+        labels = _labels_of(fields)
+        with self._lock:
+            key = (name, labels)
+            self._counters[key] = self._counters.get(key, 0) + value
+        if self.jsonl_path:
+            self._emit({"type": "counter", "name": name, "value": value, **fields})
+
+    # -- recording ----------------------------------------------------------
+
+    def _record_span(self, name, duration, fields):
+        labels = _labels_of({k: v for k, v in fields.items() if isinstance(v, str) and k != "error"})
+        with self._lock:
+            stats = self._spans.get((name, labels))
+            if stats is None:
+                stats = self._spans[(name, labels)] = [0, 0.0] + [0] * len(SPAN_BUCKETS)
+            stats[0] += 1
+            stats[1] += duration
+            for i, bound in enumerate(SPAN_BUCKETS):
+                if duration <= bound:
+                    stats[2 + i] += 1
+        if self.jsonl_path:
+            self._emit({"type": "span", "name": name, "duration_ms": round(duration * 1000, 3), **fields})
+
+    def _emit(self, event: dict):
+        event = {"ts": round(time.time(), 6), **_bound.get(), **event}
+        line = json.dumps(event, ensure_ascii=False, default=str) + "\n"
+        with self._lock:
+            if self._file is None or self._pid != os.getpid():
+                # Line-buffered and reopened per process, so pool workers append safely
+                self._pid = os.getpid()
+                self._file = open(self.jsonl_path, "a", encoding="utf-8", buffering=1)
+            self._file.write(line)
+
+    # -- export -------------------------------------------------------------
+
+    def snapshot(self) -> dict:
+        """Aggregates so far: span count/total seconds and counter values, keyed by name and labels."""
+        with self._lock:
+            spans = {self._key(n, l): {"count": s[0], "total_s": round(s[1], 6)}
+                     for (n, l), s in self._spans.items()}
+            counters = {self._key(n, l): v for (n, l), v in self._counters.items()}
+        return {"spans": spans, "counters": counters}
+
+    @staticmethod
+    def _key(name, labels):
+        if not labels:
+            return name
+        return name + "{" + ",".join(f"{k}={v}" for k, v in labels) + "}"
+
+    @staticmethod
+    def _metric(name: str) -> str:
+        return f"{METRIC_PREFIX}_" + "".join(c if c.isalnum() else "_" for c in name)
+
+    @staticmethod
+    def _labels(labels, extra=()) -> str:
+        pairs = list(labels) + list(extra)
+        if not pairs:
+            return ""
+        escaped = (f'{k}="' + v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+                   for k, v in pairs)
+        return "{" + ",".join(escaped) + "}"
+
+    def prometheus_text(self) -> str:
+        """Spans as ``<name>_seconds`` histograms and counters as ``<name>_total``."""
+        with self._lock:
+            spans = sorted(self._spans.items())
+            counters = sorted(self._counters.items())
+        lines = []
+        declared = set()
+        for (name, labels), stats in spans:
+            metric = self._metric(name) + "_seconds"
+            if metric not in declared:
+                declared.add(metric)
+                lines.append(f"# TYPE {metric} histogram")
+            for i, bound in enumerate(SPAN_BUCKETS):
+                lines.append(f"{metric}_bucket{self._labels(labels, [('le', str(bound))])} {stats[2 + i]}")
+            lines.append(f"{metric}_bucket{self._labels(labels, [('le', '+Inf')])} {stats[0]}")
+            lines.append(f"{metric}_sum{self._labels(labels)} {stats[1]:.6f}")
+            lines.append(f"{metric}_count{self._labels(labels)} {stats[0]}")
+        for (name, labels), value in counters:
+            metric = self._metric(name) + "_total"
+            if metric not in declared:
+                declared.add(metric)
+                lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric}{self._labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+    def flush(self):
+        """Write the Prometheus file (if configured) and flush the JSONL stream."""
+        if not self.enabled:
+            return
+        if self.prometheus_path and self._pid == os.getpid():
+            tmp_path = f"{self.prometheus_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(self.prometheus_text())
+            os.replace(tmp_path, self.prometheus_path)
+        with self._lock:
+            if self._file is not None:
+                self._file.flush()
+
+
+_default = None
+_default_lock = threading.Lock()
+
+
+def telemetry() -> Telemetry:
+    """Process-wide instance configured from the TELEMETRY_* environment variables."""
+    global _default
+    if _default is None:
+        with _default_lock:
+            if _default is None:
+                jsonl = os.getenv("TELEMETRY_JSONL") or None
+                prometheus = os.getenv("TELEMETRY_PROMETHEUS") or None
+                enabled = bool(jsonl or prometheus) or os.getenv("TELEMETRY", "0") == "1"
+                _default = Telemetry(jsonl, prometheus, enabled)
+                if enabled:
+                    atexit.register(_default.flush)
+    return _default
+
+
+def span(name: str, **fields):
+    return telemetry().span(name, **fields)
+
+
+def count(name: str, value: float = 1, **fields):
+    telemetry().count(name, value, **fields)
+
+
+@contextmanager
+def bind(**fields):
+    """Tag every JSONL event emitted inside the block (same thread or task) with ``fields``."""
+    if not telemetry().enabled:
+        yield
+        return
+    token = _bound.set({**_bound.get(), **fields})
+    try:
+        yield
+    finally:
+        _bound.reset(token)
@@ -0,0 +1,203 @@
+"""
+Columnar accuracy evaluation of extraction results against the Airtable ground truth.
+
+Every record's "Expected Output" is flattened once into rows of a table keyed
+by (file_id, field_path). Comparison is a single join plus vectorized string
+and numeric checks, so one ground-truth table can score many result files
+(e.g. one per prompt variant) without re-parsing it. Only fields the schemas
+type as numbers are compared numerically; everything else must match exactly
+(article code "01067" is not "1067"):
+
+    python output/columnar_eval.py airtable_data.json variant_a.json variant_b.json
+"""
+import argparse
+import json
+import logging
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "prompt"))
+from common.telemetry import span
+from schemas import INVOICE_FORMAT, ORDER_FORMAT
+
+# Numbers within this distance count as equal ("54.75" vs 54.749)
+NUMERIC_TOLERANCE = 0.01
+
+
+def numeric_keys(*schemas) -> frozenset:
+    """Leaf keys typed ``<float>`` or ``<integer>`` anywhere in ``schemas``."""
+    keys = set()
+    for schema in schemas:
+        for key, value in schema.items():
+            if isinstance(value, list):
+                value = value[0] if value else {}
+            if isinstance(value, dict):
+                keys |= numeric_keys(value)
+            elif value in ("<float>", "<integer>"):
+                keys.add(key)
+    return frozenset(keys)
+
+
+NUMERIC_KEYS = numeric_keys(INVOICE_FORMAT["output"], ORDER_FORMAT["output"])
+
+
+def iter_fields(d, parent_path='', parent_field='', sep='_'):
+    """
+    Yield (path, field, key, value) for every leaf of a nested dict.
+
+    ``path`` is the flatten_dict key; ``field`` is the same key with list
+    indices replaced by ``*`` so line items group together (products_*_price);
+    ``key`` is the leaf's own dict key.
+    """
+    for key, value in d.items():
+        path = f"{parent_path}{sep}{key}" if parent_path else key
+        field = f"{parent_field}{sep}{key}" if parent_field else key
+        if isinstance(value, dict):
+            yield from iter_fields(value, path, field, sep)
+        elif isinstance(value, list):
+            for i, item in enumerate(value):
+                if isinstance(item, dict):
+                    yield from iter_fields(item, f"{path}{sep}{i}", f"{field}{sep}*", sep)
+                else:
+                    yield f"{path}{sep}{i}", f"{field}{sep}*", key, item
+        else:
+            yield path, field, key, value
+
+
+def load_records(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def field_table(records):
+    """
+    One row per leaf field of every record's "Expected Output".
+
+    Returns the table and the File IDs it covers (including records with no
+    fields), in input order.
+
+    Columns: file_id, dataset, path, field, key, value (the str() of the
+    leaf, '' for None) and number (its float value, NaN when not numeric).
+    Later records win over earlier ones with the same File ID.
+    """
+    latest = {}
+    for record in records:
+        file_id = record.get('File ID')
+        output = record.get('Expected Output')
+        if isinstance(output, str):
+            try:
+                output = json.loads(output)
+            except json.JSONDecodeError:
+                raise ValueError(f"Invalid JSON in Expected Output for File ID {file_id}")
+        latest[file_id] = (record.get('Dataset') or 'Unknown', output if isinstance(output, dict) else {})
+
+    file_ids, datasets, paths, fields, keys, values = [], [], [], [], [], []
+    for file_id, (dataset, output) in latest.items():
+        for path, field, key, value in iter_fields(output):
+            file_ids.append(file_id)
+            datasets.append(dataset)
+            paths.append(path)
+            fields.append(field)
+            keys.append(key)
+            values.append(str(value) if value is not None else '')
+
+    table = pd.DataFrame({
+        'file_id': pd.Series(file_ids, dtype=object),
+        'dataset': pd.Series(datasets, dtype=object),
+        'path': pd.Series(paths, dtype=object),
+        'field': pd.Series(fields, dtype=object),
+        'key': pd.Series(keys, dtype=object),
+        'value': pd.Series(values, dtype=object),
+    })
+    table['number'] = pd.to_numeric(table['value'], errors='coerce').astype(float)
+    table = table.drop_duplicates(subset=['file_id', 'path'], keep='last')
+    return table, list(latest)
+
+
+def _grouped(frame, key) -> dict:
+    grouped = frame.groupby(key, sort=True)['match'].agg(['mean', 'size'])
+    means = grouped['mean'].round(4).tolist()
+    sizes = grouped['size'].tolist()
+    return {name: {'accuracy': mean, 'fields': size}
+            for name, mean, size in zip(grouped.index.tolist(), means, sizes)}
+
+
+class ColumnarEvaluator:
+    """Ground truth flattened once; :meth:`evaluate` scores any number of result sets against it."""
+
+    def __init__(self, truth_records, tolerance: float = NUMERIC_TOLERANCE, numeric=NUMERIC_KEYS):
+        self.truth, truth_ids = field_table(truth_records)
+        self.truth_ids = set(truth_ids)
+        self.tolerance = tolerance
+        self.numeric = frozenset(numeric)
+
+    @classmethod
+    def from_file(cls, path, tolerance: float = NUMERIC_TOLERANCE, numeric=NUMERIC_KEYS):
+        return cls(load_records(path), tolerance, numeric)
+
+    def compare(self, extracted_records):
+        """
+        Ground-truth rows of the matched files with the predicted value and a
+        ``match`` column, plus the number of matched records.
+        """
+        pred, pred_ids = field_table(extracted_records)
+        matched = [fid for fid in pred_ids if fid in self.truth_ids]
+        for file_id in pred_ids:
+            if file_id not in self.truth_ids:
+                logging.warning(f"File ID {file_id} not found in airtable_data")
+
+        truth = self.truth[self.truth['file_id'].isin(matched)]
+        merged = truth.merge(pred[['file_id', 'path', 'value', 'number']], on=['file_id', 'path'],
+                             how='left', suffixes=('_true', '_pred'))
+        merged['value_pred'] = merged['value_pred'].fillna('')
+        true_num = merged['number_true'].to_numpy(dtype=float)
+        pred_num = merged['number_pred'].to_numpy(dtype=float)
+        with np.errstate(invalid='ignore'):
+            numeric_match = np.abs(true_num - pred_num) <= self.tolerance
+        numeric_match &= merged['key'].isin(self.numeric).to_numpy()
+        string_match = merged['value_true'].to_numpy() == merged['value_pred'].to_numpy()
+        merged['match'] = string_match | numeric_match
+        return merged, len(matched)
+
+    def evaluate(self, extracted_records) -> dict:
+        """Overall, per-field, per-doc-type and per-file accuracy."""
+        with span("evaluate") as s:
+            merged, matched_records = self.compare(extracted_records)
+            s.set(fields=len(merged))
+        if merged.empty:
+            return {'error': 'No matching records or fields found'}
+        return {
+            'accuracy': float(merged['match'].mean()),
+            'fields_compared': int(len(merged)),
+            'matched_records': matched_records,
+            'per_field': _grouped(merged, 'field'),
+            'per_doc_type': _grouped(merged, 'dataset'),
+            'per_file': _grouped(merged, 'file_id'),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score one or more extraction results against the ground truth.")
+    parser.add_argument("truth", help="Ground-truth JSON (airtable_data.json)")
+    parser.add_argument("results", nargs="+", help="Extracted JSON files, e.g. one per prompt variant")
+    parser.add_argument("--tolerance", type=float, default=NUMERIC_TOLERANCE, help="Numeric tolerance")
+    parser.add_argument("--summary", action="store_true", help="Only print overall and per-doc-type accuracy")
+    args = parser.parse_args()
+
+    evaluator = ColumnarEvaluator.from_file(args.truth, args.tolerance)
+    report = {}
+    for path in args.results:
+        result = evaluator.evaluate(load_records(path))
+        if args.summary:
+            result.pop('per_field', None)
+            result.pop('per_file', None)
+        report[path] = result
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
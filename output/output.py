@@ -224,11 +224,22 @@ import json
 import pdfplumber
 from openai import OpenAI
 from pathlib import Path
-from sklearn.metrics import accuracy_score
 import numpy as np
 import re
+import sys
 import logging
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "prompt"))
+from common.compaction import PAGE_BREAK, compact_text
+from common.pdf_cache import default_cache
+from common.llm_cache import default_llm_cache
+from common.llm_scheduler import default_scheduler
+from common.pdf_layout import blocks_to_text, extract_blocks
+from common.telemetry import count, span
+from columnar_eval import ColumnarEvaluator, load_records
+from schemas import KEYWORD_MAPPINGS
+
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
@@ -244,7 +255,8 @@ OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 if not OPENAI_API_KEY:
     logging.error("OpenAI API key not set. Set OPENAI_API_KEY environment variable.")
     exit(1)
-client = OpenAI(api_key=OPENAI_API_KEY)
+# Retries and rate limiting are handled by the shared scheduler
+client = OpenAI(api_key=OPENAI_API_KEY, max_retries=0)
 
 # Refined Prompts
 import os
@@ -305,23 +317,27 @@ def normalize_date(text):
             return f"{int(day):02d}.{int(month):02d}.{year}"
     return None
 
+# Bump when extract_pdf_text's output changes, so cached text is not reused
+PDF_TEXT_VERSION = "3"
+
+def _read_pdf_text(file_path):
+    with pdfplumber.open(file_path) as pdf:
+        pages = []
+        for page_num, page in enumerate(pdf.pages, start=1):
+            with span("pdfplumber.page", extractor="output", page=page_num):
+                # Text outside tables plus the item/product table rows, each parsed once
+                page_text = blocks_to_text(extract_blocks(page)).strip()
+                if page_text:
+                    pages.append(page_text)
+        # Page breaks stay in the text so compaction can tell page headers from repeated lines
+        return f"\n{PAGE_BREAK}\n".join(pages)
+
 # Extract text and tables from PDF
 def extract_pdf_text(file_path):
-    """Extract text and tables from a PDF."""
+    """Extract text and tables from a PDF, reusing the shared extraction cache."""
     try:
-        with pdfplumber.open(file_path) as pdf:
-            text = ""
-            for page in pdf.pages:
-                # Extract raw text
-                page_text = page.extract_text()
-                if page_text:
-                    text += page_text + "\n"
-                # Extract tables for items/products
-                tables = page.extract_tables()
-                for table in tables:
-                    for row in table:
-                        text += " | ".join(str(cell) for cell in row if cell) + "\n"
-            return text.strip()
+        return default_cache().get_or_compute(
+            file_path, "output.extract_pdf_text", PDF_TEXT_VERSION, _read_pdf_text)
     except Exception as e:
         logging.error(f"Error extracting text from {file_path}: {e}")
         return ""
@@ -331,7 +347,9 @@ def extract_data_with_gpt4o(text, prompt):
     """Extract structured data using GPT-4o."""
     try:
         full_prompt = prompt.format(text=text)
-        response = client.chat.completions.create(
+        response = default_scheduler().chat(
+            client,
+            cache=default_llm_cache(),
             model="gpt-4o",
             messages=[
                 {"role": "system", "content": "You are a precise data extraction assistant."},
@@ -340,7 +358,11 @@ def extract_data_with_gpt4o(text, prompt):
             response_format={"type": "json_object"},
             temperature=0.0
         )
-        extracted_data = json.loads(response.choices[0].message.content)
+        try:
+            extracted_data = json.loads(response.choices[0].message.content)
+        except json.JSONDecodeError:
+            count("llm.json_parse_failures")
+            raise
 
         # Post-process for accuracy
         if "total_gross" in extracted_data:
@@ -378,8 +400,11 @@ def process_pdf(file_path, dataset):
         logging.warning(f"No text extracted from {file_path}")
         return None
 
+    compacted = compact_text(text, KEYWORD_MAPPINGS)
+    logging.info(f"Compacted {Path(file_path).name}: {compacted['tokens_before']} -> "
+                 f"{compacted['tokens_after']} tokens")
     prompt = INVOICE_PROMPT if dataset == "Invoice" else ORDER_PROMPT
-    extracted_data = extract_data_with_gpt4o(text, prompt)
+    extracted_data = extract_data_with_gpt4o(compacted["text"], prompt)
     if not extracted_data:
         logging.warning(f"Failed to extract data from {file_path}")
         return None
@@ -412,62 +437,30 @@ def flatten_dict(d, parent_key='', sep='_'):
     return dict(items)
 
 # Evaluate accuracy
-def evaluate_accuracy(airtable_path, extracted_path):
-    """Compute accuracy score between two JSON datasets."""
+def evaluate_accuracy(airtable_path, extracted_path, evaluator=None):
+    """
+    Compare extracted fields with the ground truth.
+
+    Returns overall accuracy plus per-field, per-doc-type and per-file
+    breakdowns. Pass a ``ColumnarEvaluator`` to reuse an already flattened
+    ground truth across several result files.
+    """
     try:
-        with open(airtable_path, 'r', encoding='utf-8') as f:
-            airtable_data = json.load(f)
-        with open(extracted_path, 'r', encoding='utf-8') as f:
-            extracted_data = json.load(f)
-
-        airtable_map = {}
-        for record in airtable_data:
-            file_id = record.get('File ID')
-            try:
-                airtable_map[file_id] = json.loads(record['Expected Output'])
-            except json.JSONDecodeError as e:
-                logging.error(f"Invalid JSON in Expected Output for File ID {file_id} in {airtable_path}: {e}")
-                return {'error': f"Invalid JSON in Expected Output for File ID {file_id}"}
-
-        extracted_map = {}
-        for record in extracted_data:
-            file_id = record.get('File ID')
-            try:
-                extracted_map[file_id] = json.loads(record['Expected Output'])
-            except json.JSONDecodeError as e:
-                logging.error(f"Invalid JSON in Expected Output for File ID {file_id} in {extracted_path}: {e}")
-                return {'error': f"Invalid JSON in Expected Output for File ID {file_id}"}
-
-        true_values = []
-        pred_values = []
-        for file_id in extracted_map:
-            if file_id not in airtable_map:
-                logging.warning(f"File ID {file_id} not found in airtable_data")
-                continue
-            flat_true = flatten_dict(airtable_map[file_id])
-            flat_pred = flatten_dict(extracted_map[file_id])
-            for key in flat_true:
-                true_val = flat_true.get(key)
-                pred_val = flat_pred.get(key)
-                true_values.append(str(true_val) if true_val is not None else '')
-                pred_values.append(str(pred_val) if pred_val is not None else '')
-
-        if not true_values:
-            logging.error("No matching records or fields found")
-            return {'error': 'No matching records or fields found'}
-
-        accuracy = accuracy_score(true_values, pred_values)
-        return {
-            'accuracy': accuracy,
-            'fields_compared': len(true_values),
-            'matched_records': len([fid for fid in extracted_map if fid in airtable_map])
-        }
+        if evaluator is None:
+            evaluator = ColumnarEvaluator.from_file(airtable_path)
+        result = evaluator.evaluate(load_records(extracted_path))
+        if 'error' in result:
+            logging.error(result['error'])
+        return result
     except FileNotFoundError as e:
         logging.error(f"File not found: {e}")
         return {'error': f"File not found - {e}"}
     except json.JSONDecodeError as e:
         logging.error(f"Invalid JSON format: {e}")
         return {'error': f"Invalid JSON format - {e}"}
+    except ValueError as e:
+        logging.error(str(e))
+        return {'error': str(e)}
     except Exception as e:
         logging.error(f"Unexpected error: {e}")
         return {'error': f"Unexpected error - {e}"}
@@ -1,27 +1,76 @@
 import os
 import re
+import sys
 import json
+import atexit
+import asyncio
 import logging
+import threading
 import pdfplumber
 import pytesseract
-from pdf2image import convert_from_path
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pdf2image import convert_from_path, pdfinfo_from_path
 
-from openai import OpenAI
+from openai import APITimeoutError, AsyncOpenAI, OpenAI
 from pathlib import Path
 from dotenv import load_dotenv
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "prompt"))
+from common.compaction import PAGE_BREAK, compact_text
+from common.pdf_cache import default_cache, file_digest
+from common.llm_cache import default_llm_cache
+from common.llm_scheduler import count_tokens, default_scheduler
+from common.pdf_layout import blocks_to_text, extract_blocks, word_boxes
+from common.run_journal import RunJournal, input_key
+from common.telemetry import count, span
+from schemas import INVOICE_FORMAT, KEYWORD_MAPPINGS, ORDER_FORMAT
+from rule_extract import RuleExtractor, get_path, item_rows, schema_subset, set_path
+from supplier_templates import TemplateIndex
+
 # ------------------- Configuration -------------------
 load_dotenv()
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 if not OPENAI_API_KEY:
     raise RuntimeError("Set your OPENAI_API_KEY in .env or environment")
 
-client      = OpenAI(api_key=OPENAI_API_KEY)
-BASE_DIR    = Path("/Users/maple/Downloads/beam")
+# Both clients honour OPENAI_BASE_URL, e.g. a local mock chat-completions server;
+# retries and rate limiting are handled by the shared scheduler
+client      = OpenAI(api_key=OPENAI_API_KEY, max_retries=0)
+aclient     = AsyncOpenAI(api_key=OPENAI_API_KEY, max_retries=0)
+BASE_DIR    = Path(os.getenv("BEAM_BASE_DIR", "/Users/maple/Downloads/beam"))
 PDF_DIR     = BASE_DIR / "airtable_attachments/attachments"
 PROMPT_DIR  = BASE_DIR / "generated_prompts"
 OUTPUT_DIR  = BASE_DIR / "test_output"
 OUTPUT_JSON = OUTPUT_DIR / "extracted_data.json"
+# Finished records are journaled here so an interrupted run can resume
+JOURNAL_PATH = Path(os.getenv("EXTRACT_JOURNAL", str(OUTPUT_DIR / "extracted_data.journal.jsonl")))
+JOURNAL_FSYNC_EVERY = int(os.getenv("JOURNAL_FSYNC_EVERY", "16"))
+
+# Per-page OCR: pages with fewer embedded characters than this are OCR'd
+OCR_MIN_CHARS = int(os.getenv("OCR_MIN_CHARS", "20"))
+OCR_DPI       = int(os.getenv("OCR_DPI", "300"))
+OCR_WORKERS   = int(os.getenv("OCR_WORKERS", str(os.cpu_count() or 1)))
+OCR_LANG      = "deu+eng"
+
+# Async extraction engine: model calls in flight, per-call timeout, PDF parse threads
+LLM_MAX_IN_FLIGHT = int(os.getenv("LLM_MAX_IN_FLIGHT", "8"))
+LLM_TIMEOUT       = float(os.getenv("LLM_TIMEOUT", "120"))
+PARSE_WORKERS     = int(os.getenv("PARSE_WORKERS", str(os.cpu_count() or 1)))
+
+# Orders with more item rows than this are extracted in chunks of this many rows
+CHUNK_ROWS = int(os.getenv("CHUNK_ROWS", "25"))
+
+# Rule-based fast path: fields read with at least this confidence are not asked of the model
+RULES_MIN_CONFIDENCE = float(os.getenv("RULES_MIN_CONFIDENCE", "0.9"))
+RULES_DISABLE        = os.getenv("RULES_DISABLE", "0") == "1"
+
+# Learned supplier layouts: a document matching one this closely is read with its template, and
+# its values stand without the model only at TEMPLATE_TRUST_SIMILARITY and after the cross-checks
+TEMPLATE_INDEX            = Path(os.getenv("TEMPLATE_INDEX", str(BASE_DIR / "templates" / "template_index.json")))
+TEMPLATE_MIN_SIMILARITY   = float(os.getenv("TEMPLATE_MIN_SIMILARITY", "0.7"))
+TEMPLATE_TRUST_SIMILARITY = float(os.getenv("TEMPLATE_TRUST_SIMILARITY", "0.9"))
+TEMPLATES_DISABLE       = os.getenv("TEMPLATES_DISABLE", "0") == "1"
 
 for d in (PDF_DIR, PROMPT_DIR):
     if not d.is_dir():
@@ -59,43 +108,94 @@ def normalize_date(txt: str):
 
 
 
-def extract_pdf_text_with_ocr(path: Path) -> str:
-    out_lines = []
-    try:
-        with pdfplumber.open(path) as pdf:
-            for page in pdf.pages:
-                text = page.extract_text() or ""
-                if text.strip():
-                    out_lines.append(text)
-                for table in page.extract_tables():
-                    for row in table:
-                        cells = [c.strip() for c in row if c]
-                        if cells:
-                            out_lines.append(" | ".join(cells))
-    except Exception as e:
-        logging.warning(f"pdfplumber error in {path.name}: {e}")
-        text = ""
+# Bump when extract_pdf_pages's output changes, so cached pages are not reused
+OCR_TEXT_VERSION = "6"
 
-    result = "\n".join(out_lines).strip()
-    if result:
-        return result
+def extract_pdf_pages(path: Path) -> list:
+    """Text and word boxes of each page (text falling back to OCR), reusing the shared extraction cache."""
+    return default_cache().get_or_compute(
+        path, "output1.extract_pdf_pages", OCR_TEXT_VERSION, _extract_pdf_pages,
+        cacheable=lambda pages: any(page["text"].strip() for page in pages))
 
-    
+def join_pages(pages) -> str:
+    # Page breaks stay in the text so compaction can tell page headers from repeated lines
+    return f"\n{PAGE_BREAK}\n".join(page["text"].strip() for page in pages if page["text"].strip())
+
+def extract_pdf_text_with_ocr(path: Path) -> str:
+    """Extract text (falling back to OCR), reusing the shared extraction cache."""
+    return join_pages(extract_pdf_pages(path))
+
+def _ocr_page(path: str, page_number: int, dpi: int, lang: str) -> str:
+    """Rasterize a single page and OCR it; runs in a worker process."""
+    images = convert_from_path(path, dpi=dpi, first_page=page_number, last_page=page_number)
     try:
-        logging.info(f"OCR fallback for {path.name}")
-        images = convert_from_path(str(path))
-        ocr_txt = []
+        return "\n".join(pytesseract.image_to_string(img, lang=lang) for img in images).strip()
+    finally:
         for img in images:
-            ocr = pytesseract.image_to_string(img, lang="deu+eng")
-            if ocr.strip():
-                ocr_txt.append(ocr)
-        return "\n".join(ocr_txt).strip()
+            img.close()
+
+_ocr_executor = None
+_ocr_lock = threading.Lock()
+
+def _ocr_pool() -> ProcessPoolExecutor:
+    # Parse threads (PARSE_WORKERS) race here on the first scanned page
+    global _ocr_executor
+    if _ocr_executor is None:
+        with _ocr_lock:
+            if _ocr_executor is None:
+                _ocr_executor = ProcessPoolExecutor(max_workers=OCR_WORKERS)
+                atexit.register(_ocr_executor.shutdown, cancel_futures=True)
+    return _ocr_executor
+
+def _extract_pdf_pages(path: Path) -> list:
+    # One {"text", "words"} per page: the text outside tables, then the table rows, in reading
+    # order, and the word boxes the supplier templates read, from the same parsed page
+    pages = []
+    try:
+        with pdfplumber.open(path) as pdf:
+            for page_num, page in enumerate(pdf.pages, start=1):
+                with span("pdfplumber.page", extractor="output1", page=page_num):
+                    pages.append({"text": blocks_to_text(extract_blocks(page)), "words": word_boxes(page)})
     except Exception as e:
-        logging.error(f"OCR failed for {path.name}: {e}")
-        return ""
-
+        logging.warning(f"pdfplumber error in {path.name}: {e}")
 
-def call_gpt4o(prompt_template: str, text: str) -> dict:
+    if not pages:
+        try:
+            pages = [{"text": "", "words": []} for _ in range(pdfinfo_from_path(str(path))["Pages"])]
+        except Exception as e:
+            logging.error(f"Could not read page count of {path.name}: {e}")
+
+    # Only pages with no or too little embedded text are rasterized and OCR'd,
+    # one page per task, spread across the OCR process pool
+    scanned = [i for i, page in enumerate(pages) if len(page["text"].strip()) < OCR_MIN_CHARS]
+    if scanned:
+        logging.info(f"OCR fallback for {path.name}: pages {[i + 1 for i in scanned]}")
+        count("ocr.pages", len(scanned))
+        with span("ocr.document", file=path.name, pages=len(scanned)):
+            futures = {i: _ocr_pool().submit(_ocr_page, str(path), i + 1, OCR_DPI, OCR_LANG)
+                       for i in scanned}
+            for i, future in futures.items():
+                try:
+                    ocr = future.result()
+                except Exception as e:
+                    logging.error(f"OCR failed for {path.name} page {i + 1}: {e}")
+                    count("ocr.failures")
+                    continue
+                if len(ocr.strip()) > len(pages[i]["text"].strip()):
+                    # OCR text has no word boxes to match a template with
+                    pages[i] = {"text": ocr, "words": []}
+
+    return pages
+
+
+def compact_document(text: str, name: str) -> dict:
+    """Compact ``text`` to the prompt's token budget, keeping the regions around the schema's keywords."""
+    result = compact_text(text, KEYWORD_MAPPINGS)
+    logging.info(f"Compacted {name}: {result['tokens_before']} -> {result['tokens_after']} tokens "
+                 f"({result['dropped_lines']} lines dropped)")
+    return result
+
+def build_messages(prompt_template: str, text: str) -> list:
     if "{text}" in prompt_template:
         user_content = prompt_template.format(text=text)
     else:
@@ -106,19 +206,13 @@ def call_gpt4o(prompt_template: str, text: str) -> dict:
             + "\n```"
         )
 
-    messages = [
+    return [
         {"role": "system", "content": "You are a precise data extraction assistant. Output *ONLY* a JSON object."},
         {"role": "user",   "content": user_content}
     ]
 
-    resp = client.chat.completions.create(
-        model="gpt-4o",
-        messages=messages,
-        temperature=0.0,
-        max_tokens=1000
-    )
-
-    raw = resp.choices[0].message.content.strip()
+def parse_reply(raw: str) -> dict:
+    raw = (raw or "").strip()
     if not raw:
         logging.error("Empty reply from GPT-4o")
         return None
@@ -134,10 +228,266 @@ def call_gpt4o(prompt_template: str, text: str) -> dict:
     try:
         return json.loads(cleaned)
     except json.JSONDecodeError:
+        count("llm.json_parse_failures")
         logging.error("Failed to parse JSON. Reply after fence-stripping:")
         logging.error(cleaned)
         return None
 
+def call_gpt4o(prompt_template: str, text: str) -> dict:
+    resp = default_scheduler().chat(
+        client,
+        cache=default_llm_cache(),
+        model="gpt-4o",
+        messages=build_messages(prompt_template, text),
+        temperature=0.0,
+        max_tokens=1000
+    )
+    return parse_reply(resp.choices[0].message.content)
+
+async def call_gpt4o_async(prompt_template: str, text: str, timeout: float = LLM_TIMEOUT) -> dict:
+    """Async twin of call_gpt4o; each attempt is cut off after ``timeout`` seconds."""
+    resp = await default_scheduler().achat(
+        aclient,
+        cache=default_llm_cache(),
+        model="gpt-4o",
+        messages=build_messages(prompt_template, text),
+        temperature=0.0,
+        max_tokens=1000,
+        timeout=timeout
+    )
+    return parse_reply(resp.choices[0].message.content)
+
+CHUNK_ITEMS_PROMPT = (
+    "You are an AI assistant extracting the line items from one part of an Order Document. "
+    "The text below holds only some of the document's item rows; extract every product row in it, "
+    "in document order, using the position number printed on the row. Do not add rows that are not "
+    "in the text. Output the extracted data in the following JSON format:\n"
+    + json.dumps({"product": ORDER_FORMAT["output"]["product"]}, indent=2)
+)
+
+def split_item_rows(text: str):
+    """Split ``text`` into (the other lines, the item rows, the line heading the item table)."""
+    lines = text.split("\n")
+    table = set(item_rows(lines))
+    other, rows, heading = [], [], ""
+    for i, line in enumerate(lines):
+        if i in table:
+            if not rows and other:
+                heading = other[-1]
+            rows.append(line)
+        else:
+            other.append(line)
+    return other, rows, heading
+
+def _position(item):
+    try:
+        return int(item.get("product_position"))
+    except (TypeError, ValueError):
+        return None
+
+def _row_key(item):
+    return (_position(item), str(item.get("product_article_code", "")).strip(), str(item.get("product_quantity")))
+
+def merge_chunks(header: dict, parts: list) -> dict:
+    """
+    Combine the header reply with the products of every chunk reply.
+
+    Products keep chunk order. Only a row repeated across a chunk boundary
+    (the first row of a chunk equal to the last of the previous one, both
+    with a printed position) is dropped; identical rows inside the document
+    are legitimate repeats. If the positions are then missing or not
+    strictly increasing, they are renumbered 1..n.
+    """
+    products = []
+    for part in parts:
+        items = part.get("product", part.get("products")) or []
+        if isinstance(items, dict):
+            items = [items]
+        if items and products and _position(items[0]) is not None and _row_key(items[0]) == _row_key(products[-1]):
+            items = items[1:]
+        products.extend(items)
+    positions = [_position(item) for item in products]
+    if None in positions or any(b <= a for a, b in zip(positions, positions[1:])):
+        for n, item in enumerate(products, start=1):
+            item["product_position"] = n
+    merged = {k: v for k, v in header.items() if k not in ("product", "products")}
+    merged["product"] = products
+    return merged
+
+async def call_gpt4o_chunked_async(prompt_template: str, text: str, name: str,
+                                   timeout: float = LLM_TIMEOUT) -> tuple:
+    """
+    Map-reduce extraction of a long order: the header fields come from one call
+    over the non-item lines, the products from concurrent calls over chunks of
+    CHUNK_ROWS item rows each, so no single reply has to hold every item.
+
+    ``text`` is the full document text: only the header lines are compacted,
+    since compaction would drop item rows to meet its budget. Returns the
+    merged reply and the tokens compaction saved.
+    """
+    other, rows, heading = split_item_rows(text)
+    header = compact_document("\n".join(other), name)
+    chunks = ["\n".join([heading] + rows[i:i + CHUNK_ROWS]).strip() for i in range(0, len(rows), CHUNK_ROWS)]
+    count("llm.chunked_documents")
+    count("llm.chunks", len(chunks))
+    replies = await asyncio.gather(
+        call_gpt4o_async(prompt_template, header["text"], timeout=timeout),
+        *(call_gpt4o_async(CHUNK_ITEMS_PROMPT, chunk, timeout=timeout) for chunk in chunks))
+    saved = header["tokens_before"] - header["tokens_after"]
+    if any(reply is None for reply in replies):
+        return None, saved
+    return merge_chunks(replies[0], replies[1:]), saved
+
+async def extract_async(prompt_template: str, text: str, dataset: str, name: str,
+                        timeout: float = LLM_TIMEOUT) -> tuple:
+    """
+    Extract one document from its full text, in chunks if it is an order with
+    more than CHUNK_ROWS item rows; returns the reply and the tokens compaction saved.
+    """
+    if dataset == "Order" and CHUNK_ROWS > 0 and len(split_item_rows(text)[1]) > CHUNK_ROWS:
+        return await call_gpt4o_chunked_async(prompt_template, text, name, timeout=timeout)
+    compacted = compact_document(text, name)
+    reply = await call_gpt4o_async(prompt_template, compacted["text"], timeout=timeout)
+    return reply, compacted["tokens_before"] - compacted["tokens_after"]
+
+FORMATS = {"Invoice": INVOICE_FORMAT, "Order": ORDER_FORMAT}
+RULES = RuleExtractor({dataset: fmt["output"] for dataset, fmt in FORMATS.items()},
+                      normalize_number, normalize_date, RULES_MIN_CONFIDENCE)
+_templates = None
+_templates_lock = threading.Lock()
+
+def default_templates() -> TemplateIndex:
+    global _templates
+    if _templates is None:
+        with _templates_lock:
+            if _templates is None:
+                _templates = TemplateIndex(TEMPLATE_INDEX,
+                                           {dataset: fmt["output"] for dataset, fmt in FORMATS.items()},
+                                           KEYWORD_MAPPINGS, normalize_number, normalize_date,
+                                           TEMPLATE_MIN_SIMILARITY)
+    return _templates
+
+def cross_check(dataset: str, data: dict) -> bool:
+    """False if the values contradict each other: a gross total below the net, item prices not adding up to it."""
+    if dataset != "Invoice":
+        return True
+    gross, net, items = data.get("total_gross"), data.get("total_net"), data.get("items")
+    if gross is not None and net is not None and gross < net:
+        return False
+    if items and net is not None and abs(sum(item["price"] for item in items) - net) >= 0.015:
+        return False
+    return True
+
+def apply_template(rules: dict, pages, dataset: str, name: str):
+    """
+    Read the fields the rules missed with the matching supplier template.
+
+    The anchored values fill ``rules`` only if the layout matches at
+    TEMPLATE_TRUST_SIMILARITY and they pass :func:`cross_check` with the
+    rule values; every other value read is returned as a hint for the model
+    to verify. Returns ``(matched, hints)``.
+    """
+    template, similarity = default_templates().match(pages, dataset)
+    if template is None:
+        return False, {}
+    values = {field: value for field, value in default_templates().apply(template, pages).items()
+              if field in rules["missing"]}
+    trusted = {}
+    if similarity >= TEMPLATE_TRUST_SIMILARITY:
+        trusted = {field: value for field, (value, confidence) in values.items()
+                   if confidence >= RULES_MIN_CONFIDENCE}
+        checked = json.loads(json.dumps(rules["data"]))
+        for field, value in trusted.items():
+            set_path(checked, field, value)
+        if not cross_check(dataset, checked):
+            count("templates.cross_check_failed")
+            trusted = {}
+    for field, value in trusted.items():
+        set_path(rules["data"], field, value)
+        rules["confidence"][field] = values[field][1]
+        rules["missing"].remove(field)
+    hints = {field: value for field, (value, _) in values.items() if field not in trusted}
+    count("templates.fields_filled", len(trusted))
+    logging.info(f"Template {template['id']} matches {name} ({similarity:.2f}); "
+                 f"filled {len(trusted)} fields, {len(hints)} left to check")
+    return True, hints
+
+def fill_prompt(dataset: str, rules: dict, hints: dict = None) -> str:
+    """
+    Prompt for only the fields the rules left missing, with the single fields they read as
+    context and the values a supplier template suggests (``hints``) to check.
+    """
+    fmt = FORMATS[dataset]
+    known = {key: value for key, value in rules["data"].items() if not isinstance(value, list)}
+    suggested = ""
+    if hints:
+        suggested = ("\nThese values were read with the supplier's usual layout; "
+                     "use them only where the document confirms them:\n" + json.dumps(hints, ensure_ascii=False, indent=2))
+    return (
+        f"You are an AI assistant extracting information from an {dataset} Document. {fmt['logic']}\n"
+        "These fields have already been read from the document:\n"
+        + json.dumps(known, ensure_ascii=False, indent=2)
+        + suggested
+        + "\nExtract only the remaining fields and output them in the following JSON format:\n"
+        + json.dumps(schema_subset(fmt["output"], rules["missing"]), indent=2)
+    )
+
+async def extract_document_async(prompt_template: str, text: str, dataset: str, name: str,
+                                 timeout: float = LLM_TIMEOUT, pages: list = None) -> dict:
+    """
+    Rules first, then the supplier's learned template, the model only for what they could not read.
+
+    If every field is read confidently no request is made. If only single
+    fields are missing, a short fill-the-rest prompt asks for just those;
+    if an item list is missing, the full prompt (chunked for long orders)
+    runs and the confident rule values are laid over its reply. With
+    ``pages`` (from :func:`extract_pdf_pages`) the layout is matched against
+    the template index, and a model reply for a layout with no template is
+    learned as a candidate, or confirms one (see supplier_templates). Returns
+    ``{"extracted", "route", "tokens_saved"}`` with route "rules", "template",
+    "fill" or "model".
+    """
+    rules = None if RULES_DISABLE or dataset not in FORMATS else RULES.extract(text, dataset)
+    if rules is not None and not rules["missing"]:
+        count("rules.fast_path", route="rules")
+        logging.info(f"Rules read every field of {name}; skipping GPT-4o")
+        return {"extracted": rules["data"], "route": "rules", "tokens_saved": count_tokens(text)}
+
+    loop = asyncio.get_running_loop()
+    matched, hints = False, {}
+    if not pages or TEMPLATES_DISABLE or not any(page["words"] for page in pages):
+        pages = None
+    if rules is not None and pages is not None:
+        matched, hints = apply_template(rules, pages, dataset, name)
+        if not rules["missing"]:
+            count("rules.fast_path", route="template")
+            logging.info(f"Rules and template read every field of {name}; skipping GPT-4o")
+            return {"extracted": rules["data"], "route": "template", "tokens_saved": count_tokens(text)}
+
+    missing_list = rules is None or any(isinstance(get_path(FORMATS[dataset]["output"], field), list)
+                                        for field in rules["missing"])
+    if rules is not None and rules["data"] and not missing_list:
+        # The item lists are already read, so their rows are left out too
+        route = "fill"
+        compacted = compact_document("\n".join(split_item_rows(text)[0]), name)
+        tokens_saved = count_tokens(text) - compacted["tokens_after"]
+        reply = await call_gpt4o_async(fill_prompt(dataset, rules, hints), compacted["text"], timeout=timeout)
+    else:
+        route = "model"
+        reply, tokens_saved = await extract_async(prompt_template, text, dataset, name, timeout=timeout)
+    count("rules.fast_path", route=route)
+    if reply is not None and rules is not None:
+        reply = RULES.apply(reply, rules)
+        if pages is not None and not matched:
+            # Learning writes the index, so it runs off the event loop
+            learned = await loop.run_in_executor(None, default_templates().learn, pages, dataset, reply, name)
+            if learned is not None and learned["status"] == "confirmed":
+                count("templates.learned")
+                logging.info(f"Confirmed a {dataset} template with {name}")
+            elif learned is not None:
+                count("templates.candidates")
+    return {"extracted": reply, "route": route, "tokens_saved": tokens_saved}
+
 def post_process(data: dict) -> dict:
     if "total_gross" in data:
         data["total_gross"] = normalize_number(str(data["total_gross"]))
@@ -163,12 +513,115 @@ def post_process(data: dict) -> dict:
 
 
 
+def make_record(pdf_file: Path, dataset: str, extracted: dict) -> dict:
+    return {
+        "File ID": pdf_file.stem,
+        "Dataset": dataset,
+        "File": pdf_file.name,
+        "Expected Output": json.dumps(extracted, ensure_ascii=False, indent=2)
+    }
+
+def job_key(job) -> str:
+    """Input hash of a job: the PDF's bytes, its dataset and the prompt used."""
+    pdf_file, dataset, prompt = job
+    return input_key(file_digest(pdf_file), dataset, prompt)
+
+async def _extract_job(index, job, pages_future, timeout):
+    pdf_file, dataset, prompt = job
+    result = {"index": index, "file": pdf_file.name, "dataset": dataset, "record": None, "error": None,
+              "tokens_saved": 0, "route": None}
+    try:
+        pages = await pages_future
+    except Exception as e:
+        result["error"] = f"PDF parsing failed: {e}"
+        return result
+    text = join_pages(pages)
+    if not text:
+        result["error"] = "No text (even after OCR)"
+        return result
+
+    logging.info(f"Extracting {pdf_file.name} as {dataset}")
+    try:
+        outcome = await extract_document_async(prompt, text, dataset, pdf_file.name, timeout=timeout,
+                                               pages=pages)
+    except (asyncio.TimeoutError, APITimeoutError):
+        result["error"] = f"GPT-4o call timed out after {timeout}s"
+        return result
+    except Exception as e:
+        result["error"] = f"GPT-4o call failed: {e}"
+        return result
+    result["tokens_saved"], result["route"] = outcome["tokens_saved"], outcome["route"]
+    if not outcome["extracted"]:
+        result["error"] = "Extraction failed"
+        return result
+
+    try:
+        result["record"] = make_record(pdf_file, dataset, post_process(outcome["extracted"]))
+    except Exception as e:
+        # e.g. int("2 pcs"): one malformed reply must not take down the other documents
+        result["error"] = f"Post-processing failed: {e}"
+    return result
+
+async def extract_documents_async(jobs, max_in_flight: int = LLM_MAX_IN_FLIGHT,
+                                  timeout: float = LLM_TIMEOUT, parse_workers: int = PARSE_WORKERS,
+                                  journal: RunJournal = None):
+    """
+    Extract many documents concurrently and return one result per job, in input order.
+
+    ``jobs`` are ``(pdf_file, dataset, prompt)`` tuples. A producer starts PDF
+    parsing on a thread pool and feeds a bounded queue; ``max_in_flight``
+    workers take documents off it and call GPT-4o, so parsing of later files
+    overlaps with model calls already in flight. Each result is a dict with
+    ``record`` on success or ``error`` describing why the document failed,
+    and the job's journal ``key`` (None without a journal).
+
+    With a ``journal``, documents whose input hash is already journaled are
+    answered from it (``resumed`` is True) and every new record is appended
+    as soon as it is extracted.
+    """
+    loop = asyncio.get_running_loop()
+    max_in_flight = max(1, max_in_flight)
+    queue = asyncio.Queue(maxsize=max_in_flight * 2)
+    results = [None] * len(jobs)
+
+    with ThreadPoolExecutor(max_workers=max(1, parse_workers)) as parse_pool:
+        async def producer():
+            for index, job in enumerate(jobs):
+                key = None
+                if journal is not None:
+                    key = await loop.run_in_executor(parse_pool, job_key, job)
+                    done = journal.get(key)
+                    if done is not None:
+                        results[index] = {"index": index, "file": job[0].name, "dataset": job[1], "key": key,
+                                          "record": done["record"], "error": None, "resumed": True}
+                        continue
+                pages_future = loop.run_in_executor(parse_pool, extract_pdf_pages, job[0])
+                await queue.put((index, job, key, pages_future))
+            for _ in range(max_in_flight):
+                await queue.put(None)
+
+        async def worker():
+            while True:
+                item = await queue.get()
+                if item is None:
+                    return
+                index, job, key, pages_future = item
+                result = await _extract_job(index, job, pages_future, timeout)
+                result["key"] = key
+                if journal is not None and result["record"] is not None:
+                    journal.append({"key": key, "file": job[0].name, "record": result["record"]})
+                results[index] = result
+
+        await asyncio.gather(producer(), *(worker() for _ in range(max_in_flight)))
+    return results
+
 def main():
     records, processed, failed, skipped, ocr_used = [], [], [], [], []
 
     all_pdfs = list(PDF_DIR.glob("*.pdf"))
     logging.info(f"Total PDF files found: {len(all_pdfs)}")
 
+    jobs = []
     for pdf_file in sorted(all_pdfs):
         fname = pdf_file.name
         lfname = fname.lower()
@@ -183,38 +636,43 @@ def main():
             continue
 
         processed.append(fname)
-        logging.info(f"Processing {fname} as {dataset}")
-        text = extract_pdf_text_with_ocr(pdf_file)
-        if not text:
-            logging.warning(f"No text (even after OCR) for {fname}")
-            failed.append(fname)
-            continue
-
-        extracted = call_gpt4o(prompt, text)
-        if not extracted:
-            logging.warning(f"Extraction failed for {fname}")
-            failed.append(fname)
-            continue
-
-        extracted = post_process(extracted)
-        records.append({
-            "File ID": pdf_file.stem,
-            "Dataset": dataset,
-            "File": pdf_file.name,
-            "Expected Output": json.dumps(extracted, ensure_ascii=False, indent=2)
-        })
-
-    # Write out results
-    with open(OUTPUT_JSON, "w", encoding="utf-8") as f:
+        jobs.append((pdf_file, dataset, prompt))
+
+    logging.info(f"Extracting {len(jobs)} documents with up to {LLM_MAX_IN_FLIGHT} calls in flight")
+    resumed = tokens_saved = 0
+    routes = {}
+    with RunJournal(JOURNAL_PATH, fsync_every=JOURNAL_FSYNC_EVERY) as journal:
+        if journal.entries:
+            logging.info(f"Resuming from {JOURNAL_PATH} ({len(journal.entries)} journaled records)")
+        for result in asyncio.run(extract_documents_async(jobs, journal=journal)):
+            if result["record"] is None:
+                logging.warning(f"{result['error']} for {result['file']}")
+                failed.append(result["file"])
+                continue
+            resumed += bool(result.get("resumed"))
+            tokens_saved += result.get("tokens_saved", 0)
+            if result.get("route"):
+                routes[result["route"]] = routes.get(result["route"], 0) + 1
+            # Resumed and new records alike are read back from the journal
+            records.append(journal.get(result["key"])["record"])
+
+    # Write out results (records come from the journal, in input order)
+    tmp_path = OUTPUT_JSON.with_name(OUTPUT_JSON.name + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
         json.dump(records, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, OUTPUT_JSON)
 
     # Diagnostics
     logging.info(f"Wrote {len(records)} records to {OUTPUT_JSON}")
-    logging.info(f"Processed: {len(processed)} | Success: {len(records)} | Failed: {len(failed)} | Skipped: {len(skipped)}")
+    logging.info(f"OpenAI budget: {default_scheduler().stats()}")
+    logging.info(f"Prompt compaction saved {tokens_saved} input tokens")
+    logging.info(f"Extraction routes (rules only / template / fill the rest / full model): {routes}")
+    logging.info(f"LLM response cache: {default_llm_cache().stats()}")
+    logging.info(f"Processed: {len(processed)} | Success: {len(records)} (resumed {resumed}) | Failed: {len(failed)} | Skipped: {len(skipped)}")
     if failed:
         logging.info("Failed files: " + ', '.join(failed))
     if skipped:
         logging.info("Skipped files (no 'invoice' or 'order' in filename): " + ', '.join(skipped))
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,311 @@
+"""
+Deterministic extraction of the fields that sit next to fixed German labels.
+
+Totals, order numbers, dates, emails and addresses follow a label listed in
+KEYWORD_MAPPINGS ("Gesamtsumme", "Nettowert", "Bestellnummer", "PLZ", ...)
+and line items are the position-numbered table rows, so most recurring
+supplier documents can be read without a model call. Every field gets a
+confidence:
+
+    CONFIDENT  one distinct value next to its label, or a cross-check passed
+               (item prices add up to the net total, every item row parsed)
+    LIKELY     found without a label (a company name, the only email in the text)
+    CONFLICT   several different values, or a failed cross-check
+
+A field counts as extracted when its confidence reaches ``min_confidence``;
+the rest are reported as ``missing`` for the model to fill in.
+"""
+import re
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from common.item_table import ITEM_ROW, item_rows
+
+CONFIDENT = 0.95
+LIKELY = 0.7
+CONFLICT = 0.5
+DEFAULT_MIN_CONFIDENCE = 0.9
+
+AMOUNT = r"(?<![\d.,])(?:\d{1,3}(?:\.\d{3})+(?:,\d{1,2})?|\d+(?:[.,]\d{1,2})?)(?!\d)"
+DATE = r"\d{1,2}[.\-/]\d{1,2}[.\-/]\d{4}"
+EMAIL = r"[\w.+\-]+@[\w\-]+(?:\.[\w\-]+)+"
+CODE = r"[A-Za-z0-9][A-Za-z0-9\-/.]*\d[A-Za-z0-9\-/.]*"
+PERSON = r"[A-ZÄÖÜ][\w'.\-]+(?:\s+[A-ZÄÖÜ][\w'.\-]+)+"
+COMPANY_SUFFIX = re.compile(r"\b(?:GmbH|mbH|AG|KG|OHG|UG|GbR|SE|e\.\s?K\.|e\.\s?V\.|Ltd\.?|Inc\.?)(?=\W|$)")
+
+LABELS = {
+    "total_gross": r"gesamtsumme|gesamtbetrag|rechnungsbetrag|bruttobetrag|bruttopreis|endbetrag|zu zahlen",
+    "total_net": r"nettowert|nettobetrag|netto\b|zwischensumme|warenwert",
+    "order_number": r"bestell(?:ung)?s?[\s-]*(?:nummer|nr\b\.?)|auftrags[\s-]*(?:nummer|nr\b\.?)",
+    "order_date": r"\b(?:bestell|auftrags|beleg)?datum\b",
+    "email": r"\be-?mail\b",
+    "company": r"\bfirma\b",
+    "person": r"\bansprechpartner(?:in)?\b|\bkontaktperson\b",
+    "delivery": r"\bliefer(?:adresse|anschrift)\b",
+}
+
+_ADDRESS = re.compile(
+    r"^(?P<street>.*?\d+\s*[a-zA-Z]?)\s*,?\s*(?:PLZ\s*:?\s*)?(?P<postal>\d{5})\s+(?:Ort\s*:?\s*)?"
+    r"(?P<city>[A-Za-zÄÖÜäöüß][^,\d|]*)")
+_PLAIN_INVOICE_ROW = re.compile(rf"^(\d{{1,4}})\s+(.+?)\s+({AMOUNT})\s*(?:EUR|€)?$")
+_PLAIN_ORDER_ROW = re.compile(rf"^(\d{{1,4}})\s+({CODE})\s+(\d+)(?:,0+)?\b")
+
+
+def schema_paths(schema: dict, prefix: str = "") -> list:
+    """Dotted paths of a format's leaf fields; a list of items is a single field."""
+    paths = []
+    for key, value in schema.items():
+        path = f"{prefix}{key}"
+        if isinstance(value, dict):
+            paths += schema_paths(value, path + ".")
+        else:
+            paths.append(path)
+    return paths
+
+
+def schema_subset(schema: dict, paths, prefix: str = "") -> dict:
+    """The part of ``schema`` holding the fields in ``paths``."""
+    subset = {}
+    for key, value in schema.items():
+        path = f"{prefix}{key}"
+        if isinstance(value, dict):
+            inner = schema_subset(value, paths, path + ".")
+            if inner:
+                subset[key] = inner
+        elif path in paths:
+            subset[key] = value
+    return subset
+
+
+def set_path(data: dict, path: str, value):
+    *parents, leaf = path.split(".")
+    for key in parents:
+        if not isinstance(data.get(key), dict):
+            data[key] = {}
+        data = data[key]
+    data[leaf] = value
+
+
+def get_path(data: dict, path: str):
+    for key in path.split("."):
+        if not isinstance(data, dict):
+            return None
+        data = data.get(key)
+    return data
+
+
+def _cells(line: str) -> list:
+    return [cell.strip() for cell in line.split(" | ")]
+
+
+class RuleExtractor:
+    """
+    Rule-based first pass over a document's text.
+
+    ``schemas`` maps a dataset ("Invoice", "Order") to the output part of
+    its format (INVOICE_FORMAT["output"], ...); ``parse_number`` and
+    ``parse_date`` are the normalizers the model's answers go through, so
+    both paths produce the same values.
+    """
+
+    def __init__(self, schemas: dict, parse_number, parse_date, min_confidence: float = DEFAULT_MIN_CONFIDENCE):
+        self.schemas = schemas
+        self.parse_number = parse_number
+        self.parse_date = parse_date
+        self.min_confidence = min_confidence
+        self.labels = {name: re.compile(pattern, re.IGNORECASE) for name, pattern in LABELS.items()}
+
+    # -- helpers ------------------------------------------------------------
+
+    def _labelled(self, lines, label: str, value: str, last: bool = False) -> list:
+        """Values matching ``value`` after each occurrence of ``label`` (or on the next line)."""
+        label_re, value_re = self.labels[label], re.compile(value)
+        found = []
+        for i, line in enumerate(lines):
+            match = label_re.search(line)
+            if not match:
+                continue
+            rest = line[match.end():]
+            values = value_re.findall(rest)
+            if not values and not rest.strip(" :.-()\t") and i + 1 < len(lines) and not ITEM_ROW.match(lines[i + 1]):
+                values = value_re.findall(lines[i + 1])
+            if values:
+                found.append(values[-1] if last else values[0])
+        return found
+
+    @staticmethod
+    def _pick(values, last: bool = False):
+        """(value, confidence) for the values found next to a label."""
+        if not values:
+            return None, 0.0
+        distinct = list(dict.fromkeys(values))
+        value = values[-1] if last else values[0]
+        return value, CONFIDENT if len(distinct) == 1 else CONFLICT
+
+    def _rest_of_line(self, lines, label: str) -> list:
+        found = []
+        for line in lines:
+            match = self.labels[label].search(line)
+            if match:
+                rest = line[match.end():].strip(" :\t")
+                if rest:
+                    found.append(rest)
+        return found
+
+    @staticmethod
+    def _company_lines(lines) -> list:
+        names = []
+        for line in lines:
+            if ":" in line or ITEM_ROW.match(line):
+                continue
+            for part in re.split(r"\s*[·•|,]\s*", line):
+                if COMPANY_SUFFIX.search(part):
+                    names.append(part.strip())
+                    break
+        return names
+
+    # -- per dataset ----------------------------------------------------------
+
+    def _invoice(self, lines, fields):
+        gross, gross_conf = self._pick(self._labelled(lines, "total_gross", AMOUNT, last=True), last=True)
+        net, net_conf = self._pick(self._labelled(lines, "total_net", AMOUNT, last=True), last=True)
+        gross, net = self.parse_number(gross), self.parse_number(net)
+        if gross is not None and net is not None and gross < net:
+            gross_conf = net_conf = CONFLICT
+
+        items, unparsed = [], 0
+        for line in (lines[i] for i in item_rows(lines)):
+            if " | " in line:
+                cells = _cells(line)
+                price_at = next((i for i in range(len(cells) - 1, 0, -1)
+                                 if re.fullmatch(rf"{AMOUNT}\s*(?:EUR|€)?", cells[i])), None)
+                name = next((c for c in cells[1:price_at] if re.search(r"[^\W\d_]{2}", c)), None) if price_at else None
+                price = cells[price_at] if price_at else None
+            else:
+                match = _PLAIN_INVOICE_ROW.match(line)
+                name, price = (match.group(2), match.group(3)) if match else (None, None)
+            price = self.parse_number(re.sub(r"\s*(?:EUR|€)$", "", price)) if price else None
+            if name is None or price is None:
+                unparsed += 1
+                continue
+            items.append({"name": name, "price": price})
+        if items:
+            # The net total is a checksum over the item prices
+            adds_up = net is not None and abs(sum(item["price"] for item in items) - net) < 0.015
+            fields["items"] = (items, CONFIDENT if adds_up and not unparsed else CONFLICT)
+            if adds_up:
+                net_conf = max(net_conf, CONFIDENT)
+        if gross is not None:
+            fields["total_gross"] = (gross, gross_conf)
+        if net is not None:
+            fields["total_net"] = (net, net_conf)
+
+        # Without a label the only company name may still be the recipient's
+        names = self._company_lines(lines)
+        if names:
+            fields["business_name"] = (names[0], LIKELY)
+
+    def _order(self, lines, fields):
+        company, conf = self._pick(self._rest_of_line(lines, "company"))
+        if company is None:
+            names = self._company_lines(lines)
+            company, conf = (names[0], LIKELY) if names else (None, 0.0)
+        if company is not None:
+            fields["buyer.buyer_company_name"] = (company, conf)
+
+        person, conf = self._pick(self._labelled(lines, "person", PERSON))
+        if person is not None:
+            fields["buyer.buyer_person_name"] = (person, conf)
+
+        email, conf = self._pick(self._labelled(lines, "email", EMAIL))
+        if email is None:
+            emails = list(dict.fromkeys(re.findall(EMAIL, "\n".join(lines))))
+            email, conf = (emails[0], LIKELY) if len(emails) == 1 else (None, 0.0)
+        if email is not None:
+            fields["buyer.buyer_email_address"] = (email, conf)
+
+        number, conf = self._pick(self._labelled(lines, "order_number", CODE))
+        if number is not None:
+            fields["order.order_number"] = (number, conf)
+        date, conf = self._pick(self._labelled(lines, "order_date", DATE))
+        if date is not None:
+            fields["order.order_date"] = (self.parse_date(date), conf)
+
+        addresses = []
+        for i, line in enumerate(lines):
+            match = self.labels["delivery"].search(line)
+            if match:
+                text = line[match.end():].strip(" :\t") or ", ".join(lines[i + 1:i + 3])
+                address = _ADDRESS.match(text)
+                if address:
+                    addresses.append(tuple(part.strip() for part in address.group("street", "postal", "city")))
+        address, conf = self._pick(addresses)
+        if address is not None:
+            street, postal, city = address
+            fields["order.delivery.delivery_address_street"] = (street, conf)
+            fields["order.delivery.delivery_address_postal_code"] = (postal, conf)
+            fields["order.delivery.delivery_address_city"] = (city, conf)
+
+        products, unparsed = [], 0
+        for line in (lines[i] for i in item_rows(lines)):
+            product = None
+            if " | " in line:
+                cells = _cells(line)
+                code_at = next((i for i in range(1, len(cells)) if re.fullmatch(CODE, cells[i])), None)
+                if code_at is not None and code_at + 1 < len(cells) and re.fullmatch(r"\d+(?:,0+)?", cells[code_at + 1]):
+                    product = (cells[0], cells[code_at], cells[code_at + 1].split(",")[0])
+            else:
+                match = _PLAIN_ORDER_ROW.match(line)
+                if match:
+                    product = match.groups()
+            if product is None:
+                unparsed += 1
+                continue
+            products.append({"product_position": int(product[0]), "product_article_code": product[1],
+                             "product_quantity": int(product[2])})
+        if products:
+            positions = [p["product_position"] for p in products]
+            ordered = all(b > a for a, b in zip(positions, positions[1:]))
+            fields["product"] = (products, CONFIDENT if ordered and not unparsed else CONFLICT)
+
+    # -- public -------------------------------------------------------------
+
+    def extract(self, text: str, dataset: str) -> dict:
+        """
+        Rule-based extraction of ``text`` as ``dataset``.
+
+        Returns ``{"data", "confidence", "missing"}``: the confident fields in
+        the model's reply shape (so they go through post_process unchanged),
+        the confidence of every field found, and the schema paths still
+        missing or below ``min_confidence``.
+        """
+        schema = self.schemas.get(dataset)
+        if schema is None:
+            return {"data": {}, "confidence": {}, "missing": []}
+        lines = [line.strip() for line in text.splitlines() if line.strip()]
+        fields = {}
+        if dataset == "Invoice":
+            self._invoice(lines, fields)
+        else:
+            self._order(lines, fields)
+
+        data, confidence, missing = {}, {}, []
+        for path in schema_paths(schema):
+            value, conf = fields.get(path, (None, 0.0))
+            if value is not None:
+                confidence[path] = conf
+            if value is not None and conf >= self.min_confidence:
+                set_path(data, path, value)
+            else:
+                missing.append(path)
+        return {"data": data, "confidence": confidence, "missing": missing}
+
+    def apply(self, extracted: dict, rules: dict) -> dict:
+        """Overlay the confident rule values onto a model reply (or a partial one)."""
+        extracted = dict(extracted or {})
+        for path in rules["confidence"]:
+            value = get_path(rules["data"], path)
+            if value is not None:
+                set_path(extracted, path, value)
+        return extracted
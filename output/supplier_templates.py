@@ -0,0 +1,341 @@
+"""
+Learned layout templates for recurring suppliers.
+
+A template is keyed by a layout fingerprint taken from the pdfplumber words
+of a document: the letterhead tokens at the top of the first page and the
+label words (ending in ":" or holding a KEYWORD_MAPPINGS key) with their
+column on a coarse grid, and their row too in the letterhead (below it rows
+move with the length of the item table). Documents whose fingerprint is close enough to a
+stored one (Jaccard similarity) are read with that template:
+
+    anchored fields    the words following the learned label on its line
+    positional fields  the words at the learned position (e.g. a letterhead
+                       name with no label in front of it); below the rules'
+                       threshold, so only a hint for the model
+
+A model reply for a new layout stores a candidate holding the single-valued
+fields found again in the document's own words. The candidate becomes a
+template once the reply for a second, different document of the layout
+agrees with what the candidate reads from it; fields that disagree are
+dropped. A reply for the same document again (a rerun, or a reply served
+from the LLM cache) never confirms a candidate. Lists (items, products) are
+left to the rules and the model. Coordinates are fractions of the page
+size, so the index is independent of the page format.
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+
+from rule_extract import CONFIDENT, DATE, LIKELY, get_path, schema_paths
+
+# Bump when the index layout changes; files of another version start empty
+INDEX_VERSION = 2
+# Confidence of a value read after its learned label, and of one read at a learned position
+ANCHORED = CONFIDENT
+POSITIONAL = LIKELY
+DEFAULT_MIN_SIMILARITY = 0.7
+# Fingerprint grid and letterhead height, as fractions of the page size
+GRID = 0.02
+LETTERHEAD_BAND = 0.15
+# Words whose tops differ by less than this are on the same line
+LINE_TOLERANCE = 0.005
+# A wider horizontal gap ends a value
+WORD_GAP = 0.03
+MAX_VALUE_WORDS = 8
+MAX_ANCHOR_WORDS = 3
+MIN_LEARNED_FIELDS = 2
+
+_CURRENCY = re.compile(r"\s*(?:EUR|€)$")
+
+
+def layout_lines(pages) -> list:
+    """``(page index, words left to right)`` per text line; words are ``[text, x0, top, x1, bottom]``."""
+    lines = []
+    for index, page in enumerate(pages):
+        current, top = [], None
+        for word in sorted(page["words"], key=lambda w: (w[2], w[1])):
+            if current and word[2] - top > LINE_TOLERANCE:
+                lines.append((index, sorted(current, key=lambda w: w[1])))
+                current = []
+            if not current:
+                top = word[2]
+            current.append(word)
+        if current:
+            lines.append((index, sorted(current, key=lambda w: w[1])))
+    return lines
+
+
+def _norm(text: str) -> str:
+    return " ".join(str(text).lower().split())
+
+
+def document_id(pages) -> str:
+    """Hash of the words and their positions, the same for every copy of a document."""
+    words = json.dumps([page["words"] for page in pages], separators=(",", ":"))
+    return hashlib.sha256(words.encode("utf-8")).hexdigest()[:16]
+
+
+class TemplateIndex:
+    """
+    Templates and candidates stored on disk by id, with lookup by layout similarity.
+
+    ``schemas`` maps a dataset to the output part of its format (only its
+    single-valued fields are templated), ``vocabulary`` holds the label
+    keywords (KEYWORD_MAPPINGS), and ``parse_number``/``parse_date`` are the
+    normalizers the model's answers go through.
+    """
+
+    def __init__(self, path, schemas: dict, vocabulary, parse_number, parse_date,
+                 min_similarity: float = DEFAULT_MIN_SIMILARITY):
+        self.path = str(path)
+        self.schemas = schemas
+        self.parse_number = parse_number
+        self.parse_date = parse_date
+        self.min_similarity = min_similarity
+        self.vocabulary = re.compile(r"\b(?:" + "|".join(re.escape(k.lower()) for k in vocabulary) + r")\b")
+        self._lock = threading.Lock()
+        self.entries = {}
+        self.load()
+        self._fingerprints = {tid: frozenset(t["fingerprint"]) for tid, t in self.entries.items()}
+
+    def load(self):
+        """Read the index from disk; a missing or stale-format file starts empty."""
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"Ignoring unreadable template index {self.path}: {e}")
+            return
+        if isinstance(data, dict) and data.get("version") == INDEX_VERSION:
+            self.entries = data.get("templates", {})
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": INDEX_VERSION, "templates": self.entries}, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+
+    # -- fingerprint and lookup ---------------------------------------------
+
+    def fingerprint(self, pages) -> frozenset:
+        tokens = set()
+        for index, page in enumerate(pages):
+            for text, x0, top, _, _ in page["words"]:
+                word = text.lower()
+                if index == 0 and top < LETTERHEAD_BAND and word.isalpha() and len(word) >= 3:
+                    tokens.add("b:" + word)
+                if word.endswith(":") or self.vocabulary.search(word):
+                    label = f"l:{word.rstrip(':')}@{round(x0 / GRID)}"
+                    if index == 0 and top < LETTERHEAD_BAND:
+                        label += f",{round(top / GRID)}"
+                    tokens.add(label)
+        return frozenset(tokens)
+
+    def _closest(self, fingerprint: frozenset, dataset: str, status: str):
+        best, best_score = None, 0.0
+        if not fingerprint:
+            return None, 0.0
+        with self._lock:
+            entries = [(tid, t, self._fingerprints[tid]) for tid, t in self.entries.items()
+                       if t["dataset"] == dataset and t["status"] == status]
+        for tid, entry, other in entries:
+            score = len(fingerprint & other) / len(fingerprint | other)
+            if score > best_score:
+                best, best_score = entry, score
+        if best_score < self.min_similarity:
+            return None, best_score
+        return best, best_score
+
+    def match(self, pages, dataset: str):
+        """The most similar confirmed template of ``dataset`` and its similarity, or ``(None, best similarity)``."""
+        return self._closest(self.fingerprint(pages), dataset, "confirmed")
+
+    # -- reading values -----------------------------------------------------
+
+    def _kind(self, dataset: str, field: str, value=None) -> str:
+        if get_path(self.schemas[dataset], field) in ("<float>", "<integer>"):
+            return "number"
+        if value is not None and re.fullmatch(DATE, str(value)):
+            return "date"
+        return "text"
+
+    def _parse(self, kind: str, text: str):
+        text = text.strip(" ,;")
+        if kind == "number":
+            return self.parse_number(_CURRENCY.sub("", text))
+        if kind == "date":
+            return self.parse_date(text) if re.fullmatch(DATE, text) else None
+        return text or None
+
+    @staticmethod
+    def _run(words, stop=()):
+        """Leading words up to a wide gap, a label (``...:``) or the start of another field's label."""
+        taken = []
+        for word in words[:MAX_VALUE_WORDS]:
+            if taken and (word[1] - taken[-1][3] > WORD_GAP or word[0] in stop or taken[-1][0].endswith(":")):
+                break
+            taken.append(word)
+        return taken
+
+    def apply(self, template: dict, pages) -> dict:
+        """``{field: (value, confidence)}`` for the template's fields found in ``pages``."""
+        lines = layout_lines(pages)
+        stop = {spec["anchor"][0] for spec in template["fields"].values() if spec.get("anchor")}
+        values = {}
+        for field, spec in template["fields"].items():
+            kind, value, confidence = spec["kind"], None, 0.0
+            anchor = spec.get("anchor")
+            if anchor:
+                hits = []
+                for _, words in lines:
+                    for i in range(len(words) - len(anchor) + 1):
+                        if [w[0] for w in words[i:i + len(anchor)]] == anchor:
+                            hits.append(words[i + len(anchor):])
+                if hits:
+                    following = hits[-1] if spec.get("last") else hits[0]
+                    if kind == "text":
+                        value = self._parse(kind, " ".join(w[0] for w in self._run(following, stop)))
+                    else:
+                        value = next((v for v in (self._parse(kind, w[0]) for w in following[:3]) if v is not None), None)
+                    confidence = ANCHORED
+            elif spec.get("bbox"):
+                x0, top, x1, bottom = spec["bbox"]
+                page = pages[spec["page"]] if -len(pages) <= spec["page"] < len(pages) else None
+                if page is not None:
+                    band = sorted((w for w in page["words"]
+                                   if top - LINE_TOLERANCE <= (w[2] + w[4]) / 2 <= bottom + LINE_TOLERANCE
+                                   and w[1] >= x0 - GRID / 2), key=lambda w: w[1])
+                    if band and band[0][1] <= x0 + GRID / 2:
+                        value = self._parse(kind, " ".join(w[0] for w in self._run(band)))
+                        confidence = POSITIONAL
+            if value is not None:
+                values[field] = (value, confidence)
+        return values
+
+    # -- learning -----------------------------------------------------------
+
+    def _locate(self, lines, kind: str, value):
+        """Every ``(line index, word index, word count)`` whose words read as ``value``."""
+        for li, (_, words) in enumerate(lines):
+            for i in range(len(words)):
+                for n in range(1, (MAX_VALUE_WORDS if kind == "text" else 1) + 1):
+                    if i + n > len(words):
+                        break
+                    parsed = self._parse(kind, " ".join(w[0] for w in words[i:i + n]))
+                    if parsed is None:
+                        continue
+                    if kind == "number" and abs(parsed - float(value)) < 0.005:
+                        yield li, i, n
+                    elif kind != "number" and _norm(parsed) == _norm(value):
+                        yield li, i, n
+
+    @staticmethod
+    def _anchor(words) -> list:
+        """The label words right before a value: up to MAX_ANCHOR_WORDS, none with digits, one ``...:`` at most."""
+        anchor = []
+        for word in reversed(words):
+            if len(anchor) == MAX_ANCHOR_WORDS or re.search(r"[\d@]", word[0]) or (anchor and word[0].endswith(":")):
+                break
+            anchor.insert(0, word[0])
+        return anchor
+
+    def _agrees(self, kind: str, read, expected) -> bool:
+        """True if a value the template read equals the model's ``expected`` after normalization."""
+        if expected in (None, ""):
+            return False
+        if kind == "number":
+            expected = self.parse_number(str(expected))
+            return expected is not None and abs(read - expected) < 0.005
+        if kind == "date":
+            expected = self.parse_date(str(expected))
+        return _norm(read) == _norm(expected)
+
+    def _fields(self, pages, dataset: str, extracted: dict) -> dict:
+        """Field specs for the single-valued fields of ``extracted`` found in the words of ``pages``."""
+        lines = layout_lines(pages)
+        fields = {}
+        for field in schema_paths(self.schemas[dataset]):
+            if isinstance(get_path(self.schemas[dataset], field), list):
+                continue
+            value = get_path(extracted, field)
+            if value in (None, ""):
+                continue
+            kind = self._kind(dataset, field, value)
+            try:
+                found = list(self._locate(lines, kind, value))
+            except (TypeError, ValueError):
+                found = []
+            if not found:
+                continue
+            # A value that also appears elsewhere (a net total equal to the only item's price)
+            # is taken where a "label:" precedes it
+            labelled = [(li, i, n) for li, i, n in found if lines[li][1][:i] and lines[li][1][i - 1][0].endswith(":")]
+            li, i, n = (labelled or found)[0]
+            page, words = lines[li]
+            anchor = self._anchor(words[:i])
+            spec = {"kind": kind}
+            if anchor:
+                texts = [[w[0] for w in line_words] for _, line_words in lines]
+                occurrences = [k for k, line in enumerate(texts)
+                               if any(line[j:j + len(anchor)] == anchor for j in range(len(line)))]
+                spec.update(anchor=anchor, last=len(occurrences) > 1 and occurrences[-1] == li)
+            else:
+                value_words = words[i:i + n]
+                spec.update(page=page if page == 0 else page - len(pages),
+                            bbox=[value_words[0][1], min(w[2] for w in value_words),
+                                  value_words[-1][3], max(w[4] for w in value_words)])
+            fields[field] = spec
+        return fields
+
+    def learn(self, pages, dataset: str, extracted: dict, source: str = ""):
+        """
+        Learn from a model reply for ``pages``.
+
+        A layout with no entry gets a candidate. A candidate is confirmed
+        into a template, keeping the fields it reads as the reply has them,
+        when the reply is for another document and at least
+        MIN_LEARNED_FIELDS agree; otherwise the reply replaces it. Returns
+        the stored entry (``status`` "candidate" or "confirmed"), or None if
+        nothing was stored. Writes the index, so call it off the event loop.
+        """
+        if dataset not in self.schemas or not extracted:
+            return None
+        fingerprint = self.fingerprint(pages)
+        if not fingerprint or self._closest(fingerprint, dataset, "confirmed")[0] is not None:
+            return None
+        document = document_id(pages)
+        candidate, _ = self._closest(fingerprint, dataset, "candidate")
+        if candidate is not None:
+            if document in candidate["documents"]:
+                return None
+            read = self.apply(candidate, pages)
+            agreed = {field: spec for field, spec in candidate["fields"].items()
+                      if field in read and self._agrees(spec["kind"], read[field][0], get_path(extracted, field))}
+            if len(agreed) >= MIN_LEARNED_FIELDS:
+                entry = dict(candidate, status="confirmed", fields=agreed,
+                             documents=candidate["documents"] + [document],
+                             sources=candidate["sources"] + [source])
+                with self._lock:
+                    self.entries[entry["id"]] = entry
+                    self._save()
+                return entry
+
+        fields = self._fields(pages, dataset, extracted)
+        if len(fields) < MIN_LEARNED_FIELDS:
+            return None
+        template_id = hashlib.sha256("\n".join(sorted(fingerprint)).encode("utf-8")).hexdigest()[:16]
+        entry = {"id": template_id, "dataset": dataset, "status": "candidate", "documents": [document],
+                 "sources": [source], "fingerprint": sorted(fingerprint), "fields": fields}
+        with self._lock:
+            if candidate is not None:
+                self.entries.pop(candidate["id"], None)
+                self._fingerprints.pop(candidate["id"], None)
+            self.entries[template_id] = entry
+            self._fingerprints[template_id] = fingerprint
+            self._save()
+        return entry
@@ -0,0 +1,77 @@
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from pdf_to_json import clean_text, collect_pdfs
+
+
+def clean_text_reference(text: str) -> str:
+    """The original four-pass clean_text, kept as the baseline for comparison."""
+    text = re.sub(r'[^\x20-\x7E\n\t]', '', text)
+    text = re.sub(r'(\w)![l1i](\w)', r'\1l\2', text)
+    text = re.sub(r'\s+', ' ', text)
+    text = text.strip()
+    return text
+
+
+def load_page_texts(source: str) -> list:
+    """Raw (uncleaned) page texts of every sample PDF."""
+    import pdfplumber
+
+    texts = []
+    for pdf_path in collect_pdfs(source):
+        with pdfplumber.open(pdf_path) as pdf:
+            for page in pdf.pages:
+                text = page.extract_text()
+                if text:
+                    texts.append(text)
+    return texts
+
+
+def fuzz_texts(count: int = 2000, seed: int = 0) -> list:
+    """Random strings heavy in whitespace, control chars, umlauts and '!' OCR patterns."""
+    rng = random.Random(seed)
+    alphabet = "ab1il!_ \t\n\r\x0b\x0c\x1c\x00\x7fäöüß€–  Z9"
+    return ["".join(rng.choice(alphabet) for _ in range(rng.randint(0, 200))) for _ in range(count)]
+
+
+def bench(func, texts, repeat: int) -> float:
+    """Best-of-``repeat`` seconds to clean every text once."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for text in texts:
+            func(text)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark clean_text against the original regex version.")
+    parser.add_argument("source", nargs="?", default="airtable_attachments/attachments",
+                        help="Directory or glob of sample PDFs")
+    parser.add_argument("--repeat", type=int, default=20, help="Timing repetitions (best is reported)")
+    args = parser.parse_args()
+
+    texts = load_page_texts(args.source)
+    print(f"Loaded {len(texts)} pages ({sum(map(len, texts))} chars) from {args.source}")
+
+    mismatches = [t for t in texts + fuzz_texts() if clean_text(t) != clean_text_reference(t)]
+    if mismatches:
+        print(f"Error: {len(mismatches)} inputs differ from the reference output")
+        sys.exit(1)
+    print("Output identical to the reference on all sample pages and fuzz inputs")
+
+    reference = bench(clean_text_reference, texts, args.repeat)
+    current = bench(clean_text, texts, args.repeat)
+    print(f"reference: {reference * 1000:.2f} ms")
+    print(f"clean_text: {current * 1000:.2f} ms")
+    print(f"speedup:   {reference / current:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -55,16 +55,38 @@
 # if __name__ == "__main__":
 #     main()
 
+import argparse
+import glob
 import json
 import pdfplumber
 import io
 from pypdf import PdfReader
 import os
 import re
+import sys
+import textwrap
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.pdf_cache import default_cache
+from common.telemetry import span
+
+# Bump when the extraction or cleaning output changes, so cached JSON is not reused
+EXTRACTOR_VERSION = "1"
+
+# Control characters other than newline/tab (plus DEL); non-ASCII is dropped by encoding
+_CONTROL_CHARS = {c: None for c in (*range(0x00, 0x20), 0x7F) if chr(c) not in "\n\t"}
+# Common OCR errors (e.g., '!' in place of 'l' or 'i')
+_OCR_BANG = re.compile(r'(\w)![l1i](\w)')
 
 def clean_text(text: str) -> str:
     """
     Clean extracted text by removing OCR artifacts, non-printable characters, and normalizing whitespace.
+
+    Runs as one encode/translate pass for non-printables, a precompiled OCR
+    substitution (only when a '!' is present) and a split/join whitespace
+    collapse; the output is identical to the original chained ``re.sub`` calls.
     
     Args:
         text (str): Raw text extracted from PDF.
@@ -73,14 +95,12 @@ def clean_text(text: str) -> str:
         str: Cleaned text.
     """
     # Remove non-printable characters (keep ASCII printable and newline/tab)
-    text = re.sub(r'[^\x20-\x7E\n\t]', '', text)
+    text = text.encode("ascii", "ignore").decode("ascii").translate(_CONTROL_CHARS)
     # Replace common OCR errors (e.g., '!' in place of 'l' or 'i')
-    text = re.sub(r'(\w)![l1i](\w)', r'\1l\2', text)
-    # Normalize multiple spaces and newlines
-    text = re.sub(r'\s+', ' ', text)
-    # Trim leading/trailing whitespace
-    text = text.strip()
-    return text
+    if "!" in text:
+        text = _OCR_BANG.sub(r'\1l\2', text)
+    # Normalize multiple spaces and newlines, trim leading/trailing whitespace
+    return " ".join(text.split())
 
 def extract_raw_json(file_stream: io.BytesIO) -> dict:
     """Extract all text from a PDF into raw JSON."""
@@ -93,28 +113,93 @@ def extract_raw_json(file_stream: io.BytesIO) -> dict:
     except Exception as e:
         return {"error": str(e)}
 
-def pdf_to_json(pdf_path: str, json_path: str, use_raw: bool = False) -> None:
-    """Convert PDF to JSON, either using pdfplumber (structured) or PyPDF2 (raw)."""
-    data = {}
-    
+def _extract_raw(pdf_path: str) -> dict:
+    with open(pdf_path, 'rb') as file:
+        file_stream = io.BytesIO(file.read())
+        return extract_raw_json(file_stream)
+
+def _release_page(page) -> None:
+    """Drop a pdfplumber page's parsed objects so memory does not grow with page count."""
+    close = getattr(page, "close", None) or page.flush_cache
+    close()
+
+def iter_pages(pdf_path: str):
+    """Yield each page's cleaned record, releasing the pdfplumber page right after."""
+    with pdfplumber.open(pdf_path) as pdf:
+        for page_num, page in enumerate(pdf.pages, start=1):
+            try:
+                with span("pdfplumber.page", extractor="pdf_to_json", page=page_num):
+                    text = page.extract_text()
+            finally:
+                _release_page(page)
+            # Clean the extracted text
+            cleaned_text = clean_text(text) if text else ""
+            yield {
+                "page_number": page_num,
+                "content": cleaned_text
+            }
+
+def _extract_pages(pdf_path: str) -> dict:
+    return {"pages": list(iter_pages(pdf_path))}
+
+def extract_json(pdf_path: str, use_raw: bool = False) -> dict:
+    """Extract cleaned PDF content, reusing the shared extraction cache."""
     if use_raw:
         # Use raw text extraction
-        with open(pdf_path, 'rb') as file:
-            file_stream = io.BytesIO(file.read())
-            data = extract_raw_json(file_stream)
-    else:
-        # Use structured text extraction with pdfplumber
-        data = {"pages": []}
-        with pdfplumber.open(pdf_path) as pdf:
-            for page_num, page in enumerate(pdf.pages, start=1):
-                text = page.extract_text()
-                # Clean the extracted text
-                cleaned_text = clean_text(text) if text else ""
-                page_data = {
-                    "page_number": page_num,
-                    "content": cleaned_text
-                }
-                data["pages"].append(page_data)
+        return default_cache().get_or_compute(
+            pdf_path, "pdf_to_json.raw", EXTRACTOR_VERSION, _extract_raw,
+            cacheable=lambda data: "error" not in data)
+    # Use structured text extraction with pdfplumber
+    return default_cache().get_or_compute(
+        pdf_path, "pdf_to_json.pages", EXTRACTOR_VERSION, _extract_pages)
+
+def stream_pdf_to_json(pdf_path: str, json_path: str, fmt: str = "array") -> int:
+    """
+    Write a PDF's pages to ``json_path`` one at a time and return the page count.
+
+    ``fmt="array"`` produces the same ``{"pages": [...]}`` document as
+    :func:`pdf_to_json`; ``fmt="jsonl"`` writes one page record per line.
+    Only the current page is held in memory, so peak memory stays flat for
+    long documents. The output appears atomically once every page is written.
+    """
+    if fmt not in ("array", "jsonl"):
+        raise ValueError(f"Unknown stream format: {fmt}")
+    tmp_path = json_path + ".part"
+    count = 0
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as out:
+            if fmt == "array":
+                out.write('{\n    "pages": [')
+            for page_data in iter_pages(pdf_path):
+                if fmt == "jsonl":
+                    out.write(json.dumps(page_data, ensure_ascii=False) + "\n")
+                else:
+                    record = json.dumps(page_data, indent=4, ensure_ascii=False)
+                    out.write(("," if count else "") + "\n" + textwrap.indent(record, " " * 8))
+                count += 1
+            if fmt == "array":
+                out.write("\n    ]\n}" if count else "]\n}")
+        os.replace(tmp_path, json_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return count
+
+def pdf_to_json(pdf_path: str, json_path: str, use_raw: bool = False, stream: str = None):
+    """
+    Convert PDF to JSON, either using pdfplumber (structured) or PyPDF2 (raw).
+
+    Pass ``stream="array"`` or ``stream="jsonl"`` to write pages incrementally
+    with bounded memory (see :func:`stream_pdf_to_json`); streaming skips the
+    extraction cache, which would need the whole document in memory.
+    Returns the data written (None when streaming); a failed save raises.
+    """
+    if stream and not use_raw:
+        pages = stream_pdf_to_json(pdf_path, json_path, fmt=stream)
+        print(f"Clean JSON streamed ({pages} pages): {json_path}")
+        return None
+
+    data = extract_json(pdf_path, use_raw=use_raw)
     
     # Save cleaned data to JSON file
     try:
@@ -123,14 +208,117 @@ def pdf_to_json(pdf_path: str, json_path: str, use_raw: bool = False) -> None:
         print(f"Clean JSON created: {json_path}")
     except Exception as e:
         print(f"Error saving JSON: {e}")
+        raise
+    return data
+
+def collect_pdfs(source: str) -> list:
+    """
+    Resolve a directory or glob pattern to a sorted list of PDF paths.
+
+    Matches both ``.pdf`` and ``.PDF`` (any case) extensions.
+    """
+    if os.path.isdir(source):
+        candidates = [os.path.join(source, name) for name in os.listdir(source)]
+    else:
+        candidates = glob.glob(source)
+    pdfs = {os.path.normpath(path) for path in candidates
+            if path.lower().endswith(".pdf") and os.path.isfile(path)}
+    return sorted(pdfs)
+
+def _convert_one(pdf_path: str, json_path: str, use_raw: bool, stream: str = None) -> dict:
+    """Convert a single PDF inside a worker process and report how it went."""
+    start = time.perf_counter()
+    result = {"file": pdf_path, "json": json_path}
+    try:
+        data = pdf_to_json(pdf_path, json_path, use_raw=use_raw, stream=stream)
+        # Raw mode reports a PDF it could not read as an {"error": ...} payload
+        if isinstance(data, dict) and "error" in data:
+            result["status"] = "failed"
+            result["error"] = data["error"]
+        else:
+            result["status"] = "ok"
+    except Exception as e:
+        result["status"] = "failed"
+        result["error"] = f"{type(e).__name__}: {e}"
+    result["seconds"] = round(time.perf_counter() - start, 4)
+    return result
+
+def batch_convert(pdf_paths: list, out_dir: str, workers: int = None, use_raw: bool = False,
+                  summary_path: str = None, stream: str = None) -> dict:
+    """
+    Convert many PDFs in parallel across a process pool.
+
+    Each PDF gets ``<out_dir>/<stem>.json`` (``.jsonl`` when streaming JSON
+    Lines). A failing file is recorded in the
+    summary and does not stop the batch. The summary (per-file timings and
+    failures) is returned and written to ``summary_path``, which defaults to
+    ``<out_dir>/batch_summary.json``.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    workers = workers or os.cpu_count() or 1
+    summary_path = summary_path or os.path.join(out_dir, "batch_summary.json")
+
+    start = time.perf_counter()
+    files = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = []
+        for pdf_path in pdf_paths:
+            base = os.path.splitext(os.path.basename(pdf_path))[0]
+            ext = "jsonl" if stream == "jsonl" and not use_raw else "json"
+            json_path = os.path.join(out_dir, f"{base}.{ext}")
+            futures.append(executor.submit(_convert_one, pdf_path, json_path, use_raw, stream))
+        for future in as_completed(futures):
+            result = future.result()
+            files.append(result)
+            if result["status"] == "ok":
+                print(f"→ Created JSON: {result['json']} ({result['seconds']:.2f}s)")
+            else:
+                print(f"Error converting {result['file']}: {result['error']}")
+
+    files.sort(key=lambda r: r["file"])
+    failed = [r for r in files if r["status"] != "ok"]
+    summary = {
+        "workers": workers,
+        "total_files": len(files),
+        "succeeded": len(files) - len(failed),
+        "failed": len(failed),
+        "wall_seconds": round(time.perf_counter() - start, 4),
+        "cpu_seconds": round(sum(r["seconds"] for r in files), 4),
+        "files": files,
+    }
+    with open(summary_path, 'w', encoding='utf-8') as f:
+        json.dump(summary, f, indent=4, ensure_ascii=False)
+    print(f"Batch summary: {summary['succeeded']}/{summary['total_files']} converted "
+          f"in {summary['wall_seconds']:.2f}s -> {summary_path}")
+    return summary
 
 def main():
+    parser = argparse.ArgumentParser(description="Convert PDFs to cleaned JSON.")
+    parser.add_argument("source", nargs="?",
+                        help="Directory or glob of PDFs to convert in batch mode")
+    parser.add_argument("--out-dir", default="json_output", help="Output folder for JSON files")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Worker processes for batch mode (default: CPU count)")
+    parser.add_argument("--raw", action="store_true", help="Use raw PyPDF text extraction")
+    parser.add_argument("--stream", choices=["array", "jsonl"],
+                        help="Write pages incrementally with bounded memory")
+    args = parser.parse_args()
+
     # Directory where your PDFs live
     pdf_dir = "airtable_attachments/attachments"
     # Create output folder
-    out_dir = "json_output"
+    out_dir = args.out_dir
     os.makedirs(out_dir, exist_ok=True)
 
+    if args.source:
+        pdf_paths = collect_pdfs(args.source)
+        if not pdf_paths:
+            print(f"Error: no PDF files found for '{args.source}'.")
+            return
+        batch_convert(pdf_paths, out_dir, workers=args.workers, use_raw=args.raw,
+                      stream=args.stream)
+        return
+
     # List the two PDF filenames you want to process
     pdf_files = [
         "invoice_rec2YTyfnPoBgjXMp.pdf",
@@ -145,10 +333,18 @@ def main():
 
         # Build the JSON output path, same base name but under json_output/
         base = os.path.splitext(fname)[0]
-        json_path = os.path.join(out_dir, f"{base}.json")
+        ext = "jsonl" if args.stream == "jsonl" and not args.raw else "json"
+        json_path = os.path.join(out_dir, f"{base}.{ext}")
 
         # Call your existing converter
-        pdf_to_json(pdf_path, json_path, use_raw=False)
+        try:
+            data = pdf_to_json(pdf_path, json_path, use_raw=args.raw, stream=args.stream)
+        except Exception as e:
+            print(f"Error converting {pdf_path}: {e}")
+            continue
+        if isinstance(data, dict) and "error" in data:
+            print(f"Error converting {pdf_path}: {data['error']}")
+            continue
         print(f"→ Created JSON: {json_path}")
 
 if __name__ == "__main__":
@@ -0,0 +1,286 @@
+"""
+End-to-end pipeline: download -> parse -> classify -> extract -> evaluate.
+
+The stage scripts normally hand off through directories, each finishing the
+whole corpus before the next starts. Here every stage runs concurrently,
+connected by bounded asyncio queues: a PDF is parsed, classified, extracted
+and scored while later attachments are still downloading, and a full queue
+makes the stage in front of it wait, so memory stays bounded. Total latency
+approaches that of the slowest stage instead of the sum of all of them.
+
+    python pipeline/run_pipeline.py                       # fetch from Airtable
+    python pipeline/run_pipeline.py --records airtable_attachments/output/airtable_data.json
+
+With ``--records`` the Airtable sync is skipped and attachments are read
+from the attachments directory (downloading only those that are missing and
+still have a URL).
+"""
+import argparse
+import asyncio
+import contextvars
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+for stage_dir in ("", "airtable_attachments", "pdf_json", "prompt", "output"):
+    sys.path.insert(0, str(ROOT / stage_dir))
+# output1 loads its prompts and checks its folders relative to BEAM_BASE_DIR
+os.environ.setdefault("BEAM_BASE_DIR", str(ROOT))
+
+import extract_attachments
+from downloader import AttachmentDownloader, clean_filename
+from pdf_to_json import clean_text
+from prompt import classify_document, get_registry
+import output1
+from columnar_eval import ColumnarEvaluator
+from common.telemetry import bind, span, telemetry
+
+DEFAULT_OUT_DIR = ROOT / "pipeline_output"
+DEFAULT_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "16"))
+DEFAULT_WORKERS = {
+    "download": int(os.getenv("PIPELINE_DOWNLOAD_WORKERS", str(extract_attachments.max_downloads))),
+    "parse": int(os.getenv("PIPELINE_PARSE_WORKERS", str(os.cpu_count() or 1))),
+    "classify": int(os.getenv("PIPELINE_CLASSIFY_WORKERS", "2")),
+    "extract": int(os.getenv("PIPELINE_EXTRACT_WORKERS", str(output1.LLM_MAX_IN_FLIGHT))),
+    "evaluate": int(os.getenv("PIPELINE_EVALUATE_WORKERS", "1")),
+}
+STAGES = ("download", "parse", "classify", "extract", "evaluate")
+
+# End-of-stream marker passed down the queues
+_DONE = object()
+
+
+def iter_documents(records):
+    """One work item per PDF attachment of each Airtable record (raw API or airtable_data.json shape)."""
+    for record in records:
+        fields = record.get("fields", record)
+        attachments = fields.get("File") or []
+        if isinstance(attachments, str):
+            attachments = [{"filename": name.strip()} for name in attachments.split(";") if name.strip()]
+        for attachment in attachments:
+            filename = attachment.get("filename") or f"attachment_{attachment.get('id')}"
+            if not filename.lower().endswith(".pdf"):
+                continue
+            yield {
+                "file_id": fields.get("File ID", ""),
+                "dataset": fields.get("Dataset", ""),
+                "truth": fields.get("Expected Output", ""),
+                "url": attachment.get("url"),
+                "filename": filename,
+                "error": None,
+            }
+
+
+class Pipeline:
+    """
+    Runs the stages as pools of asyncio workers joined by bounded queues.
+
+    Blocking work (HTTP downloads, PDF parsing, classification and prompt
+    lookup, scoring) runs on one thread pool per stage sized to that stage's
+    worker count; extraction is natively async. A document that fails keeps
+    flowing with its ``error`` set so it is still reported at the end.
+    """
+
+    def __init__(self, attachments_dir, workers: dict = None, queue_size: int = DEFAULT_QUEUE_SIZE,
+                 timeout: float = output1.LLM_TIMEOUT):
+        self.attachments_dir = str(attachments_dir)
+        self.workers = dict(DEFAULT_WORKERS, **(workers or {}))
+        self.queue_size = max(1, queue_size)
+        self.timeout = timeout
+        self.stage_seconds = {stage: 0.0 for stage in STAGES}
+        self.results = []
+
+    # -- stage functions (blocking ones run on the stage's thread pool) -----
+
+    def download(self, doc):
+        path = os.path.join(self.attachments_dir, clean_filename(doc["filename"]))
+        if not os.path.exists(path):
+            if not doc["url"]:
+                doc["error"] = f"Attachment not found: {path}"
+                return doc
+            filename = self._downloader.download(doc["url"], doc["filename"])
+            if filename is None:
+                doc["error"] = f"Download failed for {doc['filename']}"
+                return doc
+            path = os.path.join(self.attachments_dir, filename)
+        doc["path"] = Path(path)
+        return doc
+
+    def parse(self, doc):
+        # One pdfplumber pass: the classifier reads the same page text the model gets
+        pages = output1.extract_pdf_pages(doc["path"])
+        doc["raw_json"] = {"pages": [{"page_number": number, "content": clean_text(page["text"])}
+                                     for number, page in enumerate(pages, start=1)]}
+        doc["text"] = output1.join_pages(pages)
+        doc["pages"] = pages
+        if not doc["text"]:
+            doc["error"] = "No text (even after OCR)"
+        return doc
+
+    def classify(self, doc):
+        doc["doc_type"] = classify_document(doc.pop("raw_json"))["doc_type"]
+        doc["prompt"] = get_registry().get_or_generate(doc["doc_type"])
+        return doc
+
+    async def extract(self, doc):
+        text, prompt, pages = doc.pop("text"), doc.pop("prompt"), doc.pop("pages")
+        try:
+            outcome = await output1.extract_document_async(prompt, text, doc["doc_type"], doc["filename"],
+                                                           timeout=self.timeout, pages=pages)
+        except Exception as e:
+            doc["error"] = f"GPT-4o call failed: {e}"
+            return doc
+        extracted = outcome["extracted"]
+        doc["tokens_saved"], doc["route"] = outcome["tokens_saved"], outcome["route"]
+        if not extracted:
+            doc["error"] = "Extraction failed"
+            return doc
+        try:
+            doc["record"] = output1.make_record(doc["path"], doc["doc_type"], output1.post_process(extracted))
+        except Exception as e:
+            doc["error"] = f"Post-processing failed: {e}"
+            return doc
+        if doc["file_id"]:
+            doc["record"]["File ID"] = doc["file_id"]
+        return doc
+
+    def evaluate(self, doc):
+        if doc["truth"]:
+            truth = {"File ID": doc["record"]["File ID"], "Dataset": doc["dataset"] or doc["doc_type"],
+                     "Expected Output": doc["truth"]}
+            result = ColumnarEvaluator([truth]).evaluate([doc["record"]])
+            doc["accuracy"] = result.get("accuracy")
+        return doc
+
+    # -- plumbing -----------------------------------------------------------
+
+    async def _run_stage(self, name, inbox, outbox):
+        func = getattr(self, name)
+        is_async = asyncio.iscoroutinefunction(func)
+        loop = asyncio.get_running_loop()
+        workers = max(1, self.workers[name])
+
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"pipeline-{name}") as pool:
+            async def worker():
+                while True:
+                    doc = await inbox.get()
+                    if doc is _DONE:
+                        await inbox.put(_DONE)  # let the other workers see it too
+                        return
+                    if doc["error"] is None:
+                        start = time.perf_counter()
+                        with bind(doc=doc["filename"]), span(f"pipeline.{name}"):
+                            # Carry the bound document into the thread pool
+                            context = contextvars.copy_context()
+                            try:
+                                if is_async:
+                                    doc = await func(doc)
+                                else:
+                                    doc = await loop.run_in_executor(pool, context.run, func, doc)
+                            except Exception as e:
+                                doc["error"] = f"{name} failed: {e}"
+                        self.stage_seconds[name] += time.perf_counter() - start
+                    if outbox is not None:
+                        await outbox.put(doc)
+                    else:
+                        self._finish(doc)
+
+            await asyncio.gather(*(worker() for _ in range(workers)))
+        if outbox is not None:
+            await outbox.put(_DONE)
+
+    def _finish(self, doc):
+        doc.pop("raw_json", None)
+        doc.pop("text", None)
+        doc.pop("pages", None)
+        doc.pop("prompt", None)
+        self.results.append(doc)
+        status = doc["error"] or f"accuracy {doc.get('accuracy')}"
+        logging.info(f"[{len(self.results)}] {doc['filename']}: {status}")
+
+    async def _feed(self, documents, inbox):
+        loop = asyncio.get_running_loop()
+        iterator = iter(documents)
+        while True:
+            # The source may block on Airtable paging, so pull from it off the loop
+            doc = await loop.run_in_executor(None, next, iterator, None)
+            if doc is None:
+                break
+            await inbox.put(doc)
+        await inbox.put(_DONE)
+
+    async def run(self, documents):
+        """Push ``documents`` (see :func:`iter_documents`) through every stage; returns them finished."""
+        queues = [asyncio.Queue(maxsize=self.queue_size) for _ in STAGES]
+        with AttachmentDownloader(self.attachments_dir, max_workers=1,
+                                  client=extract_attachments.download_client) as self._downloader:
+            tasks = [self._feed(documents, queues[0])]
+            for i, name in enumerate(STAGES):
+                outbox = queues[i + 1] if i + 1 < len(STAGES) else None
+                tasks.append(self._run_stage(name, queues[i], outbox))
+            await asyncio.gather(*tasks)
+        return self.results
+
+
+def load_records(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run download, parsing, classification, extraction and evaluation as one pipeline.")
+    parser.add_argument("--records", help="airtable_data.json from an earlier sync (skips the Airtable API)")
+    parser.add_argument("--attachments-dir", default=extract_attachments.attachments_dir,
+                        help="Where attachments are read from and downloaded to")
+    parser.add_argument("--out-dir", default=str(DEFAULT_OUT_DIR), help="Where results are written")
+    parser.add_argument("--queue-size", type=int, default=DEFAULT_QUEUE_SIZE, help="Capacity of each inter-stage queue")
+    for stage in STAGES:
+        parser.add_argument(f"--{stage}-workers", type=int, default=DEFAULT_WORKERS[stage],
+                            help=f"Concurrency of the {stage} stage")
+    args = parser.parse_args()
+
+    records = load_records(args.records) if args.records else extract_attachments.iter_records()
+    workers = {stage: getattr(args, f"{stage}_workers") for stage in STAGES}
+    pipeline = Pipeline(args.attachments_dir, workers=workers, queue_size=args.queue_size)
+
+    start = time.perf_counter()
+    results = asyncio.run(pipeline.run(iter_documents(records)))
+    elapsed = time.perf_counter() - start
+
+    os.makedirs(args.out_dir, exist_ok=True)
+    extracted = [doc["record"] for doc in results if doc.get("record")]
+    truths = [{"File ID": doc["record"]["File ID"], "Dataset": doc["dataset"] or doc["doc_type"],
+               "Expected Output": doc["truth"]} for doc in results if doc.get("record") and doc["truth"]]
+    evaluation = ColumnarEvaluator(truths).evaluate(extracted) if truths else {"error": "No ground truth"}
+    report = {
+        "documents": len(results),
+        "extracted": len(extracted),
+        "failed": {doc["filename"]: doc["error"] for doc in results if doc["error"]},
+        "elapsed_seconds": round(elapsed, 3),
+        "stage_busy_seconds": {stage: round(s, 3) for stage, s in pipeline.stage_seconds.items()},
+        "tokens_saved": sum(doc.get("tokens_saved", 0) for doc in results),
+        "extraction_routes": {route: sum(1 for doc in results if doc.get("route") == route)
+                              for route in ("rules", "template", "fill", "model")},
+        "workers": workers,
+        "evaluation": evaluation,
+    }
+    with open(os.path.join(args.out_dir, "extracted_data.json"), "w", encoding="utf-8") as f:
+        json.dump(extracted, f, ensure_ascii=False, indent=2)
+    with open(os.path.join(args.out_dir, "pipeline_report.json"), "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+    logging.info(f"Pipeline finished {len(results)} documents in {elapsed:.1f}s "
+                 f"({len(extracted)} extracted, {len(report['failed'])} failed)")
+    logging.info(f"Overall accuracy: {evaluation.get('accuracy')}")
+    logging.info(f"OpenAI budget: {output1.default_scheduler().stats()}")
+    logging.info(f"Results written to {args.out_dir}")
+    telemetry().flush()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,69 +1,25 @@
+import hashlib
 import json
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from openai import OpenAI
 from dotenv import load_dotenv
 import sys
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.llm_scheduler import default_scheduler
+from doc_classifier import DocumentClassifier
+from schemas import INVOICE_FORMAT, KEYWORD_MAPPINGS, ORDER_FORMAT
+
 # Load environment variables
 load_dotenv()
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 if not OPENAI_API_KEY:
     print("Error: OPENAI_API_KEY not found in .env file.")
     sys.exit(1)
-client = OpenAI(api_key=OPENAI_API_KEY)
-
-# German to English keyword mappings for document type detection
-KEYWORD_MAPPINGS = {
-    "rechnung": "invoice", "bestellung": "order", "gesamtsumme": "total",
-    "nettowert": "net_total", "bruttopreis": "gross_total", "lieferadresse": "delivery_address",
-    "kundennummer": "customer_number", "bestellnummer": "order_number", "belegdatum": "issue_date",
-    "liefertermin": "delivery_date", "artikel-nr": "article_code", "menge": "quantity",
-    "preis": "price", "einheit": "unit", "firma": "company", "ansprechpartner": "contact_person",
-    "email": "email", "straße": "street", "plz": "postal_code", "ort": "city"
-}
-
-# Define Invoice and Order Formats
-INVOICE_FORMAT = {
-    "logic": "Automate invoice processing. Output prices with exactly two decimal places.",
-    "output": {
-        "total_gross": "<float>",
-        "total_net": "<float>",
-        "business_name": "<string>",
-        "items": [
-            {
-                "name": "<string>",
-                "price": "<float>"
-            }
-        ]
-    }
-}
-
-ORDER_FORMAT = {
-    "logic": "Automate order requests. Output dates in DD.MM.YYYY format.",
-    "output": {
-        "buyer": {
-            "buyer_company_name": "<string>",
-            "buyer_person_name": "<string>",
-            "buyer_email_address": "<string>"
-        },
-        "order": {
-            "order_number": "<string>",
-            "order_date": "<string>",
-            "delivery": {
-                "delivery_address_street": "<string>",
-                "delivery_address_city": "<string>",
-                "delivery_address_postal_code": "<string>"
-            }
-        },
-        "product": [
-            {
-                "product_position": "<integer>",
-                "product_article_code": "<string>",
-                "product_quantity": "<integer>"
-            }
-        ]
-    }
-}
+# Retries and rate limiting are handled by the shared scheduler
+client = OpenAI(api_key=OPENAI_API_KEY, max_retries=0)
 
 # Meta-Prompt (used directly as the prompt for gpt-4o)
 META_PROMPT = """
@@ -105,24 +61,28 @@ IMPORTANT:
 Your output should be the fully constructed extraction prompt as a single, cohesive text block, ready to be used by another AI model for PDF data extraction. Do not include additional commentary or explanations beyond the prompt itself unless explicitly requested.
 """
 
-def detect_document_type(raw_json):
-    """Detect if the document is an Invoice or Order based on JSON content."""
-    raw_text = json.dumps(raw_json).lower()
+# Keyword-based detection
+INVOICE_KEYWORDS = ["rechnung", "gesamtsumme", "nettowert", "bruttopreis"]
+ORDER_KEYWORDS = ["bestellung", "bestellnummer", "lieferadresse", "artikel-nr"]
+CLASSIFIER = DocumentClassifier(KEYWORD_MAPPINGS, INVOICE_KEYWORDS, ORDER_KEYWORDS)
 
-    # Keyword-based detection
-    invoice_keywords = ["rechnung", "gesamtsumme", "nettowert", "bruttopreis"]
-    order_keywords = ["bestellung", "bestellnummer", "lieferadresse", "artikel-nr"]
+def classify_document(raw_json, early_stop=True, with_matches=False):
+    """Classify a document; returns doc_type, confidence, scores (and keyword matches)."""
+    return CLASSIFIER.classify(raw_json, early_stop=early_stop, with_matches=with_matches)
 
-    invoice_count = sum(1 for keyword in invoice_keywords if keyword in raw_text)
-    order_count = sum(1 for keyword in order_keywords if keyword in raw_text)
+def detect_document_type(raw_json):
+    """Detect if the document is an Invoice or Order based on JSON content."""
+    return classify_document(raw_json)["doc_type"]
 
-    return "Invoice" if invoice_count >= order_count else "Order"
+# Generation parameters; part of the registry fingerprint
+PROMPT_MODEL = "gpt-4o"
+PROMPT_TEMPERATURE = 0.3
+PROMPT_MAX_TOKENS = 1200
+PROMPT_SYSTEM_MESSAGE = "You are a prompt engineering expert. Follow the provided meta-prompt to generate a specialized extraction prompt."
+PROMPT_REGISTRY_PATH = os.getenv("PROMPT_REGISTRY_PATH", os.path.join("generated_prompts", "prompt_registry.json"))
 
-def generate_prompt(raw_json):
-    """Generate a specialized prompt using OpenAI's gpt-4o model."""
-    # Detect document type
-    doc_type = detect_document_type(raw_json)
-    
+def build_prompt_request(doc_type):
+    """Return the chat messages that generate the extraction prompt for ``doc_type``."""
     # Select format based on document type
     doc_format = INVOICE_FORMAT if doc_type == "Invoice" else ORDER_FORMAT
     doc_type_name = "Invoice Document" if doc_type == "Invoice" else "Order Document"
@@ -135,61 +95,155 @@ def generate_prompt(raw_json):
         f"- LOGIC_INSTRUCTIONS: {doc_format['logic']}\n"
         f"- JSON_STRUCTURE: {json.dumps(doc_format['output'], ensure_ascii=False, indent=2)}"
     )
+    return [
+        {"role": "system", "content": PROMPT_SYSTEM_MESSAGE},
+        {"role": "user", "content": user_message}
+    ]
+
+def prompt_fingerprint(doc_type):
+    """
+    Fingerprint of everything a generated prompt depends on.
+
+    The user message embeds META_PROMPT and the doc type's schema, so any
+    change to a schema, the meta-prompt or the generation settings yields a
+    new fingerprint and therefore a fresh prompt.
+    """
+    request = {
+        "doc_type": doc_type,
+        "messages": build_prompt_request(doc_type),
+        "model": PROMPT_MODEL,
+        "temperature": PROMPT_TEMPERATURE,
+        "max_tokens": PROMPT_MAX_TOKENS,
+    }
+    canonical = json.dumps(request, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+class PromptRegistry:
+    """
+    Generated prompts stored on disk by :func:`prompt_fingerprint`.
+
+    Concurrent callers asking for the same fingerprint share one generation:
+    the first generates, the rest wait for it and reuse the result.
+    """
 
-    # Call OpenAI API to generate the specialized prompt
+    def __init__(self, path=PROMPT_REGISTRY_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        self.entries = {}
+        if os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    self.entries = json.load(f)
+            except (OSError, json.JSONDecodeError) as e:
+                print(f"Ignoring unreadable prompt registry {path}: {e}")
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.entries, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def get_or_generate(self, doc_type):
+        """Return the prompt for ``doc_type``, generating it only if its fingerprint is new."""
+        fingerprint = prompt_fingerprint(doc_type)
+        with self._lock:
+            key_lock = self._key_locks.setdefault(fingerprint, threading.Lock())
+        with key_lock:
+            entry = self.entries.get(fingerprint)
+            if entry is not None:
+                return entry["prompt"]
+            response = default_scheduler().chat(
+                client,
+                model=PROMPT_MODEL,
+                messages=build_prompt_request(doc_type),
+                temperature=PROMPT_TEMPERATURE,
+                max_tokens=PROMPT_MAX_TOKENS
+            )
+            generated_prompt = response.choices[0].message.content.strip()
+            with self._lock:
+                self.entries[fingerprint] = {"doc_type": doc_type, "model": PROMPT_MODEL,
+                                             "prompt": generated_prompt}
+                self._save()
+            return generated_prompt
+
+_registry = None
+_registry_lock = threading.Lock()
+
+def get_registry():
+    # generate_prompts calls this from its worker threads; one registry per process
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = PromptRegistry()
+    return _registry
+
+def generate_prompt(raw_json):
+    """Generate a specialized prompt using OpenAI's gpt-4o model."""
+    # Detect document type
+    doc_type = detect_document_type(raw_json)
+
+    # Reuse the registry's prompt unless the schema or meta-prompt changed
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {"role": "system", "content": "You are a prompt engineering expert. Follow the provided meta-prompt to generate a specialized extraction prompt."},
-                {"role": "user", "content": user_message}
-            ],
-            temperature=0.3,
-            max_tokens=1200
-        )
-        generated_prompt = response.choices[0].message.content.strip()
-        return generated_prompt, doc_type
+        return get_registry().get_or_generate(doc_type), doc_type
     except Exception as e:
         return f"Error generating prompt: {str(e)}", doc_type
 
+def generate_prompts(raw_jsons, workers=4):
+    """
+    Generate prompts for many documents at once, in input order.
+
+    Each distinct document type is generated at most once; the other
+    documents of that type reuse it.
+    """
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(generate_prompt, raw_jsons))
+
 def main():
     """Main function to run the prompt generator."""
-    # Specify the input JSON file path
-    input_file = "json_output/Order_rec1nJMeDOHhOSMey.json"
+    # Specify the input JSON file path(s); several files share one generation per doc type
+    input_files = sys.argv[1:] or ["json_output/Order_rec1nJMeDOHhOSMey.json"]
 
-    if not os.path.exists(input_file):
-        print(f"Error: File '{input_file}' does not exist.")
-        sys.exit(1)
+    for input_file in input_files:
+        if not os.path.exists(input_file):
+            print(f"Error: File '{input_file}' does not exist.")
+            sys.exit(1)
 
     try:
-        # Read and parse JSON file
-        with open(input_file, 'r', encoding='utf-8') as f:
-            raw_json = json.load(f)
-        
-        print(f"Processing file: {input_file}")
+        # Read and parse JSON files
+        raw_jsons = []
+        for input_file in input_files:
+            with open(input_file, 'r', encoding='utf-8') as f:
+                raw_jsons.append(json.load(f))
+            print(f"Processing file: {input_file}")
 
-        # Generate prompt
+        # Generate prompts
         print("Generating prompt...")
-        generated_prompt, doc_type = generate_prompt(raw_json)
+        saved = set()
+        for generated_prompt, doc_type in generate_prompts(raw_jsons):
+            if "Error" in generated_prompt:
+                print(generated_prompt)
+                sys.exit(1)
+            if doc_type in saved:
+                continue
+            saved.add(doc_type)
 
-        if "Error" in generated_prompt:
+            # Display results
+            print(f"\nDetected Document Type: {doc_type}")
+            print("\nGenerated Prompt:")
+            print("-" * 50)
             print(generated_prompt)
-            sys.exit(1)
+            print("-" * 50)
 
-        # Display results
-        print(f"\nDetected Document Type: {doc_type}")
-        print("\nGenerated Prompt:")
-        print("-" * 50)
-        print(generated_prompt)
-        print("-" * 50)
-
-        # Save the generated prompt to a file
-        output_dir = "generated_prompts"
-        os.makedirs(output_dir, exist_ok=True)
-        prompt_filename = os.path.join(output_dir, f"{doc_type.lower()}_prompt.txt")
-        with open(prompt_filename, 'w', encoding='utf-8') as f:
-            f.write(generated_prompt)
-        print(f"\nPrompt saved to: {prompt_filename}")
+            # Save the generated prompt to a file
+            output_dir = "generated_prompts"
+            os.makedirs(output_dir, exist_ok=True)
+            prompt_filename = os.path.join(output_dir, f"{doc_type.lower()}_prompt.txt")
+            with open(prompt_filename, 'w', encoding='utf-8') as f:
+                f.write(generated_prompt)
+            print(f"\nPrompt saved to: {prompt_filename}")
 
     except json.JSONDecodeError:
         print("Error: Invalid JSON file. Please provide a valid JSON file.")
@@ -200,4 +254,3 @@ def main():
 
 if __name__ == "__main__":
     main()
-
@@ -0,0 +1,57 @@
+"""
+Extraction schemas and label vocabulary, kept free of side effects so the
+output scripts can import them without prompt.py's OpenAI client setup.
+"""
+
+# German to English keyword mappings for document type detection
+KEYWORD_MAPPINGS = {
+    "rechnung": "invoice", "bestellung": "order", "gesamtsumme": "total",
+    "nettowert": "net_total", "bruttopreis": "gross_total", "lieferadresse": "delivery_address",
+    "kundennummer": "customer_number", "bestellnummer": "order_number", "belegdatum": "issue_date",
+    "liefertermin": "delivery_date", "artikel-nr": "article_code", "menge": "quantity",
+    "preis": "price", "einheit": "unit", "firma": "company", "ansprechpartner": "contact_person",
+    "email": "email", "straße": "street", "plz": "postal_code", "ort": "city"
+}
+
+# Define Invoice and Order Formats
+INVOICE_FORMAT = {
+    "logic": "Automate invoice processing. Output prices with exactly two decimal places.",
+    "output": {
+        "total_gross": "<float>",
+        "total_net": "<float>",
+        "business_name": "<string>",
+        "items": [
+            {
+                "name": "<string>",
+                "price": "<float>"
+            }
+        ]
+    }
+}
+
+ORDER_FORMAT = {
+    "logic": "Automate order requests. Output dates in DD.MM.YYYY format.",
+    "output": {
+        "buyer": {
+            "buyer_company_name": "<string>",
+            "buyer_person_name": "<string>",
+            "buyer_email_address": "<string>"
+        },
+        "order": {
+            "order_number": "<string>",
+            "order_date": "<string>",
+            "delivery": {
+                "delivery_address_street": "<string>",
+                "delivery_address_city": "<string>",
+                "delivery_address_postal_code": "<string>"
+            }
+        },
+        "product": [
+            {
+                "product_position": "<integer>",
+                "product_article_code": "<string>",
+                "product_quantity": "<integer>"
+            }
+        ]
+    }
+}
@@ -0,0 +1,28 @@
+import importlib
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+for stage_dir in ("", "airtable_attachments", "pdf_json", "output", "benchmarks"):
+    sys.path.insert(0, str(ROOT / stage_dir))
+
+
+@pytest.fixture(scope="session")
+def output1(tmp_path_factory):
+    """output1 imported against a throwaway BEAM_BASE_DIR, with no caches and no real API key."""
+    base = tmp_path_factory.mktemp("beam")
+    (base / "airtable_attachments" / "attachments").mkdir(parents=True)
+    (base / "generated_prompts").mkdir()
+    for name in ("invoice_prompt.txt", "order_prompt.txt"):
+        (base / "generated_prompts" / name).write_text("Extract the document as JSON.", encoding="utf-8")
+    os.environ.update({
+        "BEAM_BASE_DIR": str(base),
+        "OPENAI_API_KEY": os.environ.get("OPENAI_API_KEY", "test-key"),
+        "PDF_CACHE_DISABLE": "1",
+        "LLM_CACHE_DISABLE": "1",
+        "TEMPLATE_INDEX": str(base / "templates" / "template_index.json"),
+    })
+    return importlib.import_module("output1")
@@ -3,6 +3,9 @@ import os
 from pathlib import Path
 import uuid
 
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+
 # Configuration
 EXTRACTED_JSON = "final.json"
 AIRTABLE_JSON = "input.json"
@@ -25,33 +28,83 @@ def compare_values(val1, val2):
         return abs(val1 - val2) <= FLOAT_TOLERANCE
     return val1 == val2
 
+def _value_key(value):
+    # 1, 1.0 and True hash alike but compare_values treats them differently
+    return (type(value), value)
+
+def _match_matrix(values1, values2):
+    """compare_values for every pair, evaluated once per distinct pair of values."""
+    uniq1, idx1 = {}, []
+    for value in values1:
+        idx1.append(uniq1.setdefault(_value_key(value), len(uniq1)))
+    uniq2, idx2 = {}, []
+    for value in values2:
+        idx2.append(uniq2.setdefault(_value_key(value), len(uniq2)))
+    table = np.array([[compare_values(v1, v2) for (_, v2) in uniq2] for (_, v1) in uniq1], dtype=bool)
+    return table[np.ix_(idx1, idx2)]
+
+def _is_flat(items):
+    return all(isinstance(item, dict) and
+               not any(isinstance(v, (dict, list)) for v in item.values()) for item in items)
+
+def _score_matrix(arr1, arr2):
+    """
+    compare_objects score for every (arr1[i], arr2[j]) pair.
+
+    Arrays of scalars or of flat dicts are scored column by column with NumPy;
+    anything nested falls back to calling compare_objects per pair.
+    """
+    n, m = len(arr1), len(arr2)
+    if not any(isinstance(x, (dict, list)) for x in arr1 + arr2):
+        return _match_matrix(arr1, arr2).astype(float)
+    if not (_is_flat(arr1) and _is_flat(arr2)):
+        return np.array([[compare_objects(a, b)[0] for b in arr2] for a in arr1], dtype=float)
+
+    keys = list(dict.fromkeys(k for item in arr1 + arr2 for k in item))
+    matches = np.zeros((n, m))
+    common = np.zeros((n, m))
+    for key in keys:
+        present1 = np.array([key in item for item in arr1])
+        present2 = np.array([key in item for item in arr2])
+        both = np.outer(present1, present2)
+        common += both
+        if both.any():
+            equal = _match_matrix([item.get(key) for item in arr1], [item.get(key) for item in arr2])
+            matches += both & equal
+    total = np.array([len(item) for item in arr2], dtype=float)[None, :]
+    extra = np.array([len(item) for item in arr1], dtype=float)[:, None] - common
+    with np.errstate(divide="ignore", invalid="ignore"):
+        scores = np.where(total > 0, matches / total, 0.0)
+    return scores * (1 - EXTRA_PENALTY * extra)
+
 def compare_arrays(arr1, arr2):
-    """Compare arrays by matching most similar elements."""
+    """
+    Compare arrays by optimally pairing their elements.
+
+    The pairwise score matrix is built once and solved as an assignment
+    problem (Hungarian algorithm), so the result does not depend on item
+    order. The average pair score is scaled by the length ratio of the two
+    arrays. A side that is not an array (one item returned as an object)
+    scores 0.
+    """
+    if not isinstance(arr1, list) or not isinstance(arr2, list):
+        return 0.0, [{"mismatch": f"Expected arrays: {type(arr1).__name__} vs {type(arr2).__name__}"}]
     if not arr1 and not arr2:
         return 1.0, []
     if not arr1 or not arr2:
         return 0.0, [{"mismatch": f"Array length: {len(arr1)} vs {len(arr2)}"}]
 
+    scores = _score_matrix(arr1, arr2)
+    rows, cols = linear_sum_assignment(scores, maximize=True)
+
     mismatches = []
-    scores = []
-    arr1, arr2 = arr1.copy(), arr2.copy()
-
-    for item1 in arr1:
-        best_score, best_mismatch = 0, []
-        best_match = None
-        for item2 in arr2:
-            score, item_mismatches = compare_objects(item1, item2)
-            if score > best_score:
-                best_score, best_mismatch = score, item_mismatches
-                best_match = item2
-        if best_match is not None:
-            scores.append(best_score)
-            if best_score < 1:
-                mismatches.append({"item": item1, "mismatches": best_mismatch})
-            arr2.remove(best_match)
+    for i, j in zip(rows, cols):
+        if scores[i, j] < 1:
+            _, item_mismatches = compare_objects(arr1[i], arr2[j])
+            mismatches.append({"item": arr1[i], "mismatches": item_mismatches})
 
     len_penalty = min(len(arr1), len(arr2)) / max(len(arr1), len(arr2))
-    avg_score = sum(scores) / len(scores) if scores else 0
+    avg_score = float(scores[rows, cols].mean()) if len(rows) else 0
     final_score = avg_score * len_penalty
     if len(arr1) != len(arr2):
         mismatches.append({"mismatch": f"Array length: {len(arr1)} vs {len(arr2)}"})
@@ -1,12 +1,26 @@
+import json
+import logging
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
 from openai import OpenAI  # New import for v1.0.0+
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from common.llm_scheduler import LLMScheduler, default_scheduler
+
 class InvoiceProcessor:
-    def __init__(self, api_key: str, output_dir: str = "processed_results"):
+    def __init__(self, api_key: str, output_dir: str = "processed_results",
+                 scheduler: Optional[LLMScheduler] = None):
         """Initialize the invoice processor with API key and output directory"""
         self.api_key = api_key
         self.output_dir = output_dir
         os.makedirs(self.output_dir, exist_ok=True)
-        self.client = OpenAI(api_key=self.api_key)  # New client initialization
+        # Rate limiting and API retries go through the shared scheduler
+        self.client = OpenAI(api_key=self.api_key, max_retries=0)  # New client initialization
+        self.scheduler = scheduler or default_scheduler()
 
     def extract_invoice_data(self, text: str, max_retries: int = 3) -> Optional[Dict]:
         """Use GPT-4 to extract structured invoice data with new API syntax"""
@@ -41,7 +55,8 @@ class InvoiceProcessor:
         
         for attempt in range(max_retries):
             try:
-                response = self.client.chat.completions.create(  # New API syntax
+                response = self.scheduler.chat(  # New API syntax
+                    self.client,
                     model="gpt-4",
                     messages=[
                         {"role": "system", "content": "You are an expert at extracting structured data from invoices. Follow all instructions precisely."},
@@ -70,10 +85,10 @@ class InvoiceProcessor:
                 
             except json.JSONDecodeError as e:
                 logging.warning(f"Failed to parse JSON (attempt {attempt + 1}): {str(e)}")
-                time.sleep(2)
+                time.sleep(self.scheduler.backoff(attempt))
             except Exception as e:
                 logging.error(f"Error processing invoice (attempt {attempt + 1}): {str(e)}")
-                time.sleep(5)
+                time.sleep(self.scheduler.backoff(attempt))
         
         logging.error(f"Failed to process invoice after {max_retries} attempts")
         return None
\ No newline at end of file
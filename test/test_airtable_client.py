@@ -0,0 +1,111 @@
+import pytest
+import requests
+
+import airtable_client
+from airtable_client import AirtableClient, TokenBucket
+
+
+class FakeClock:
+    """Stands in for the time module: sleep() advances monotonic() instead of blocking."""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class Response:
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class StubSession:
+    """Answers requests with the queued responses (or raises queued exceptions), recording send times."""
+
+    def __init__(self, clock, responses):
+        self.clock = clock
+        self.responses = list(responses)
+        self.sent = []
+
+    def request(self, method, url, **kwargs):
+        self.sent.append(self.clock.now)
+        response = self.responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(airtable_client, "time", clock)
+    return clock
+
+
+def test_bucket_holds_to_the_configured_rate(clock):
+    bucket = TokenBucket(rate=5.0)
+    start = clock.now
+    granted = []
+    for _ in range(25):
+        bucket.acquire()
+        granted.append(clock.now - start)
+    # The initial burst of 5, then one token every 0.2 s
+    assert granted[:5] == [0.0] * 5
+    assert granted[-1] == pytest.approx(4.0)
+    assert all(b - a == pytest.approx(0.2) for a, b in zip(granted[4:], granted[5:]))
+
+
+def test_pause_holds_back_every_caller(clock):
+    bucket = TokenBucket(rate=None)
+    bucket.pause(3.0)
+    assert bucket.acquire() == pytest.approx(3.0)
+    assert bucket.acquire() == 0.0
+
+
+def test_retry_after_is_honoured(clock):
+    session = StubSession(clock, [Response(429, {"Retry-After": "7"}), Response(200)])
+    client = AirtableClient(session=session, rate=None)
+    response = client.get("https://api.airtable.com/v0/base/table")
+    assert response.status_code == 200
+    assert session.sent[1] - session.sent[0] == pytest.approx(7.0)
+    assert client.stats()["throttled"] == 1 and client.stats()["retries"] == 1
+
+
+def test_429_without_retry_after_waits_the_airtable_penalty(clock):
+    session = StubSession(clock, [Response(429), Response(200)])
+    client = AirtableClient(session=session, rate=None)
+    assert client.get("https://api.airtable.com/v0/base/table").status_code == 200
+    assert session.sent[1] - session.sent[0] == pytest.approx(airtable_client.AIRTABLE_THROTTLE_PENALTY)
+
+
+def test_retries_stop_after_the_limit(clock):
+    responses = [Response(503) for _ in range(4)]
+    session = StubSession(clock, responses)
+    client = AirtableClient(session=session, rate=None, max_retries=3)
+    response = client.get("https://api.airtable.com/v0/base/table")
+    assert response is responses[-1] and response.status_code == 503
+    assert len(session.sent) == 4
+    assert all(r.closed for r in responses[:-1])
+    assert client.stats()["retries"] == 3
+
+
+def test_connection_errors_are_raised_after_the_limit(clock):
+    session = StubSession(clock, [requests.ConnectionError("reset")] * 3)
+    client = AirtableClient(session=session, rate=None, max_retries=2)
+    with pytest.raises(requests.ConnectionError):
+        client.get("https://api.airtable.com/v0/base/table")
+    assert len(session.sent) == 3
@@ -0,0 +1,47 @@
+import asyncio
+import json
+import re
+
+ROW = re.compile(r"^(\d+) \| (\S+) \| (\d+)$")
+
+
+def _order_text(rows):
+    header = ["Bestellung 4711", "Firma: Nordwerk AG", "Ansprechpartner: Anna Schmidt", "Pos | Artikel-Nr | Menge"]
+    lines = [f"{n} | A-{n:05d} | {n % 7 + 1}" for n in range(1, rows + 1)]
+    return "\n".join(header + lines + ["Vielen Dank für Ihre Bestellung."])
+
+
+def test_long_order_is_chunked_before_compaction(output1, monkeypatch):
+    calls = []
+
+    async def fake_call(prompt, text, timeout=None):
+        calls.append((prompt, text))
+        if prompt == output1.CHUNK_ITEMS_PROMPT:
+            products = [{"product_position": int(m[1]), "product_article_code": m[2], "product_quantity": int(m[3])}
+                        for m in map(ROW.match, text.splitlines()) if m]
+            return {"product": products}
+        return {"buyer": {"buyer_company_name": "Nordwerk AG"}, "order": {"order_number": "4711"}}
+
+    monkeypatch.setattr(output1, "call_gpt4o_async", fake_call)
+    monkeypatch.setattr(output1, "RULES_DISABLE", True)
+    monkeypatch.setattr(output1, "TEMPLATES_DISABLE", True)
+    outcome = asyncio.run(output1.extract_document_async("PROMPT", _order_text(800), "Order", "order.pdf"))
+
+    products = outcome["extracted"]["product"]
+    assert [p["product_position"] for p in products] == list(range(1, 801))
+    assert len(calls) == 1 + -(-800 // output1.CHUNK_ROWS)
+    header_text = calls[0][1]
+    assert "Nordwerk AG" in header_text and "A-00001" not in header_text
+
+
+def test_merge_keeps_repeated_rows_and_drops_boundary_echo(output1):
+    row = {"product_article_code": "A-1", "product_quantity": 2}
+    merged = output1.merge_chunks({"order": {}}, [{"product": [dict(row), dict(row)]}, {"product": [dict(row)]}])
+    assert len(merged["product"]) == 3
+    assert [p["product_position"] for p in merged["product"]] == [1, 2, 3]
+
+    last = {"product_position": 25, "product_article_code": "A-25", "product_quantity": 1}
+    nxt = {"product_position": 26, "product_article_code": "A-26", "product_quantity": 1}
+    merged = output1.merge_chunks({}, [{"product": [last]}, {"product": [dict(last), nxt]}])
+    assert [p["product_position"] for p in merged["product"]] == [25, 26]
+    assert json.dumps(merged["product"][0]) == json.dumps(last)
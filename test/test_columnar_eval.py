@@ -0,0 +1,28 @@
+import json
+
+from columnar_eval import NUMERIC_KEYS, ColumnarEvaluator
+
+
+def _record(file_id, output, dataset="Order"):
+    return {"File ID": file_id, "Dataset": dataset, "Expected Output": json.dumps(output)}
+
+
+def test_numeric_keys_come_from_the_schemas():
+    assert {"total_gross", "total_net", "price", "product_position", "product_quantity"} == set(NUMERIC_KEYS)
+
+
+def test_codes_are_compared_as_strings():
+    truth = _record("f1", {"product": [{"product_article_code": "01067", "product_quantity": 5}]})
+    pred = _record("f1", {"product": [{"product_article_code": "1067", "product_quantity": "5.0"}]})
+    merged, _ = ColumnarEvaluator([truth]).compare([pred])
+    matches = dict(zip(merged["field"], merged["match"]))
+    assert matches == {"product_*_product_article_code": False, "product_*_product_quantity": True}
+
+
+def test_numeric_fields_allow_the_tolerance():
+    truth = _record("f1", {"total_net": "54.75", "business_name": "Nordwerk AG"}, "Invoice")
+    close = _record("f1", {"total_net": 54.749, "business_name": "Nordwerk AG"}, "Invoice")
+    far = _record("f1", {"total_net": 54.70, "business_name": "Nordwerk"}, "Invoice")
+    evaluator = ColumnarEvaluator([truth])
+    assert evaluator.evaluate([close])["accuracy"] == 1.0
+    assert evaluator.evaluate([far])["accuracy"] == 0.0
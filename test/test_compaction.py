@@ -0,0 +1,55 @@
+from common.compaction import PAGE_BREAK, compact_text
+from common.llm_scheduler import count_tokens
+
+KEYWORDS = {"nettowert": "net_total", "ort": "city", "plz": "postal_code"}
+
+
+def test_boilerplate_and_repeated_headers_are_dropped():
+    text = "\n".join([
+        "Hansa Bürobedarf GmbH", "Seite 1 von 2", "Nettowert: 51,20 EUR", PAGE_BREAK,
+        "Hansa Bürobedarf GmbH", "Seite 2 von 2", "IBAN DE12 3456 7890 1234 5678 90",
+    ])
+    result = compact_text(text, KEYWORDS, max_tokens=0)
+    assert result["text"].splitlines() == ["Hansa Bürobedarf GmbH", "Nettowert: 51,20 EUR"]
+    assert result["dropped_lines"] == 4
+
+
+def test_repeated_lines_on_one_page_are_kept():
+    # Two identical plain order lines are two items, not a page header
+    text = "\n".join(["Bestellung 4711", "Pos Artikel Menge", "1 A-00001 3", "2 A-00002 1", "3 A-00002 1",
+                      "Versand per Spedition", "Versand per Spedition"])
+    lines = compact_text(text, KEYWORDS, max_tokens=0)["text"].splitlines()
+    assert lines == text.splitlines()
+
+
+def test_item_rows_survive_across_pages():
+    page = ["Hansa Bürobedarf GmbH", "Pos Artikel Menge", "1 A-00001 3"]
+    text = "\n".join(page + [PAGE_BREAK] + page)
+    lines = compact_text(text, KEYWORDS, max_tokens=0)["text"].splitlines()
+    # The repeated column heading is a page header; the repeated row is an item
+    assert lines == page + ["1 A-00001 3"]
+
+
+def test_keywords_match_whole_words_only():
+    # "ort" inside "Sortiment" must not rescue a boilerplate line
+    text = "Es gelten unsere AGB für das gesamte Sortiment\nOrt: Berlin"
+    assert compact_text(text, KEYWORDS, max_tokens=0)["text"] == "Ort: Berlin"
+    kept = compact_text("Es gelten unsere AGB, Ort: Berlin", KEYWORDS, max_tokens=0)["text"]
+    assert kept == "Es gelten unsere AGB, Ort: Berlin"
+
+
+def test_budget_drops_prose_before_table_rows_before_keyword_lines():
+    header = [f"Briefkopf Zeile {i}" for i in range(5)]
+    prose = [f"Wir danken für Ihren Auftrag und freuen uns auf die weitere Zusammenarbeit {i}"
+             for i in range(20)]
+    rows = [f"{i} | Artikel {i} | {i},00" for i in range(1, 11)]
+    text = "\n".join(header + prose + rows + ["Nettowert: 55,00 EUR"])
+    budget = count_tokens("\n".join(header + rows + ["Nettowert: 55,00 EUR"])) + 20
+    result = compact_text(text, KEYWORDS, max_tokens=budget)
+    lines = result["text"].splitlines()
+    assert not result["over_budget"]
+    assert result["tokens_after"] <= budget < result["tokens_before"]
+    assert lines[:5] == header
+    assert set(rows) <= set(lines)
+    assert lines[-1] == "Nettowert: 55,00 EUR"
+    assert sum(line in prose for line in lines) < len(prose)
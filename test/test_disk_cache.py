@@ -0,0 +1,20 @@
+from common.disk_cache import DiskCache
+
+
+def test_overwriting_a_key_does_not_grow_the_tracked_size(tmp_path):
+    cache = DiskCache(tmp_path, max_bytes=10_000)
+    cache.store("a/1.json", {"value": "x" * 100})
+    for _ in range(50):
+        cache.store("a/1.json", {"value": "x" * 100})
+    cache.store("a/2.json", {"value": "y"})
+    assert cache._size == cache.size()
+    assert cache.load("a/1.json")["value"] == "x" * 100
+
+
+def test_least_recently_used_entries_are_evicted_over_the_limit(tmp_path):
+    cache = DiskCache(tmp_path, max_bytes=500)
+    for i in range(10):
+        cache.store(f"{i}.json", {"value": "x" * 80})
+    assert cache.size() <= 500
+    assert cache.load("9.json") is not None
+    assert cache.load("0.json") is None
@@ -0,0 +1,99 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from downloader import AttachmentDownloader
+
+FILES = {f"/doc{i}.pdf": f"%PDF-1.4 document {i}\n".encode() * 1000 for i in range(4)}
+LATENCY = 0.2
+
+
+@pytest.fixture
+def server():
+    """Local stand-in for the attachment host: serves FILES after LATENCY, 404 otherwise."""
+    state = {"active": 0, "peak": 0}
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = FILES.get(self.path)
+            if body is None:
+                self.send_error(404)
+                return
+            with lock:
+                state["active"] += 1
+                state["peak"] = max(state["peak"], state["active"])
+            time.sleep(LATENCY)
+            with lock:
+                state["active"] -= 1
+            etag = f'"{len(body)}-{self.path.strip("/")}"'
+            if self.headers.get("If-None-Match") == etag:
+                self.send_response(304)
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("ETag", etag)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    httpd.daemon_threads = True
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    host, port = httpd.server_address[:2]
+    yield f"http://{host}:{port}", state
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_downloads_run_concurrently(server, tmp_path):
+    url, state = server
+    start = time.perf_counter()
+    with AttachmentDownloader(str(tmp_path), max_workers=4) as downloader:
+        names = downloader.download_all([(url + path, path.lstrip("/")) for path in FILES])
+    elapsed = time.perf_counter() - start
+    assert names == [path.lstrip("/") for path in FILES]
+    for path, body in FILES.items():
+        assert (tmp_path / path.lstrip("/")).read_bytes() == body
+    assert state["peak"] > 1
+    assert elapsed < LATENCY * len(FILES)
+    assert downloader.bytes_downloaded == sum(len(body) for body in FILES.values())
+
+
+def test_colliding_names_do_not_overwrite_each_other(server, tmp_path):
+    url, _ = server
+    with AttachmentDownloader(str(tmp_path), max_workers=2) as downloader:
+        first, second = downloader.download_all([(url + "/doc0.pdf", "Rechnung 1.pdf"),
+                                                 (url + "/doc1.pdf", "Rechnung#1.pdf")])
+        again = downloader.download(url + "/doc0.pdf", "Rechnung 1.pdf")
+    assert {first, second} == {"Rechnung1.pdf", "Rechnung1_2.pdf"}
+    assert again == first
+    assert (tmp_path / first).read_bytes() == FILES["/doc0.pdf"]
+    assert (tmp_path / second).read_bytes() == FILES["/doc1.pdf"]
+
+
+def test_failed_download_returns_none(server, tmp_path):
+    url, _ = server
+    with AttachmentDownloader(str(tmp_path), max_workers=2) as downloader:
+        assert downloader.download(url + "/missing.pdf", "missing.pdf") is None
+        fetched = downloader.fetch(url + "/doc2.pdf", "doc2.pdf")
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["doc2.pdf"]
+    assert fetched["size"] == len(FILES["/doc2.pdf"]) and fetched["etag"]
+
+
+def test_matching_etag_is_not_downloaded_again(server, tmp_path):
+    url, _ = server
+    with AttachmentDownloader(str(tmp_path), max_workers=1) as downloader:
+        first = downloader.fetch(url + "/doc3.pdf", "doc3.pdf")
+        again = downloader.fetch(url + "/doc3.pdf", "doc3.pdf", etag=first["etag"])
+        stale = downloader.fetch(url + "/doc3.pdf", "doc3.pdf", etag='"old"')
+    assert again == {"not_modified": True, "etag": first["etag"]}
+    assert stale["sha256"] == first["sha256"]
+    assert downloader.bytes_downloaded == 2 * len(FILES["/doc3.pdf"])
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["doc3.pdf"]
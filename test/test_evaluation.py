@@ -0,0 +1,42 @@
+import pytest
+
+from evaluation import compare_arrays, compare_objects
+
+ITEMS = [{"name": "Toner", "price": 48.0}, {"name": "Papier", "price": 5.99}, {"name": "Kabel", "price": 12.5}]
+
+
+def test_reordered_items_match_fully():
+    score, mismatches = compare_arrays(list(reversed(ITEMS)), ITEMS)
+    assert score == pytest.approx(1.0)
+    assert mismatches == []
+
+
+def test_unequal_lengths_scale_by_the_length_ratio():
+    score, mismatches = compare_arrays(ITEMS[:2], ITEMS)
+    assert score == pytest.approx(2 / 3)
+    assert mismatches == [{"mismatch": "Array length: 2 vs 3"}]
+
+
+def test_each_truth_item_is_paired_once():
+    score, mismatches = compare_arrays([ITEMS[0], ITEMS[0]], ITEMS[:2])
+    assert score == pytest.approx(0.5)
+    assert [m["item"] for m in mismatches] == [ITEMS[0]]
+
+
+def test_object_instead_of_array_is_a_mismatch():
+    score, mismatches = compare_arrays({"name": "a", "price": 1.0}, [{"name": "a", "price": 1.0}])
+    assert score == 0.0
+    assert mismatches
+    score, _ = compare_objects({"items": {"name": "a", "price": 1.0}}, {"items": [{"name": "a", "price": 1.0}]})
+    assert score == 0.0
+
+
+def test_empty_arrays():
+    assert compare_arrays([], []) == (1.0, [])
+    assert compare_arrays([], ITEMS)[0] == 0.0
+    assert compare_arrays(ITEMS, [])[0] == 0.0
+
+
+def test_scalar_arrays_compare_numbers_with_tolerance():
+    score, _ = compare_arrays(["54.75", 3], [54.749, 3])
+    assert score == pytest.approx(1.0)
@@ -0,0 +1,51 @@
+import asyncio
+import json
+
+from synthetic_pdfs import write_pdf
+
+
+def test_malformed_reply_fails_only_its_document(output1, tmp_path, monkeypatch):
+    jobs = []
+    for name in ("good", "bad"):
+        path = tmp_path / f"Order_{name}.pdf"
+        write_pdf(path, [{"lines": [f"Bestellung {name}", "Firma: Nordwerk AG"]}])
+        jobs.append((path, "Order", "PROMPT"))
+
+    async def fake_call(prompt, text, timeout=None):
+        quantity = "2 pcs" if "bad" in text else 2
+        return {"product": [{"product_position": 1, "product_article_code": "A-1", "product_quantity": quantity}]}
+
+    monkeypatch.setattr(output1, "call_gpt4o_async", fake_call)
+    monkeypatch.setattr(output1, "RULES_DISABLE", True)
+    monkeypatch.setattr(output1, "TEMPLATES_DISABLE", True)
+    good, bad = asyncio.run(output1.extract_documents_async(jobs, max_in_flight=2, parse_workers=1))
+
+    assert good["error"] is None and good["record"]["File ID"] == "Order_good"
+    assert bad["record"] is None
+    assert bad["error"].startswith("Post-processing failed")
+
+
+def test_main_writes_the_journaled_records_on_resume(output1, tmp_path, monkeypatch):
+    pdf_dir, output_json = tmp_path / "attachments", tmp_path / "extracted_data.json"
+    pdf_dir.mkdir()
+    for name in ("Order_1", "Order_2"):
+        write_pdf(pdf_dir / f"{name}.pdf", [{"lines": [f"Bestellung {name}", "Firma: Nordwerk AG"]}])
+    calls = []
+
+    async def fake_call(prompt, text, timeout=None):
+        calls.append(text)
+        return {"buyer": {"buyer_company_name": "Nordwerk AG"}}
+
+    monkeypatch.setattr(output1, "call_gpt4o_async", fake_call)
+    monkeypatch.setattr(output1, "RULES_DISABLE", True)
+    monkeypatch.setattr(output1, "TEMPLATES_DISABLE", True)
+    monkeypatch.setattr(output1, "PDF_DIR", pdf_dir)
+    monkeypatch.setattr(output1, "OUTPUT_JSON", output_json)
+    monkeypatch.setattr(output1, "JOURNAL_PATH", tmp_path / "journal.jsonl")
+
+    output1.main()
+    first = output_json.read_text(encoding="utf-8")
+    output1.main()
+    assert len(calls) == 2
+    assert output_json.read_text(encoding="utf-8") == first
+    assert [r["File ID"] for r in json.loads(first)] == ["Order_1", "Order_2"]
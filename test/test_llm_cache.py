@@ -0,0 +1,64 @@
+from types import SimpleNamespace
+
+from openai.types.chat import ChatCompletion
+
+from common.llm_cache import LLMResponseCache, request_key
+from common.llm_scheduler import LLMScheduler
+
+
+def _completion(content, finish_reason="stop"):
+    return ChatCompletion.model_validate({
+        "id": "chatcmpl-1", "object": "chat.completion", "created": 0, "model": "gpt-4o",
+        "choices": [{"index": 0, "finish_reason": finish_reason,
+                     "message": {"role": "assistant", "content": content}}],
+        "usage": {"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15},
+    })
+
+
+class FakeClient:
+    """Just enough of OpenAI's client for LLMScheduler.chat."""
+
+    def __init__(self, *replies):
+        self.replies = list(replies)
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(
+            with_raw_response=SimpleNamespace(create=self._create)))
+
+    def _create(self, **kwargs):
+        self.calls += 1
+        response = self.replies.pop(0)
+        return SimpleNamespace(headers={}, parse=lambda: response)
+
+
+REQUEST = {"model": "gpt-4o", "temperature": 0,
+           "messages": [{"role": "user", "content": "Extract the invoice."}]}
+
+
+def test_request_key_ignores_transport_options_only():
+    assert request_key(REQUEST) == request_key(dict(REQUEST, timeout=30, extra_headers={"x": "1"}))
+    assert request_key(REQUEST) != request_key(dict(REQUEST, temperature=0.5))
+    changed = dict(REQUEST, messages=[{"role": "user", "content": "Extract the order."}])
+    assert request_key(REQUEST) != request_key(changed)
+
+
+def test_json_reply_is_cached_and_replayed(tmp_path):
+    cache = LLMResponseCache(root=tmp_path, enabled=True, bypass=False)
+    client = FakeClient(_completion('```json\n{"total_net": 10.0}\n```'))
+    scheduler = LLMScheduler(rpm=1000, tpm=1000000)
+    first = scheduler.chat(client, cache=cache, **REQUEST)
+    second = scheduler.chat(client, cache=cache, **REQUEST)
+    assert client.calls == 1
+    assert second.choices[0].message.content == first.choices[0].message.content
+
+
+def test_truncated_empty_and_malformed_replies_are_not_cached(tmp_path):
+    cache = LLMResponseCache(root=tmp_path, enabled=True, bypass=False)
+    scheduler = LLMScheduler(rpm=1000, tpm=1000000)
+    for bad in (_completion('{"total_net": 1', "length"), _completion(None, "content_filter"),
+                _completion(""), _completion("I cannot read this document.")):
+        client = FakeClient(bad, _completion('{"total_net": 10.0}'))
+        scheduler.chat(client, cache=cache, **REQUEST)
+        assert cache.lookup(REQUEST) is None
+        scheduler.chat(client, cache=cache, **REQUEST)
+        assert client.calls == 2
+        cache.clear()
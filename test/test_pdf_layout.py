@@ -0,0 +1,56 @@
+from types import SimpleNamespace
+
+import pdfplumber
+
+from common.pdf_layout import _TableGrid, blocks_to_text, extract_blocks, word_boxes
+from synthetic_pdfs import write_pdf
+
+ROWS = [["Pos", "Artikel", "Preis"], ["1", "Schrauben M6", "3,20"], ["2", "Toner schwarz", "48,00"]]
+
+
+def _write(path, ruled):
+    write_pdf(str(path), [{"lines": ["Rechnung 1001", "Hansa Bürobedarf GmbH"],
+                           "table": {"columns": [40, 80, 400], "top": 700, "rows": ROWS, "ruled": ruled},
+                           "footer": ["Nettowert: 51,20 EUR"]}])
+    return path
+
+
+def test_ruled_table_rows_match_pdfplumber_once(tmp_path):
+    with pdfplumber.open(_write(tmp_path / "ruled.pdf", ruled=True)) as pdf:
+        page = pdf.pages[0]
+        expected = page.find_tables()[0].extract()
+        blocks = extract_blocks(page)
+    tables = [block for block in blocks if block["type"] == "table"]
+    assert [table["rows"] for table in tables] == [expected]
+    text = blocks_to_text(blocks)
+    assert text.count("Toner schwarz") == 1
+    assert text.index("Rechnung 1001") < text.index("1 | Schrauben M6 | 3,20") < text.index("Nettowert")
+
+
+def test_unruled_page_skips_line_strategy_but_not_text_strategy(tmp_path):
+    with pdfplumber.open(_write(tmp_path / "plain.pdf", ruled=False)) as pdf:
+        page = pdf.pages[0]
+        assert all(block["type"] == "text" for block in extract_blocks(page))
+        text_blocks = extract_blocks(page, {"vertical_strategy": "text", "horizontal_strategy": "text"})
+    assert any(block["type"] == "table" for block in text_blocks)
+    assert "Toner" in blocks_to_text(text_blocks)
+
+
+def test_chars_inside_table_outline_but_outside_cells_are_left_to_text():
+    row = SimpleNamespace(bbox=(0, 0, 100, 10), cells=[(0, 0, 40, 10), (60, 0, 100, 10)])
+    grid = _TableGrid(SimpleNamespace(bbox=(0, 0, 100, 20), rows=[row]))
+    assert grid.add({"text": "a"}, 20, 5)
+    assert not grid.add({"text": "gap"}, 50, 5)        # between the cells
+    assert not grid.add({"text": "below"}, 20, 15)     # under the last row
+    assert not grid.add({"text": "outside"}, 150, 5)
+    assert grid.chars == [[[{"text": "a"}], []]]
+
+
+def test_word_boxes_from_chars_match_extract_words(tmp_path):
+    with pdfplumber.open(_write(tmp_path / "ruled.pdf", ruled=True)) as pdf:
+        page = pdf.pages[0]
+        boxes = word_boxes(page)
+        expected = [[w["text"], round(w["x0"] / page.width, 4), round(w["top"] / page.height, 4),
+                     round(w["x1"] / page.width, 4), round(w["bottom"] / page.height, 4)]
+                    for w in page.extract_words()]
+    assert boxes == expected
@@ -0,0 +1,17 @@
+from pdf_to_json import _convert_one
+
+
+def test_raw_error_payload_is_reported_failed(tmp_path):
+    pdf = tmp_path / "broken.pdf"
+    pdf.write_bytes(b"not a pdf")
+    result = _convert_one(str(pdf), str(tmp_path / "broken.json"), use_raw=True)
+    assert result["status"] == "failed"
+    assert result["error"]
+
+
+def test_save_failure_is_reported_failed(tmp_path):
+    pdf = tmp_path / "broken.pdf"
+    pdf.write_bytes(b"not a pdf")
+    result = _convert_one(str(pdf), str(tmp_path / "missing" / "broken.json"), use_raw=True)
+    assert result["status"] == "failed"
+    assert "FileNotFoundError" in result["error"]
@@ -0,0 +1,43 @@
+from rule_extract import CONFIDENT, LIKELY, item_rows
+
+INVOICE = [
+    "Hofmann Werkzeugtechnik GmbH",
+    "Rechnung 2024-118",
+    "Pos Bezeichnung Preis",
+    "1 Schraubendreher-Set 24,90",
+    "2 Bitsatz 30-teilig 19,50",
+    "3 Wasserwaage 60 cm 10,80",
+    "Warenwert: 55,20 EUR",
+    "Gesamtbetrag: 65,69 EUR",
+]
+
+
+def test_labelled_totals_and_item_checksum_are_confident(output1):
+    rules = output1.RULES.extract("\n".join(INVOICE), "Invoice")
+    assert rules["data"]["total_net"] == 55.2
+    assert rules["data"]["total_gross"] == 65.69
+    assert rules["confidence"]["items"] == CONFIDENT
+    assert [item["price"] for item in rules["data"]["items"]] == [24.9, 19.5, 10.8]
+
+
+def test_unlabelled_company_name_is_only_likely(output1):
+    # The only GmbH on the page is the recipient, not the supplier
+    text = "\n".join(["An die Beispiel Handels GmbH", "Warenwert: 10,00 EUR", "Gesamtbetrag: 11,90 EUR"])
+    rules = output1.RULES.extract(text, "Invoice")
+    assert rules["confidence"]["business_name"] == LIKELY
+    assert "business_name" in rules["missing"]
+
+
+def test_numbered_prose_is_not_an_item_row(output1):
+    lines = INVOICE[:-2] + ["30 Tage netto", "Warenwert: 55,20 EUR", "Gesamtbetrag: 65,69 EUR"]
+    assert item_rows(lines) == [3, 4, 5]
+    rules = output1.RULES.extract("\n".join(lines), "Invoice")
+    assert rules["confidence"]["items"] == CONFIDENT
+    assert rules["confidence"]["total_net"] == CONFIDENT
+
+
+def test_item_rows_need_a_heading_a_sequence_or_table_cells():
+    assert item_rows(["Zahlbar in", "14 Tagen rein netto"]) == []
+    assert item_rows(["Pos | Artikel-Nr | Menge", "1 | A-00001 | 3"]) == [1]
+    assert item_rows(["Pos. Artikel Menge", "1 A-00001 3"]) == [1]
+    assert item_rows(["10 A-00001 3", "20 A-00002 1", "30 A-00003 2"]) == [0, 1, 2]
@@ -0,0 +1,136 @@
+import asyncio
+import json
+
+import pytest
+
+from supplier_templates import ANCHORED, INDEX_VERSION, POSITIONAL, TemplateIndex
+from synthetic_pdfs import write_pdf
+
+INVOICES = [
+    ("RE-1001", [("Kabelbinder 200mm", 12.5), ("Toner schwarz", 48.0)]),
+    ("RE-1002", [("Schrauben M6", 3.2), ("Hydrauliköl 5L", 21.9), ("Kugellager 6204", 7.45)]),
+    ("RE-1003", [("Druckerpapier A4", 5.99)]),
+]
+
+
+def _amount(value: float) -> str:
+    return f"{value:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
+
+
+def _invoice(path, number, items, supplier="Hofmann Werkzeugtechnik"):
+    """Write an invoice whose gross total sits under a label the rules do not know; return the true reply."""
+    net = round(sum(price for _, price in items), 2)
+    gross = round(net * 1.19, 2)
+    rows = [["Pos", "Artikel", "Betrag"]] + [[str(k), name, _amount(price)] for k, (name, price) in enumerate(items, 1)]
+    write_pdf(path, [{"lines": [supplier, "Gartenweg 3, 90402 Nürnberg", "", f"Beleg {number}", "Kunde: Prima Labs", ""],
+                      "table": {"columns": [40, 80, 400], "top": 700, "rows": rows, "ruled": True},
+                      "footer": [f"Warenwert: {_amount(net)} EUR", f"Summe inkl. MwSt: {_amount(gross)} EUR"]}])
+    return {"total_gross": gross, "total_net": net, "business_name": supplier,
+            "items": [{"name": name, "price": price} for name, price in items]}
+
+
+@pytest.fixture
+def docs(output1, tmp_path):
+    """(pages, true reply) of three invoices from one supplier."""
+    result = []
+    for i, (number, items) in enumerate(INVOICES):
+        truth = _invoice(tmp_path / f"inv{i}.pdf", number, items)
+        result.append((output1.extract_pdf_pages(tmp_path / f"inv{i}.pdf"), truth))
+    return result
+
+
+def _index(output1, path):
+    schemas = {dataset: fmt["output"] for dataset, fmt in output1.FORMATS.items()}
+    return TemplateIndex(path, schemas, output1.KEYWORD_MAPPINGS, output1.normalize_number, output1.normalize_date)
+
+
+def test_fingerprint_ignores_item_count_but_not_supplier(output1, docs, tmp_path):
+    index = _index(output1, tmp_path / "index.json")
+    fingerprints = [index.fingerprint(pages) for pages, _ in docs]
+    assert fingerprints[0] == fingerprints[1] == fingerprints[2]
+    _invoice(tmp_path / "other.pdf", "RE-9", INVOICES[0][1], supplier="Albrecht Laborbedarf")
+    other = index.fingerprint(output1.extract_pdf_pages(tmp_path / "other.pdf"))
+    assert len(other & fingerprints[0]) / len(other | fingerprints[0]) < index.min_similarity
+
+
+def test_template_is_confirmed_only_by_another_document(output1, docs, tmp_path):
+    index = _index(output1, tmp_path / "index.json")
+    (pages0, truth0), (pages1, truth1), _ = docs
+    assert index.learn(pages0, "Invoice", truth0, "inv0.pdf")["status"] == "candidate"
+    assert index.match(pages1, "Invoice")[0] is None
+    # The same reply again (a rerun or an LLM cache hit) is no confirmation
+    assert index.learn(pages0, "Invoice", truth0, "inv0.pdf") is None
+
+    wrong_name = dict(truth1, business_name="Prima Labs")
+    template = index.learn(pages1, "Invoice", wrong_name, "inv1.pdf")
+    assert template["status"] == "confirmed"
+    assert set(template["fields"]) == {"total_gross", "total_net"}
+    assert index.match(pages1, "Invoice")[0]["id"] == template["id"]
+
+
+def test_apply_reads_anchored_values_and_only_hints_positional_ones(output1, docs, tmp_path):
+    index = _index(output1, tmp_path / "index.json")
+    (pages0, truth0), (pages1, truth1), (pages2, truth2) = docs
+    index.learn(pages0, "Invoice", truth0, "inv0.pdf")
+    template = index.learn(pages1, "Invoice", truth1, "inv1.pdf")
+    assert template["fields"]["total_gross"]["anchor"] == ["Summe", "inkl.", "MwSt:"]
+    assert "bbox" in template["fields"]["business_name"]
+
+    values = index.apply(template, pages2)
+    assert values["total_gross"] == (truth2["total_gross"], ANCHORED)
+    assert values["business_name"] == ("Hofmann Werkzeugtechnik", POSITIONAL)
+    assert POSITIONAL < output1.RULES_MIN_CONFIDENCE
+
+
+def test_index_is_versioned(output1, docs, tmp_path):
+    path = tmp_path / "index.json"
+    index = _index(output1, path)
+    (pages0, truth0), (pages1, truth1), _ = docs
+    index.learn(pages0, "Invoice", truth0, "inv0.pdf")
+    index.learn(pages1, "Invoice", truth1, "inv1.pdf")
+    saved = json.loads(path.read_text(encoding="utf-8"))
+    assert saved["version"] == INDEX_VERSION
+    assert _index(output1, path).match(pages1, "Invoice")[0] is not None
+
+    # An index of an older format starts empty
+    path.write_text(json.dumps(saved["templates"]), encoding="utf-8")
+    assert _index(output1, path).entries == {}
+
+
+def test_matched_template_fills_checked_values_and_hints_the_rest(output1, docs, tmp_path, monkeypatch):
+    (pages0, truth0), (pages1, truth1), (pages2, truth2) = docs
+    prompts = []
+    current = {}
+
+    async def fake_call(prompt, text, timeout=None):
+        prompts.append(prompt)
+        return json.loads(json.dumps(current["reply"]))
+
+    monkeypatch.setattr(output1, "call_gpt4o_async", fake_call)
+    monkeypatch.setattr(output1, "_templates", _index(output1, tmp_path / "index.json"))
+
+    def run(pages, truth):
+        current["reply"] = truth
+        text = output1.join_pages(pages)
+        return asyncio.run(output1.extract_document_async("PROMPT", text, "Invoice", "inv.pdf", pages=pages))
+
+    run(pages0, truth0)
+    run(pages1, truth1)
+    outcome = run(pages2, {"business_name": truth2["business_name"]})
+    assert outcome["route"] == "fill"
+    assert outcome["extracted"]["total_gross"] == truth2["total_gross"]
+    assert '"total_gross"' not in prompts[-1].split("JSON format")[-1]
+    assert "Hofmann Werkzeugtechnik" in prompts[-1]
+
+    # Below the trust similarity the template only suggests values
+    monkeypatch.setattr(output1, "TEMPLATE_TRUST_SIMILARITY", 1.01)
+    outcome = run(pages2, truth2)
+    assert '"total_gross"' in prompts[-1].split("JSON format")[-1]
+    assert outcome["extracted"]["total_gross"] == truth2["total_gross"]
+
+
+def test_cross_check_rejects_inconsistent_totals(output1):
+    items = [{"name": "Toner", "price": 48.0}]
+    assert output1.cross_check("Invoice", {"total_net": 48.0, "total_gross": 57.12, "items": items})
+    assert not output1.cross_check("Invoice", {"total_net": 48.0, "total_gross": 40.0})
+    assert not output1.cross_check("Invoice", {"total_net": 50.0, "items": items})
@@ -0,0 +1,75 @@
+import hashlib
+
+from sync_manifest import SyncManifest
+
+
+def _download(manifest, tmp_path, content=b"%PDF-1.4 invoice", etag='"v1"'):
+    (tmp_path / "a.pdf").write_bytes(content)
+    attachment = {"id": "att1", "size": len(content)}
+    result = {"filename": "a.pdf", "size": len(content), "sha256": hashlib.sha256(content).hexdigest(),
+              "etag": etag}
+    manifest.update("rec1", attachment, "2024-01-01", result)
+    return attachment
+
+
+def test_new_attachment_is_added(tmp_path):
+    manifest = SyncManifest(str(tmp_path / "manifest.json"))
+    assert manifest.classify("rec1", {"id": "att1", "size": 3}, "2024-01-01", str(tmp_path)) == "added"
+
+
+def test_untouched_download_is_unchanged_after_reload(tmp_path):
+    manifest = SyncManifest(str(tmp_path / "manifest.json"))
+    attachment = _download(manifest, tmp_path)
+    manifest.save()
+    reloaded = SyncManifest(str(tmp_path / "manifest.json"))
+    assert reloaded.classify("rec1", attachment, "2024-01-01", str(tmp_path)) == "unchanged"
+
+
+def test_modified_time_or_size_change_is_changed(tmp_path):
+    manifest = SyncManifest(str(tmp_path / "manifest.json"))
+    attachment = _download(manifest, tmp_path)
+    assert manifest.classify("rec1", attachment, "2024-02-01", str(tmp_path)) == "changed"
+    assert manifest.classify("rec1", dict(attachment, size=1), "2024-01-01", str(tmp_path)) == "changed"
+
+
+def test_same_size_local_corruption_is_changed(tmp_path):
+    manifest = SyncManifest(str(tmp_path / "manifest.json"))
+    attachment = _download(manifest, tmp_path)
+    (tmp_path / "a.pdf").write_bytes(b"%PDF-1.4 invoicX")
+    assert manifest.classify("rec1", attachment, "2024-01-01", str(tmp_path)) == "changed"
+
+
+def test_unverified_manifest_only_checks_existence(tmp_path):
+    manifest = SyncManifest(str(tmp_path / "manifest.json"), verify=False)
+    attachment = _download(manifest, tmp_path)
+    (tmp_path / "a.pdf").write_bytes(b"%PDF-1.4 invoicX")
+    assert manifest.classify("rec1", attachment, "2024-01-01", str(tmp_path)) == "unchanged"
+    (tmp_path / "a.pdf").unlink()
+    assert manifest.classify("rec1", attachment, "2024-01-01", str(tmp_path)) == "changed"
+
+
+def test_changed_attachment_is_revalidated_with_the_stored_etag(tmp_path):
+    manifest = SyncManifest(str(tmp_path / "manifest.json"))
+    attachment = _download(manifest, tmp_path)
+    assert manifest.classify("rec1", attachment, "2024-02-01", str(tmp_path)) == "changed"
+    assert manifest.revalidation_etag("rec1", "att1", str(tmp_path)) == '"v1"'
+
+    # A 304 keeps the stored copy and records the new modified time
+    manifest.update("rec1", attachment, "2024-02-01", {"not_modified": True, "etag": '"v1"'})
+    assert manifest.entry("rec1", "att1")["filename"] == "a.pdf"
+    assert manifest.classify("rec1", attachment, "2024-02-01", str(tmp_path)) == "unchanged"
+
+
+def test_damaged_local_copy_is_not_revalidated(tmp_path):
+    manifest = SyncManifest(str(tmp_path / "manifest.json"))
+    _download(manifest, tmp_path)
+    (tmp_path / "a.pdf").write_bytes(b"%PDF-1.4 invoicX")
+    assert manifest.revalidation_etag("rec1", "att1", str(tmp_path)) is None
+    assert manifest.revalidation_etag("rec1", "att2", str(tmp_path)) is None
+
+
+def test_prune_reports_attachments_no_longer_in_view(tmp_path):
+    manifest = SyncManifest(str(tmp_path / "manifest.json"))
+    _download(manifest, tmp_path)
+    assert manifest.prune() == ["rec1/att1"]
+    assert manifest.entry("rec1", "att1") is None